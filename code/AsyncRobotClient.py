@@ -0,0 +1,201 @@
+import argparse
+import asyncio
+import collections
+import urllib.parse
+import xmlrpc.client
+
+import RobotClient
+
+"""An asyncio version of the RobotClient, for robot programs that want to carry on working while their calls to the simulator are in flight.
+
+The calls are sent over one connection that is kept open, and each call is sent as soon as it is made, without waiting for the calls before it
+to be answered. The simulator answers them one at a time, in the order they were sent. The calls that wait for simulated time to pass (see() and sleep())
+return awaitables, so a program can send its next see() and then work on the markers from the last one while the simulation carries on:
+
+    async def main():
+        robot = await AsyncRobotClient.connect()
+        nextMarkers = robot.see()
+        while True:
+            markers = await nextMarkers
+            nextMarkers = robot.see()
+            #Work out what to do with markers, while the next image is being taken.
+            robot.motors[1] = 50
+            robot.motors[2] = 50
+
+    asyncio.run(main())
+
+Setting a motor's power, and printing, don't wait for an answer. If one of them fails, the error is raised by the next call that is awaited."""
+
+class Motors:
+    """An interface for the motors in the RobotService. Setting a motor's power sends the call without waiting for it,
+    and reading a motor's power returns an awaitable of it."""
+
+    def __init__(self, robot):
+        self._robot = robot
+
+    def __getitem__(self, index):
+        return self._robot._call("getMotorPower", index)
+
+    def __setitem__(self, index, value):
+        self._robot._send("setMotorPower", index, value)
+
+class Robot:
+    """An asyncio interface for this robot's RobotService, with the same calls as RobotClient.Robot, which send their requests straight away and return
+    awaitables of their answers. Use connect() to create one that is connected and ready to start."""
+
+    def __init__(self, url = None):
+        """Creates the interface for the RobotService at the url, or at the url passed to the program with --url if none is given. Call open() to connect to it."""
+        if url == None:
+            parser = argparse.ArgumentParser("AsyncRobotClient")
+            parser.add_argument("--url", action="store", help="The URL of of the RobotThread's xmlrpc server.")
+            url = parser.parse_args().url
+        self._url = urllib.parse.urlsplit(url)
+        self._reader = None
+        self._writer = None
+        #The futures of the calls that have been sent and not yet answered, in the order they were sent.
+        self._pendingCalls = collections.deque()
+        self._responseReader = None
+        #The first error from a call that wasn't awaited, which is raised by the next call that is.
+        self._error = None
+        self.motors = Motors(self)
+        self.gpio = []
+        self.servos = []
+        self.zone = None
+
+    async def open(self):
+        """Connects to the RobotService, and finds out which team the robot is in."""
+        RobotClient._trace("Connecting to RobotService:")
+        self._reader, self._writer = await asyncio.open_connection(self._url.hostname, self._url.port)
+        self._responseReader = asyncio.get_running_loop().create_task(self._readResponses())
+        self.zone = await self._call("getTeamNumber")
+        RobotClient._trace("Connected.")
+
+    async def close(self):
+        """Closes the connection to the RobotService. Any calls still waiting for an answer fail."""
+        if self._writer != None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+        if self._responseReader != None:
+            await self._responseReader
+
+    def _send(self, methodName, *params):
+        """Sends a call to the RobotService straight away, and returns a future of its answer."""
+        if self._writer == None or self._writer.is_closing():
+            raise ConnectionError("The robot is not connected to the RobotService.")
+        body = xmlrpc.client.dumps(params, methodName).encode("UTF-8")
+        header = "POST {} HTTP/1.1\r\nHost: {}\r\nContent-Type: text/xml\r\nContent-Length: {}\r\n\r\n".format(self._url.path or "/", self._url.netloc, len(body))
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(self._noteError)
+        self._pendingCalls.append(future)
+        self._writer.write(header.encode("ASCII") + body)
+        return future
+
+    def _noteError(self, future):
+        """Keeps the first error from a call, so that it isn't lost if the call is never awaited."""
+        if not future.cancelled() and future.exception() != None and self._error == None:
+            self._error = future.exception()
+
+    def _call(self, methodName, *params):
+        """Sends a call to the RobotService straight away, and returns an awaitable of its answer."""
+        return self._waitForAnswer(self._send(methodName, *params))
+
+    async def _waitForAnswer(self, future):
+        """Waits for the answer to a call. Raises the error of an earlier call that wasn't awaited, if one failed."""
+        try:
+            return await future
+        finally:
+            error = self._error
+            self._error = None
+            if error != None and (future.cancelled() or error is not future.exception()):
+                raise error
+
+    async def _readResponses(self):
+        """Reads each response from the RobotService as it arrives, and gives it to the oldest call waiting for an answer."""
+        try:
+            while True:
+                statusLine = await self._reader.readline()
+                if not statusLine:
+                    break
+                headers = {}
+                while True:
+                    line = (await self._reader.readline()).decode("ISO-8859-1").rstrip("\r\n")
+                    if line == "":
+                        break
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await self._reader.readexactly(int(headers.get("content-length", 0)))
+                future = self._pendingCalls.popleft()
+                #A call whose awaitable was cancelled still gets its answer, which is thrown away.
+                if future.cancelled():
+                    continue
+                status = statusLine.decode("ISO-8859-1").split(" ", 2)
+                try:
+                    if int(status[1]) != 200:
+                        raise xmlrpc.client.ProtocolError(self._url.geturl(), int(status[1]), status[2].rstrip("\r\n"), headers)
+                    future.set_result(xmlrpc.client.loads(body)[0][0])
+                except (xmlrpc.client.Fault, xmlrpc.client.ProtocolError) as error:
+                    #The traceback would keep this coroutine's frame, which is cleared (ending the coroutine) if whoever catches the error clears its frames.
+                    future.set_exception(error.with_traceback(None))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        #Once the connection has closed, any calls still waiting will never be answered.
+        while self._pendingCalls:
+            future = self._pendingCalls.popleft()
+            if not future.cancelled():
+                future.set_exception(ConnectionError("The connection to the RobotService closed before the call was answered."))
+
+    def print(self, message):
+        """Sends a message to be printed to the Controller's Standard Output, without waiting for it to be sent."""
+        self._send("print", str(message))
+
+    def sleep(self, time):
+        """Returns an awaitable that waits until the specified number of seconds have passed in the simulation."""
+        return self._call("sleep", time)
+
+    def see(self, res=(640, 480)):
+        """Takes an image straight away, and returns an awaitable of the list of visible marker objects, which is ready once the brief amount of simulated time
+        depending on the resolution has passed. Raises an exception if an illegal resolution is specified."""
+        legalResolutions = [
+        (640, 480),
+        (1296, 736),
+        (1296, 976),
+        (1920, 1088),
+        (1920, 1440)
+        ]
+        if not ( res in legalResolutions ):
+            raise RuntimeError("Invalid resolution. Resolution must be one of (640, 480), (1296, 736), (1296, 976), (1920, 1088), (1920, 1440)")
+        #The call is sent before the task is created, as the task doesn't start until the program next waits.
+        return asyncio.ensure_future(self._getMarkers(self._call("see", res)))
+
+    async def _getMarkers(self, visionCall):
+        """Waits for the answer to a see() call, and creates the marker objects from it."""
+        visionDictionary = await visionCall
+        markerObjects = []
+        for marker in visionDictionary["List of Markers"]:
+            markerObjects.append(RobotClient.Marker(
+                visionDictionary["Resolution"],
+                visionDictionary["Field of View"],
+                RobotClient.constructFromDictionary(visionDictionary["Camera Position"]),
+                RobotClient.constructFromDictionary(visionDictionary["Camera Normal"]),
+                visionDictionary["Timestamp"],
+                self.zone,
+                marker
+            ))
+        return markerObjects
+
+    def waitForStart(self):
+        """Returns an awaitable that waits until the simulation begins."""
+        return self._call("waitForStart")
+
+async def connect(url = None):
+    """Connects to the RobotService at the url (or at the url passed to the program with --url), and waits for the simulation to begin.
+    Returns the connected Robot."""
+    robot = Robot(url)
+    await robot.open()
+    RobotClient._trace("Waiting for start.")
+    await robot.waitForStart()
+    RobotClient._trace("Starting.")
+    return robot
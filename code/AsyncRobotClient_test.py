@@ -0,0 +1,48 @@
+import unittest
+import asyncio
+import xmlrpc.client
+
+import SimTestCase
+import AsyncRobotClient
+import SimBase
+import SimRobot
+
+class PipelinedCallTest(SimTestCase.SimTestCase):
+
+    def setUp(self):
+        """Creates an arena, and a robot thread serving a robot in it."""
+        super().setUp()
+        self.createArena()
+        self.robotThread = SimRobot.RobotThread(2)
+        self.robotThread.start()
+
+    def tearDown(self):
+        self.robotThread.shutdownAndWaitToExit()
+        super().tearDown()
+
+    async def _runCalls(self):
+        """Sends several calls without waiting for their answers, and checks they are answered in order over one connection."""
+        robot = AsyncRobotClient.Robot(self.robotThread.getUrl())
+        await robot.open()
+        self.assertEqual(robot.zone, 2)
+        robot.motors[1] = 30
+        robot.motors[2] = -40
+        robot.motors[1] = 120
+        robot.print("Pipelined")
+        leftPower = robot.motors[1]
+        rightPower = robot.motors[2]
+        self.assertEqual(await rightPower, -40)
+        self.assertEqual(await leftPower, 100)
+        self.assertEqual(len(self.robotThread.server.openConnections), 1)
+        #An error from a call that wasn't awaited is raised by the next call that is.
+        robot.motors[3] = 10
+        with self.assertRaises(xmlrpc.client.Fault):
+            await robot.motors[1]
+        self.assertEqual(await robot.motors[1], 100)
+        await robot.close()
+
+    def testPipelinedCalls(self):
+        """Tests that calls sent together are all handled, in the order they were sent."""
+        asyncio.run(self._runCalls())
+        self.assertEqual(len(self.robotThread.pendingOutput), 1)
+        self.assertTrue(self.robotThread.pendingOutput[0].endswith("printed: Pipelined"))
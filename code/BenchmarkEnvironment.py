@@ -0,0 +1,42 @@
+import argparse
+import time
+
+import numpy
+
+#my modules
+import SimEnvironment
+
+"""Measures the throughput of the vectorised environment (SimEnvironment), in environment steps per second: the number of actions taken by
+a whole arena's robots each second, summed over every environment in the batch. Random actions are taken, changing every step, and the
+observations are built every step, as a training loop would need them."""
+
+def _measureThroughput(environmentCount, stepsPerAction, wallTime, matchLength):
+    """Steps a batch of environments with random actions for wallTime seconds, and returns the environment steps per second,
+    the simulated seconds per second (summed over the environments) and the number of matches finished."""
+    environment = SimEnvironment.VectorEnvironment(environmentCount, stepsPerAction = stepsPerAction, matchLength = matchLength)
+    randomGenerator = numpy.random.default_rng(0)
+    #The actions are generated up front, so that generating them isn't timed.
+    actions = randomGenerator.uniform(-100, 100, (16, environmentCount, environment.robotCount, 2))
+    steps = 0
+    matches = 0
+    startTime = time.perf_counter()
+    while time.perf_counter() - startTime < wallTime:
+        observations, rewards, dones, infos = environment.step(actions[steps % len(actions)])
+        matches += int(dones.sum())
+        steps += 1
+    stepRate = steps * environmentCount / (time.perf_counter() - startTime)
+    return stepRate, stepRate * stepsPerAction * environment.arena.stepSize, matches
+
+if __name__ == "__main__":
+    """Main program."""
+    parser = argparse.ArgumentParser("BenchmarkEnvironment")
+    parser.add_argument("--environments", type=int, nargs="+", default=[1, 16, 256, 1024, 4096], help="The numbers of environments to step at once.")
+    parser.add_argument("--steps-per-action", type=int, default=1, help="The number of physics steps each action is held for.")
+    parser.add_argument("--match-length", type=float, default=10, help="The number of simulated seconds each match lasts before the environment is reset.")
+    parser.add_argument("--time", type=float, default=5, help="The number of wall-clock seconds to run each batch for.")
+    arguments = parser.parse_args()
+
+    print("{:>14}{:>22}{:>26}{:>18}".format("Environments", "Environment steps/s", "Simulated seconds/s", "Matches finished"))
+    for environmentCount in arguments.environments:
+        stepRate, simulatedRate, matches = _measureThroughput(environmentCount, arguments.steps_per_action, arguments.time, arguments.match_length)
+        print("{:>14}{:>22.0f}{:>26.0f}{:>18}".format(environmentCount, stepRate, simulatedRate, matches))
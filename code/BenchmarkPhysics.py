@@ -0,0 +1,74 @@
+import argparse
+import random
+import time
+
+#my modules
+import SimBase
+import SimArena
+
+"""Measures how many physics steps per second the simulator can run with different arena configurations.
+Each configuration is run on a fresh arena with four robots driving randomly, without the display or any robot programs."""
+
+_defaultConfiguration = {
+    "Teams" : 4,
+    "Wall Distance" : 3.0,
+    "Step Size" : 1/64,
+    "Substeps" : 1,
+    "Solver Iterations" : 10,
+    "Threaded Solver" : False,
+    "Solver Threads" : 2,
+    "Sleep Time Threshold" : 0,
+    "Idle Speed Threshold" : 0.02
+}
+#The name of each configuration, and how it differs from the default configuration.
+_configurations = [
+    ("Default", {}),
+    ("Fewer iterations", { "Solver Iterations" : 5 }),
+    ("Larger steps", { "Step Size" : 1/32 }),
+    ("Substeps", { "Substeps" : 4 }),
+    ("Threaded solver", { "Threaded Solver" : True }),
+    ("Sleeping", { "Sleep Time Threshold" : 0.5 })
+]
+
+def _createArena(arenaConfig, extraTokens):
+    """Creates a new arena with four robots, and optionally crowds it with extra ore tokens at random positions."""
+    SimBase.theTime = 0
+    SimBase.wallSegments = []
+    SimBase.tokens = []
+    SimBase.robots = []
+    SimBase.zones = []
+    SimArena.ArenaService(arenaConfig)
+    for teamNumber in range(4):
+        SimBase.Robot(teamNumber)
+    randomGenerator = random.Random(0)
+    for tokenNumber in range(extraTokens):
+        SimBase.Token(1000 + tokenNumber, "Ore", randomGenerator.uniform(-2.4, 2.4), randomGenerator.uniform(-2.4, 2.4))
+
+def _runBenchmark(simulatedTime):
+    """Runs the simulation for the given number of simulated seconds, and returns the number of steps and wall-clock time taken."""
+    randomGenerator = random.Random(0)
+    steps = 0
+    startTime = time.perf_counter()
+    while SimBase.theTime < simulatedTime:
+        if steps % 32 == 0:
+            for robot in SimBase.robots:
+                robot.leftPower = randomGenerator.uniform(-100, 100)
+                robot.rightPower = randomGenerator.uniform(-100, 100)
+        SimBase.stepSimulation()
+        steps += 1
+    return steps, time.perf_counter() - startTime
+
+if __name__ == "__main__":
+    """Main program."""
+    parser = argparse.ArgumentParser("BenchmarkPhysics")
+    parser.add_argument("--time", type=float, default=60, help="The number of simulated seconds to run each configuration for.")
+    parser.add_argument("--extra-tokens", type=int, default=0, help="The number of extra tokens to crowd the arena with.")
+    arguments = parser.parse_args()
+
+    print("{:<20}{:>12}{:>16}{:>20}".format("Configuration", "Steps", "Steps/second", "Simulated/wall time"))
+    for name, configurationChanges in _configurations:
+        arenaConfig = dict(_defaultConfiguration)
+        arenaConfig.update(configurationChanges)
+        _createArena(arenaConfig, arguments.extra_tokens)
+        steps, wallTime = _runBenchmark(arguments.time)
+        print("{:<20}{:>12}{:>16.0f}{:>20.1f}".format(name, steps, steps / wallTime, SimBase.theTime / wallTime))
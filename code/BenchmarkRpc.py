@@ -0,0 +1,151 @@
+import argparse
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+import xmlrpc.client
+
+"""Measures how the simulator holds up when robot programs call it as fast as they can.
+For each number of robots, a new simulator is started (as fast as possible, without a window) with a synthetic robot program per robot,
+each making random calls from a mix of see(), motor, sleep() and print() calls until the time is up. The report shows the throughput and
+latency percentiles of each type of call, as the robot programs saw them, and how much simulated time passed for each second of wall-clock time."""
+
+#The calls the synthetic robots can make, and the default weights of each in the mix.
+_resolutions = {"see:640x480" : (640, 480), "see:1296x736" : (1296, 736), "see:1296x976" : (1296, 976), "see:1920x1088" : (1920, 1088), "see:1920x1440" : (1920, 1440)}
+_callNames = list(_resolutions) + ["motor-set", "motor-get", "sleep", "print"]
+_defaultMix = "see:640x480=1,motor-set=2,motor-get=2,sleep=1,print=1"
+#The percentiles of the latency of each type of call that are reported.
+_percentiles = [50, 90, 99]
+
+def _parseMix(mix):
+    """Returns a dictionary of the weight of each call in a mix, given as a comma separated list of call=weight."""
+    weights = {}
+    for item in mix.split(","):
+        callName, weight = item.split("=")
+        if callName not in _callNames:
+            raise RuntimeError("Invalid call " + callName + " in the mix. The calls are " + ", ".join(_callNames) + ".")
+        weights[callName] = float(weight)
+    return weights
+
+def _makeCall(robot, callName, sleepTime, randomGenerator):
+    """Makes one call of the given type to the robot."""
+    if callName in _resolutions:
+        robot.see(_resolutions[callName])
+    elif callName == "motor-set":
+        robot.motors[randomGenerator.choice([1, 2])] = randomGenerator.uniform(-100, 100)
+    elif callName == "motor-get":
+        robot.motors[randomGenerator.choice([1, 2])]
+    elif callName == "sleep":
+        robot.sleep(sleepTime)
+    else:
+        robot.print("Synthetic robot message")
+
+def _runSyntheticRobot(serviceURL, weights, sleepTime, seed, stopEvent, resultQueue):
+    """Runs a synthetic robot program, which makes random calls from the mix until the stop event is set or the simulation ends.
+    Then it turns its motors off and sleeps until the end of the simulation, so that the simulation can finish.
+    Puts a dictionary of the latencies of each type of call on the result queue."""
+    import RobotClient
+    #The RobotClient traces every sleep to Standard Error, which would drown out the report.
+    sys.stderr = open(os.devnull, "w")
+    sys.argv = ["BenchmarkRpc", "--url", serviceURL]
+    robot = RobotClient.Robot()
+    randomGenerator = random.Random(seed)
+    callNames = list(weights)
+    callWeights = [weights[callName] for callName in callNames]
+    latencies = {callName : [] for callName in callNames}
+    try:
+        while not stopEvent.is_set():
+            callName = randomGenerator.choices(callNames, callWeights)[0]
+            startTime = time.perf_counter()
+            _makeCall(robot, callName, sleepTime, randomGenerator)
+            latencies[callName].append(time.perf_counter() - startTime)
+        resultQueue.put(latencies)
+        robot.motors[1] = 0
+        robot.motors[2] = 0
+        robot.sleep(1000)
+    except (xmlrpc.client.Fault, ConnectionError):
+        #The simulation ended before the robot was told to stop.
+        resultQueue.put(latencies)
+
+def _getPercentile(sortedValues, percentile):
+    """Returns the percentile of a sorted list of values, using the nearest rank."""
+    rank = max(0, min(len(sortedValues) - 1, int(round(percentile / 100 * len(sortedValues))) - 1))
+    return sortedValues[rank]
+
+def _runLoad(robotCount, weights, sleepTime, wallTime, isWindowShown, simulatorOptions = []):
+    """Starts a simulator (with any extra options given) with a synthetic robot program for each robot, lets them make calls for wallTime seconds,
+    then lets the simulation finish.
+    Returns the latencies of each type of call made by all the robots, the wall-clock time the robots were running for, and the simulated time that passed."""
+    environment = dict(os.environ)
+    if not isWindowShown:
+        environment["SDL_VIDEODRIVER"] = "dummy"
+    simulator = subprocess.Popen(["python3", "Simulator.py", "--speed", "0"] + simulatorOptions, stdout = subprocess.PIPE, env = environment)
+    arena = None
+    for line in simulator.stdout:
+        text = line.decode('UTF-8').rstrip()
+        if text[0:12] == "Arena URL = ":
+            arena = xmlrpc.client.ServerProxy(text[12:])
+            break
+
+    context = multiprocessing.get_context("spawn")
+    stopEvent = context.Event()
+    resultQueue = context.Queue()
+    robots = []
+    for teamNumber in range(robotCount):
+        serviceURL = arena.createRobot(teamNumber)
+        robot = context.Process(target = _runSyntheticRobot, args = (serviceURL, weights, sleepTime, teamNumber, stopEvent, resultQueue))
+        robot.start()
+        robots.append(robot)
+    arena.waitForStart()
+
+    #The arena wakes up every simulated second, which is when the time is checked.
+    startTime = time.perf_counter()
+    isSimulatorRunning = True
+    while isSimulatorRunning and time.perf_counter() - startTime < wallTime:
+        isSimulatorRunning = arena.waitForOutput(1)[0]
+    loadTime = time.perf_counter() - startTime
+    simulatedTime = arena.getMetrics()["Simulated Time"]
+    stopEvent.set()
+
+    #The robots can only finish their current calls once the simulation carries on, so the results are collected after it ends.
+    while isSimulatorRunning:
+        isSimulatorRunning = arena.waitForOutput(30)[0]
+    arena.terminate()
+    simulator.wait()
+    latencies = {}
+    for robot in robots:
+        for callName, callLatencies in resultQueue.get().items():
+            latencies.setdefault(callName, []).extend(callLatencies)
+    for robot in robots:
+        robot.join()
+    return latencies, loadTime, simulatedTime
+
+if __name__ == "__main__":
+    """Main program."""
+    parser = argparse.ArgumentParser("BenchmarkRpc")
+    parser.add_argument("--robots", type=int, nargs="+", default=[1, 2, 4], help="The numbers of synthetic robots to run, each with a new simulator.")
+    parser.add_argument("--mix", default=_defaultMix, help="The weight of each call in the mix, as a comma separated list of call=weight. The calls are " + ", ".join(_callNames) + ".")
+    parser.add_argument("--sleep-time", type=float, default=0.05, help="The number of simulated seconds each sleep call waits for.")
+    parser.add_argument("--time", type=float, default=10, help="The number of wall-clock seconds to run each number of robots for.")
+    parser.add_argument("--serial-handoff", action="store_true", help="Have the simulator release the robots due in a step one at a time instead of all at once.")
+    parser.add_argument("--show", action="store_true", help="Show the simulator's window instead of drawing it offscreen.")
+    arguments = parser.parse_args()
+
+    weights = _parseMix(arguments.mix)
+    for robotCount in arguments.robots:
+        simulatorOptions = ["--serial-handoff"] if arguments.serial_handoff else []
+        latencies, loadTime, simulatedTime = _runLoad(robotCount, weights, arguments.sleep_time, arguments.time, arguments.show, simulatorOptions)
+        totalCalls = sum(len(callLatencies) for callLatencies in latencies.values())
+        print("{} robot(s): {:.0f} calls/s, {:.2f} simulated seconds per wall-clock second".format(robotCount, totalCalls / loadTime, simulatedTime / loadTime))
+        print("{:<16}{:>10}{:>10}".format("Call", "Calls", "Calls/s") + "".join("{:>12}".format("p" + str(percentile) + " (ms)") for percentile in _percentiles)
+              + "{:>12}".format("max (ms)"))
+        for callName in _callNames:
+            if callName not in latencies or not latencies[callName]:
+                continue
+            sortedLatencies = sorted(latencies[callName])
+            print("{:<16}{:>10}{:>10.0f}".format(callName, len(sortedLatencies), len(sortedLatencies) / loadTime)
+                  + "".join("{:>12.2f}".format(_getPercentile(sortedLatencies, percentile) * 1000) for percentile in _percentiles)
+                  + "{:>12.2f}".format(sortedLatencies[-1] * 1000))
+        print()
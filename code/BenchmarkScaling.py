@@ -0,0 +1,83 @@
+import argparse
+import random
+import time
+
+#my modules
+import SimBase
+import SimArena
+import SimVision
+import BenchmarkPhysics
+
+"""Measures how the cost of a physics step and of a call to see() grows with the number of teams and tokens in the arena.
+Each scenario is run on a fresh arena with one robot per team driving randomly, without the display or any robot programs."""
+
+#The number of teams, the distance from the centre of the arena to the walls, and the number of ore tokens in each scenario.
+_scenarios = [
+    (4, 3.0, 25),
+    (4, 3.0, 50),
+    (8, 4.0, 50),
+    (8, 4.0, 100),
+    (8, 4.0, 200),
+    (12, 5.0, 100)
+]
+
+def _createArena(teamCount, wallDistance, tokenCount):
+    """Creates a new arena for the scenario, with a robot per team, ore tokens scattered at random and one gold token for each team."""
+    arenaConfig = dict(BenchmarkPhysics._defaultConfiguration)
+    arenaConfig["Teams"] = teamCount
+    arenaConfig["Wall Distance"] = wallDistance
+    arenaConfig["Sleep Time Threshold"] = 0.5
+    randomGenerator = random.Random(0)
+    #Keep the tokens clear of the zones, so the robots don't start on top of them.
+    positionLimit = wallDistance - 1.2
+    tokenConfig = { "Ore" : [] }
+    for tokenNumber in range(tokenCount):
+        tokenConfig["Ore"].append([randomGenerator.uniform(-positionLimit, positionLimit), randomGenerator.uniform(-positionLimit, positionLimit)])
+    for team in range(teamCount):
+        tokenConfig["Team " + str(team) + " Gold"] = [[randomGenerator.uniform(-positionLimit, positionLimit), randomGenerator.uniform(-positionLimit, positionLimit)]]
+
+    SimBase.theTime = 0
+    SimBase.wallSegments = []
+    SimBase.tokens = []
+    SimBase.robots = []
+    SimBase.zones = []
+    SimArena.ArenaService(arenaConfig, tokenConfig)
+    for teamNumber in range(teamCount):
+        SimBase.Robot(teamNumber)
+
+def _runScenario(simulatedTime):
+    """Runs the simulation for the given number of simulated seconds, with every robot calling see() once a second.
+    Returns the mean wall-clock time of a step, and of a call to see(), in milliseconds."""
+    randomGenerator = random.Random(0)
+    steps = 0
+    stepTime = 0
+    sees = 0
+    seeTime = 0
+    while SimBase.theTime < simulatedTime:
+        if steps % 32 == 0:
+            for robot in SimBase.robots:
+                robot.leftPower = randomGenerator.uniform(-100, 100)
+                robot.rightPower = randomGenerator.uniform(-100, 100)
+        startTime = time.perf_counter()
+        SimBase.stepSimulation()
+        stepTime += time.perf_counter() - startTime
+        steps += 1
+        if steps % 64 == 0:
+            for robot in SimBase.robots:
+                startTime = time.perf_counter()
+                SimVision.see(robot, (1280, 720), False)
+                seeTime += time.perf_counter() - startTime
+                sees += 1
+    return 1000 * stepTime / steps, 1000 * seeTime / max(1, sees)
+
+if __name__ == "__main__":
+    """Main program."""
+    parser = argparse.ArgumentParser("BenchmarkScaling")
+    parser.add_argument("--time", type=float, default=5, help="The number of simulated seconds to run each scenario for.")
+    arguments = parser.parse_args()
+
+    print("{:>6}{:>10}{:>8}{:>8}{:>16}{:>16}".format("Teams", "Distance", "Tokens", "Walls", "Step time (ms)", "See time (ms)"))
+    for teamCount, wallDistance, tokenCount in _scenarios:
+        _createArena(teamCount, wallDistance, tokenCount)
+        stepTime, seeTime = _runScenario(arguments.time)
+        print("{:>6}{:>10.1f}{:>8}{:>8}{:>16.3f}{:>16.3f}".format(teamCount, wallDistance, len(SimBase.tokens), len(SimBase.wallSegments), stepTime, seeTime))
@@ -0,0 +1,39 @@
+import argparse
+import os
+import time
+
+#my modules
+import SimBase
+import SimArena
+import SimAtlas
+
+"""Builds the visibility atlases SimVision.see() uses to skip the wall markers a robot couldn't see, for every robot config and image width.
+The atlases depend on the arena and robot configs, so they need building again whenever those change. Atlases that already exist are skipped."""
+
+#The widths of the resolutions RobotClient allows.
+_imageWidths = [640, 1296, 1920]
+
+if __name__ == "__main__":
+    """Main program."""
+    parser = argparse.ArgumentParser("BuildVisibilityAtlas")
+    parser.add_argument("--directory", default="Visibility Atlases", help="The directory to save the atlases in, which is given to the simulator with --visibility-atlas.")
+    parser.add_argument("--widths", type=int, nargs="+", default=_imageWidths, help="The widths of the images to build atlases for.")
+    arguments = parser.parse_args()
+
+    SimAtlas.atlasDirectory = arguments.directory
+    #The robots are created in an arena, so that their cameras are configured exactly as the simulator will configure them.
+    SimArena.ArenaService()
+    for teamNumber in range(SimBase.teamCount):
+        robot = SimBase.Robot(teamNumber)
+        for width in arguments.widths:
+            parameters = SimAtlas.getParameters(robot, (width, 0))
+            if parameters == None:
+                print("Team {}'s robot can't see anything at a width of {}.".format(teamNumber, width))
+                continue
+            filename = SimAtlas.getFilename(parameters)
+            if os.path.exists(filename):
+                print("Team {}'s robot at a width of {}: already built as {}".format(teamNumber, width, filename))
+                continue
+            startTime = time.perf_counter()
+            SimAtlas.saveAtlas(parameters)
+            print("Team {}'s robot at a width of {}: built {} in {:.1f}s".format(teamNumber, width, filename, time.perf_counter() - startTime))
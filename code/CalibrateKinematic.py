@@ -0,0 +1,135 @@
+import argparse
+import json
+import math
+import random
+import time
+
+import numpy
+
+#my modules
+import SimBase
+import SimArena
+import SimKinematic
+
+"""Compares the kinematic simulation (SimKinematic) against the full pymunk simulation.
+Both are given the same robots (with the same motor noise) and the same random motor powers, and the report shows how far apart the robots'
+trajectories drift over time, how often the scores agree, and how many arena steps per second each can run."""
+
+#The times (in simulated seconds) at which the trajectories are compared.
+_checkpoints = [1, 5, 10, 30, 60]
+
+def _createPymunkArena(tokenConfig, kinematicArena):
+    """Creates a new pymunk arena with a robot per team, with the same motor noise as the first kinematic arena."""
+    SimBase.theTime = 0
+    SimBase.wallSegments = []
+    SimBase.tokens = []
+    SimBase.robots = []
+    SimBase.zones = []
+    with open("Arena Config.json") as ArenaConfig:
+        arenaConfig = json.loads(ArenaConfig.read())[0]
+    arena = SimArena.ArenaService(arenaConfig, tokenConfig)
+    for teamNumber in range(SimBase.teamCount):
+        robot = SimBase.Robot(teamNumber)
+        robot._leftMaxPower = float(kinematicArena.leftMaxPowers[0, teamNumber])
+        robot._rightMaxPower = float(kinematicArena.rightMaxPowers[0, teamNumber])
+    return arena
+
+def _getPowerSchedule(seed, teamCount):
+    """Returns a function giving the random motor powers of every robot for a step, which change every half a second."""
+    randomGenerator = random.Random(seed)
+    powers = []
+    def getPowers(step):
+        if step % 32 == 0:
+            powers[:] = [(randomGenerator.uniform(-100, 100), randomGenerator.uniform(-100, 100)) for team in range(teamCount)]
+        return powers
+    return getPowers
+
+def _compareTrajectories(tokenConfig, seed):
+    """Runs a pymunk arena and a kinematic arena side by side, and returns the position and heading errors of the robots at each checkpoint,
+    and the fraction of steps on which the scores agreed."""
+    kinematicArena = SimKinematic.KinematicArena(1, tokenConfig = tokenConfig, seed = seed)
+    pymunkArena = _createPymunkArena(tokenConfig, kinematicArena)
+    getPowers = _getPowerSchedule(seed, kinematicArena.teamCount)
+    errors = []
+    agreeingSteps = 0
+    steps = 0
+    while SimBase.theTime < _checkpoints[-1]:
+        powers = getPowers(steps)
+        for robot, (leftPower, rightPower) in zip(SimBase.robots, powers):
+            robot.leftPower = leftPower
+            robot.rightPower = rightPower
+        kinematicArena.setMotorPowers([[leftPower for leftPower, rightPower in powers]], [[rightPower for leftPower, rightPower in powers]])
+        SimBase.stepSimulation()
+        kinematicArena.step()
+        steps += 1
+        if list(kinematicArena.getScores()[0]) == pymunkArena.getScores():
+            agreeingSteps += 1
+        if SimBase.theTime in _checkpoints:
+            positionErrors = []
+            headingErrors = []
+            for robot in SimBase.robots:
+                kinematicPosition = kinematicArena.robotPositions[0, robot.teamNumber]
+                positionErrors.append(math.hypot(robot.position[0] - kinematicPosition[0], robot.position[1] - kinematicPosition[1]))
+                headingError = (robot.angle - kinematicArena.robotAngles[0, robot.teamNumber] + math.pi) % (2 * math.pi) - math.pi
+                headingErrors.append(abs(headingError))
+            errors.append((SimBase.theTime, positionErrors, headingErrors))
+    return errors, agreeingSteps / steps
+
+def _measureThroughput(simulatedTime, arenaCount):
+    """Returns the number of arena steps per second of the pymunk simulation, and the kinematic simulation stepping arenaCount arenas at once."""
+    kinematicArena = SimKinematic.KinematicArena(arenaCount)
+    _createPymunkArena(None, kinematicArena)
+    getPowers = _getPowerSchedule(0, kinematicArena.teamCount)
+    steps = 0
+    startTime = time.perf_counter()
+    while SimBase.theTime < simulatedTime:
+        for robot, (leftPower, rightPower) in zip(SimBase.robots, getPowers(steps)):
+            robot.leftPower = leftPower
+            robot.rightPower = rightPower
+        SimBase.stepSimulation()
+        steps += 1
+    pymunkRate = steps / (time.perf_counter() - startTime)
+
+    randomGenerator = numpy.random.default_rng(0)
+    steps = 0
+    startTime = time.perf_counter()
+    while kinematicArena.times[0] < simulatedTime:
+        if steps % 32 == 0:
+            kinematicArena.setMotorPowers(randomGenerator.uniform(-100, 100, kinematicArena.leftPowers.shape),
+                                          randomGenerator.uniform(-100, 100, kinematicArena.rightPowers.shape))
+        kinematicArena.step()
+        steps += 1
+    kinematicRate = steps * arenaCount / (time.perf_counter() - startTime)
+    return pymunkRate, kinematicRate
+
+if __name__ == "__main__":
+    """Main program."""
+    parser = argparse.ArgumentParser("CalibrateKinematic")
+    parser.add_argument("--runs", type=int, default=5, help="The number of random runs to average the trajectory errors over.")
+    parser.add_argument("--time", type=float, default=30, help="The number of simulated seconds to measure the throughput over.")
+    arguments = parser.parse_args()
+
+    with open("Token Position Config.json") as TokenConfig:
+        defaultTokenConfig = json.loads(TokenConfig.read())
+    for scenarioName, tokenConfig in [("Open arena (no tokens)", {}), ("Competition tokens", defaultTokenConfig)]:
+        print(scenarioName)
+        print("{:>10}{:>22}{:>22}{:>27}".format("Time (s)", "Mean position error", "Max position error", "Mean heading error (deg)"))
+        positionErrors = {}
+        headingErrors = {}
+        agreements = []
+        for run in range(arguments.runs):
+            errors, agreement = _compareTrajectories(tokenConfig, run)
+            agreements.append(agreement)
+            for checkpoint, runPositionErrors, runHeadingErrors in errors:
+                positionErrors.setdefault(checkpoint, []).extend(runPositionErrors)
+                headingErrors.setdefault(checkpoint, []).extend(runHeadingErrors)
+        for checkpoint in _checkpoints:
+            print("{:>10}{:>22.3f}{:>22.3f}{:>27.1f}".format(checkpoint, numpy.mean(positionErrors[checkpoint]), numpy.max(positionErrors[checkpoint]),
+                                                           math.degrees(numpy.mean(headingErrors[checkpoint]))))
+        print("Scores agree on {:.1%} of steps.".format(numpy.mean(agreements)))
+        print()
+
+    print("{:>10}{:>20}{:>24}{:>10}".format("Arenas", "pymunk steps/s", "Kinematic arena steps/s", "Speedup"))
+    for arenaCount in [1, 16, 256, 4096]:
+        pymunkRate, kinematicRate = _measureThroughput(arguments.time, arenaCount)
+        print("{:>10}{:>20.0f}{:>24.0f}{:>10.1f}".format(arenaCount, pymunkRate, kinematicRate, kinematicRate / pymunkRate))
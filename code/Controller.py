@@ -1,81 +1,329 @@
 import sys
 import argparse
+import json
+import multiprocessing
+import multiprocessing.forkserver
+import runpy
 import subprocess
 import time
 import xmlrpc.client
 
-def trace(text):
-    """Prints a message to Standard Error for debugging - this avoids polluting the Standard Output (which is read by some processes)."""
-    print("In Controller: " + text, file = sys.stderr)
+#my modules
+import JobQueue
+import ResultCache
+import SimTrace
 
-if __name__ == "__main__":
-    """Main program."""
-    #Construct a list of all programs to test.
-    parser = argparse.ArgumentParser("RobotClient")
-    parser.add_argument("--test", action="append", help="The filename of the program to test.")
-    arguments = parser.parse_args()
-    programsToTest = []
-    if arguments.test:
-        for testProgram in arguments.test:
-            programsToTest.append(testProgram)
+def _runRobotProgram(testProgram, serviceURL):
+    """Runs a robot program inside a process forked from the pre-warmed forkserver, as if it had been started with "python3 testProgram --url serviceURL"."""
+    sys.argv = [testProgram, "--url", serviceURL]
+    runpy.run_path(testProgram, run_name="__main__")
 
-    #Start the simulator as a subprocess, then wait for it to print the URL of the ArenaThread's xmlrpc server.
-    #Once the controller recieves the URL, it connects to the server and stores the connection.
-    trace("Starting simulator process.")
-    simulator = subprocess.Popen( ["python3", "Simulator.py"], stdout=subprocess.PIPE)
-    trace("Started simulator, waiting for URL.")
+def launchRobotProgram(testProgram, serviceURL, context = None):
+    """Starts a robot program connected to the given RobotService URL, and returns its process.
+    If a forkserver context is given, the program is forked from the pre-warmed interpreter instead of starting a new python3 process."""
+    if context == None:
+        return subprocess.Popen([ "python3", testProgram, "--url", serviceURL ])
+    process = context.Process(target = _runRobotProgram, args = (testProgram, serviceURL))
+    process.start()
+    return process
+
+def waitForRobotProgram(process):
+    """Waits for a robot program started by launchRobotProgram to finish."""
+    if isinstance(process, subprocess.Popen):
+        process.wait()
+    else:
+        process.join()
+
+def stopRobotProgram(process):
+    """Stops a robot program started by launchRobotProgram, and waits for it to finish."""
+    process.terminate()
+    waitForRobotProgram(process)
+
+def startSimulator(simulatorArguments):
+    """Starts the simulator as a subprocess, then waits for it to print the URL of the ArenaThread's xmlrpc server.
+    Once the controller recieves the URL, it connects to the server. Returns the simulator's process and the connection to the arena."""
+    SimTrace.trace("controller", "Starting simulator process.")
+    simulator = subprocess.Popen( ["python3", "Simulator.py"] + simulatorArguments, stdout=subprocess.PIPE)
+    SimTrace.trace("controller", "Started simulator, waiting for URL.")
     arena = None
     for line in simulator.stdout:
         text = line.decode('UTF-8').rstrip()
         #Printed lines come in as a Bytes object, and must be converted to a string.
         if text[0:12] == "Arena URL = ":
-            trace("URL recieved, connecting to the arena service.")
+            SimTrace.trace("controller", "URL recieved, connecting to the arena service.")
             arena = xmlrpc.client.ServerProxy(text[12:])
-            trace("Connected to arena service.")
+            SimTrace.trace("controller", "Connected to arena service.")
             break
+    if arena == None:
+        raise RuntimeError("The simulator ended before printing the arena's URL.")
+    return simulator, arena
 
-    #Starts the robot programs as subprocesses.
+def playMatch(arena, programsToTest, context = None, onOutput = print, onWait = None):
+    """Creates a robot for each program, starts the programs and plays the match, passing each message printed to onOutput,
+    and calling onWait (if given) each time the simulator hands control back. Returns the robot programs' processes, the scores,
+    and the wall-clock time each program spent thinking between its calls (see ArenaService.getThinkTimes())."""
+    #Creates all the robots first, then starts the robot programs together so they start up concurrently.
+    serviceURLs = []
+    for teamNumber in range(len(programsToTest)):
+        SimTrace.trace("controller", "Creating robot number %d", teamNumber)
+        serviceURLs.append(arena.createRobot(teamNumber))
+    SimTrace.trace("controller", "All robots created, starting test program subprocesses.")
     robots = []
-    teamNumber = 0
-    for testProgram in programsToTest:
-        trace("Creating robot number " + str(teamNumber))
-        serviceURL = arena.createRobot(teamNumber)
-        trace("Robot created, starting test program subprocess.")
-        robots.append( subprocess.Popen([ "python3", testProgram, "--url", serviceURL ]) )
-        trace("Test program subprocess created.")
-        teamNumber += 1
-    trace("All robots created, waiting for start.")
-    arena.waitForStart()
-    trace("Receiving control from Simulator.")
-    #Main loop.
-    isSimulatorRunning = True
-    while isSimulatorRunning:
-        trace("Yielding control to Simulator.")    
-        output = arena.waitForOutput(30)
-        trace("Receiving control from Simulator.")
-        isSimulatorRunning = output[0]
-        messages = output[1]
-        for message in messages:
-            print(message)
-    trace("Simulation no longer running. Calculating scores.")
-    #At this stage, the simulation has finished, and the simulator is waiting for a "terminate" call once the arena thread has finished.
-    scores = arena.getScores()
-    teamNumber = 0
-    for score in scores:
-        print("Team " + str(teamNumber) + " scored " + str(score) + " point(s)!")
-        teamNumber = teamNumber + 1
-    time.sleep(10)
-    #Allow 10 seconds for the user to view the final state of the simulation.
-    trace("Scores calculated, yielding control to Simulator.")
+    try:
+        for testProgram, serviceURL in zip(programsToTest, serviceURLs):
+            robots.append( launchRobotProgram(testProgram, serviceURL, context) )
+        SimTrace.trace("controller", "All test program subprocesses created, waiting for start.")
+        arena.waitForStart()
+        SimTrace.trace("controller", "Receiving control from Simulator.")
+        #Main loop.
+        isSimulatorRunning = True
+        while isSimulatorRunning:
+            SimTrace.trace("controller", "Yielding control to Simulator.")
+            output = arena.waitForOutput(30)
+            SimTrace.trace("controller", "Receiving control from Simulator.")
+            isSimulatorRunning = output[0]
+            messages = output[1]
+            for message in messages:
+                onOutput(message)
+            if onWait != None:
+                onWait()
+        SimTrace.trace("controller", "Simulation no longer running. Calculating scores.")
+        #At this stage, the simulation has finished, and the simulator is waiting for a "terminate" (or "reset") call once the arena thread has finished.
+        return robots, arena.getScores(), arena.getThinkTimes()
+    except BaseException:
+        #The robot programs are stopped, rather than left running, if the match can't be finished.
+        for robot in robots:
+            stopRobotProgram(robot)
+        raise
+
+def stopSimulator(simulator, arena, robots):
+    """Tells the simulator to finish once the last match has ended, and waits for it and the robot programs to finish."""
+    SimTrace.trace("controller", "Scores calculated, yielding control to Simulator.")
     arena.terminate()
-    trace("Receiving control from Simulator.")
-    #Shutdown all subprocesses cleanly.
-    arena = None
-    trace("Waiting for Simulator finish.")
+    SimTrace.trace("controller", "Receiving control from Simulator.")
+    SimTrace.trace("controller", "Waiting for Simulator finish.")
     simulator.wait()
-    trace("Simulator has finished.")
+    SimTrace.trace("controller", "Simulator has finished.")
     for robot in robots:
-        trace("Waiting for robot test program to finish.")
-        robot.wait()
-        trace("Robot test program has finished.")
-    trace("All subprocesses have finished. Simulation successful.")
+        SimTrace.trace("controller", "Waiting for robot test program to finish.")
+        waitForRobotProgram(robot)
+        SimTrace.trace("controller", "Robot test program has finished.")
+
+def killSimulator(simulator, robots):
+    """Stops the simulator and the robot programs straight away, for when the matches can't be finished."""
+    SimTrace.trace("controller", "Killing the simulator and robot test programs.")
+    for robot in robots:
+        stopRobotProgram(robot)
+    if simulator != None:
+        simulator.kill()
+        simulator.wait()
+
+def playMatches(programsToTest, matchCount, simulatorArguments, context = None, randomSeed = None, arenaConfig = None, tokenConfig = None,
+                resultCache = None, onMatchStart = None, onOutput = print, onMatchEnd = None, onWait = None, viewTime = 0):
+    """Plays a number of matches between the programs, one after another in the same simulator, and returns a list of each match's result:
+    a dictionary of the "Scores", the "Output" printed, the "Think Times" of each program, and if the result was "Cached". If a seed is given, each match is seeded with the next seed
+    after the last match's. If a ResultCache is given (and the matches are seeded), results already in it are used instead of playing the matches,
+    and the results of the matches that are played are stored in it. The simulator is only started if a match has to be played.
+    If the simulator's window is closed, the matches after the one being played are not played, and only the results so far are returned.
+    onMatchStart is called with the match number before each match, onOutput with each message printed, and onMatchEnd with the match number and result
+    after each match. The final state of the last match played is left on the display for viewTime seconds."""
+    if arenaConfig:
+        simulatorArguments = simulatorArguments + ["--arena-config", arenaConfig]
+    if tokenConfig:
+        simulatorArguments = simulatorArguments + ["--token-config", tokenConfig]
+    simulator = None
+    robots = []
+    results = []
+    try:
+        for matchNumber in range(matchCount):
+            if onMatchStart != None:
+                onMatchStart(matchNumber)
+            matchSeed = randomSeed + matchNumber if randomSeed != None else None
+            cacheKey = None
+            result = None
+            if resultCache != None and matchSeed != None:
+                cacheKey = resultCache.getKey(programsToTest, ResultCache.getConfigFilenames(arenaConfig, tokenConfig), matchSeed)
+                result = resultCache.get(cacheKey)
+            if result != None:
+                SimTrace.trace("controller", "Match %d is in the result cache.", matchNumber + 1)
+                for message in result["Output"]:
+                    onOutput(message)
+                result["Cached"] = True
+            else:
+                if simulator == None:
+                    #The first match played may not be the first match, if the ones before it were in the result cache.
+                    if matchSeed != None:
+                        simulator, arena = startSimulator(simulatorArguments + ["--seed", str(matchSeed)])
+                    else:
+                        simulator, arena = startSimulator(simulatorArguments)
+                else:
+                    #The arena is reset for the next match within the same simulator, once the last match's programs have been stopped.
+                    for robot in robots:
+                        stopRobotProgram(robot)
+                    SimTrace.trace("controller", "Resetting the arena for match %d.", matchNumber + 1)
+                    if matchSeed != None:
+                        isReset = arena.reset(matchSeed)
+                    else:
+                        isReset = arena.reset()
+                    if not isReset:
+                        onOutput("The simulator's window was closed, so no more matches will be played.")
+                        break
+                messages = []
+                def onMatchOutput(message):
+                    messages.append(message)
+                    onOutput(message)
+                robots, scores, thinkTimes = playMatch(arena, programsToTest, context, onMatchOutput, onWait)
+                result = {"Scores" : scores, "Output" : messages, "Think Times" : thinkTimes}
+                if cacheKey != None:
+                    resultCache.put(cacheKey, result)
+                result["Cached"] = False
+            results.append(result)
+            if onMatchEnd != None:
+                onMatchEnd(matchNumber, result)
+    except BaseException:
+        killSimulator(simulator, robots)
+        raise
+    if simulator != None:
+        #Allow the user to view the final state of the simulation.
+        time.sleep(viewTime)
+        #Shutdown all subprocesses cleanly.
+        stopSimulator(simulator, arena, robots)
+    return results
+
+def runJob(queue, jobName, job, simulatorArguments, context = None, resultCache = None):
+    """Plays the matches of a job claimed from a job queue in a new simulator, and returns the result: the scores, messages printed
+    and the time each program spent thinking in each match.
+    A job is a dictionary with the list of "Programs" to test, and optionally the number of "Matches" to play with them, the "Seed" of the first match,
+    and the "Arena Config" and "Token Config" files to use."""
+    if not job.get("Programs"):
+        raise RuntimeError("Job " + jobName + " has no programs to test.")
+    startTime = time.perf_counter()
+    results = playMatches(job["Programs"], job.get("Matches", 1), simulatorArguments, context, job.get("Seed"), job.get("Arena Config"), job.get("Token Config"),
+                          resultCache, onOutput = lambda message: None, onWait = lambda: queue.touchJob(jobName))
+    if len(results) < job.get("Matches", 1):
+        raise RuntimeError("The simulator's window was closed before job " + jobName + " had finished.")
+    return {
+        "Scores" : [result["Scores"] for result in results],
+        "Output" : [result["Output"] for result in results],
+        "Think Times" : [result.get("Think Times") for result in results],
+        "Wall Time" : time.perf_counter() - startTime
+    }
+
+def runJobQueue(queueDirectory, staleTime, simulatorArguments, context = None, resultCache = None):
+    """Plays the jobs in a job queue until there are none left to claim, putting any abandoned jobs back in the queue first."""
+    queue = JobQueue.JobQueue(queueDirectory)
+    while True:
+        for jobName in queue.requeueAbandonedJobs(staleTime):
+            print("Job " + jobName + " was abandoned, and has been put back in the queue.")
+        claimedJob = queue.claimJob()
+        if claimedJob == None:
+            break
+        jobName, job = claimedJob
+        print("Playing job " + jobName + ".")
+        try:
+            result = runJob(queue, jobName, job, simulatorArguments, context, resultCache)
+        except BaseException:
+            #The job goes back in the queue for another worker, rather than waiting to be found abandoned.
+            queue.releaseJob(jobName)
+            raise
+        queue.completeJob(jobName, result)
+        print("Job " + jobName + " finished with scores " + json.dumps(result["Scores"]) + ".")
+    pendingCount, claimedCount, doneCount = queue.getCounts()
+    print("No jobs left to claim. {} job(s) are still being played by other workers, and {} have finished.".format(claimedCount, doneCount))
+
+if __name__ == "__main__":
+    """Main program."""
+    #Construct a list of all programs to test.
+    parser = argparse.ArgumentParser("RobotClient")
+    parser.add_argument("--test", action="append", help="The filename of the program to test.")
+    parser.add_argument("--prewarm", action="store_true", help="Fork the robot programs from a pre-warmed interpreter that has already imported RobotClient (Linux only).")
+    parser.add_argument("--matches", type=int, default=1, help="The number of matches to play one after another in the same simulator, with the same programs.")
+    parser.add_argument("--view-time", type=float, default=10, help="The number of seconds to leave the final state of the last match on the display.")
+    parser.add_argument("--queue", help="Play the jobs in this job queue directory (see JobQueue.py) until none are left, instead of the programs given with --test.")
+    parser.add_argument("--stale-time", type=float, default=600, help="The number of seconds after which a job in the queue that hasn't been worked on is taken to be abandoned, and played again.")
+    parser.add_argument("--seed", type=int, help="Seed the random noise in the robots' motors and cameras, so that matches can be repeated exactly. Each match after the first uses the next seed.")
+    parser.add_argument("--cache", help="Keep the results of seeded matches in this directory, and use them instead of playing matches that have already been played.")
+    parser.add_argument("--cache-size", type=float, default=100, help="The size (in MB) the result cache is kept under, by deleting the least recently used results.")
+    parser.add_argument("--speed", default="1", help="How many times faster than real time to run the simulation, or 0 to run it as fast as possible.")
+    parser.add_argument("--fps", default="64", help="The number of frames per second to draw the simulator display at.")
+    parser.add_argument("--steps-per-frame", default="0", help="If set, draw the simulator display every this many physics steps instead of at a fixed frame rate.")
+    parser.add_argument("--capture", help="Record the simulator display to this directory, drawing it offscreen instead of in a window.")
+    parser.add_argument("--capture-format", default="png", help="Record a numbered PNG image per frame (png), or a single raw video file (raw).")
+    parser.add_argument("--capture-queue", type=int, default=64, help="The number of captured frames that can be waiting to be written.")
+    parser.add_argument("--capture-policy", default="drop", help="Whether to drop captured frames (drop) or wait for the writer (block) when the queue is full.")
+    parser.add_argument("--trace-level", choices=["off", "info", "debug"], help="Print trace messages from the controller and simulator up to this level to Standard Error.")
+    parser.add_argument("--trace-categories", help="Only trace these comma separated categories (controller, startup, handoff, arena, robot, shutdown).")
+    parser.add_argument("--trace-file", help="Have the simulator write its most recent trace events to this file as Chrome trace event json.")
+    parser.add_argument("--visibility-atlas", help="Have the simulator look up the wall markers each robot could see in the visibility atlases in this directory.")
+    parser.add_argument("--profile-allocations", help="Have the simulator write a report of the memory allocated and garbage collections during the match, by subsystem, to this file.")
+    parser.add_argument("--serial-handoff", action="store_true", help="Have the simulator release the robot programs due in a step one at a time instead of all at once.")
+    parser.add_argument("--think-time-policy", choices=["measure", "charge", "throttle"], default="measure", help="What the simulator does about the wall-clock time each robot program spends thinking between its calls: only measure it, charge it as simulated time, or slow down programs that think for longer than the budget.")
+    parser.add_argument("--think-time-scale", default="1", help="The number of simulated seconds charged for each wall-clock second a robot program thinks for, with --think-time-policy charge.")
+    parser.add_argument("--think-time-budget", default="0.1", help="The wall-clock seconds each robot program may think for per simulated second, with --think-time-policy throttle.")
+    parser.add_argument("--metrics", help="Have the simulator write the metrics of the run (the calls to each service, their latencies, and the steps per second) to this json file.")
+    arguments = parser.parse_args()
+    SimTrace.configure(arguments.trace_level or "off", arguments.trace_categories, processName = "Controller")
+    programsToTest = []
+    if arguments.test:
+        for testProgram in arguments.test:
+            programsToTest.append(testProgram)
+
+    simulatorArguments = ["--speed", arguments.speed, "--fps", arguments.fps, "--steps-per-frame", arguments.steps_per_frame]
+    if arguments.capture:
+        simulatorArguments += ["--capture", arguments.capture, "--capture-format", arguments.capture_format,
+                               "--capture-queue", str(arguments.capture_queue), "--capture-policy", arguments.capture_policy]
+    for option, value in [("--trace-level", arguments.trace_level), ("--trace-categories", arguments.trace_categories), ("--trace-file", arguments.trace_file),
+                          ("--profile-allocations", arguments.profile_allocations), ("--visibility-atlas", arguments.visibility_atlas)]:
+        if value:
+            simulatorArguments += [option, value]
+    if arguments.metrics:
+        simulatorArguments += ["--metrics", arguments.metrics]
+    if arguments.serial_handoff:
+        simulatorArguments += ["--serial-handoff"]
+    simulatorArguments += ["--think-time-policy", arguments.think_time_policy, "--think-time-scale", arguments.think_time_scale,
+                           "--think-time-budget", arguments.think_time_budget]
+    #The forkserver imports RobotClient (and argparse and xmlrpc) once, so the robot programs forked from it don't each have to import them.
+    forkserverContext = None
+    if arguments.prewarm:
+        SimTrace.trace("controller", "Starting pre-warmed forkserver for the robot programs.")
+        forkserverContext = multiprocessing.get_context("forkserver")
+        forkserverContext.set_forkserver_preload(["RobotClient"])
+        multiprocessing.forkserver.ensure_running()
+
+    resultCache = None
+    if arguments.cache:
+        resultCache = ResultCache.ResultCache(arguments.cache, int(arguments.cache_size * 1024 * 1024))
+        if arguments.seed == None and not arguments.queue:
+            print("Only seeded matches can be cached, so the result cache won't be used without --seed.")
+        if arguments.think_time_policy != "measure":
+            #Charging the programs for the time they think makes the matches depend on how fast the machine is, so they can't be repeated.
+            print("Matches that charge the robot programs for thinking can't be repeated, so the result cache won't be used.")
+            resultCache = None
+
+    if arguments.queue:
+        runJobQueue(arguments.queue, arguments.stale_time, simulatorArguments, forkserverContext, resultCache)
+        SimTrace.flush()
+        sys.exit()
+
+    def printMatchNumber(matchNumber):
+        if arguments.matches > 1:
+            print("Match " + str(matchNumber + 1) + " of " + str(arguments.matches) + ":")
+    def printScores(matchNumber, result):
+        if result["Cached"]:
+            print("(This match's result was found in the result cache.)")
+        teamNumber = 0
+        for score in result["Scores"]:
+            print("Team " + str(teamNumber) + " scored " + str(score) + " point(s)!")
+            teamNumber = teamNumber + 1
+        #Results cached before the think times were recorded don't have them.
+        for thinkTime in result.get("Think Times") or []:
+            message = "Team {}'s program thought for {:.3f} wall-clock seconds".format(thinkTime["Team"], thinkTime["Think Time"])
+            if thinkTime["Charged Time"] > 0:
+                message += ", and was charged {:.3f} simulated seconds".format(thinkTime["Charged Time"])
+            if thinkTime["Over Budget"]:
+                message += ", going over its budget"
+            print(message + ".")
+    playMatches(programsToTest, arguments.matches, simulatorArguments, forkserverContext, arguments.seed, resultCache = resultCache,
+                onMatchStart = printMatchNumber, onMatchEnd = printScores, viewTime = arguments.view_time)
+    SimTrace.trace("controller", "All subprocesses have finished. Simulation successful.")
+    SimTrace.flush()
@@ -0,0 +1,123 @@
+import json
+import os
+import socket
+import time
+
+"""A queue of matches to play, kept as files in a directory so that several Controllers can work through it at once, on one machine or on
+several machines sharing the directory, without any other service.
+
+Each job is a json file describing a match, which moves between three subdirectories of the queue's directory as it is worked on:
+    pending/    jobs waiting to be played.
+    claimed/    jobs a worker is playing. Renaming a file is atomic, so only one worker can claim each job by renaming it from pending.
+    done/       finished jobs, each with its result next to it in a file of the same name ending in ".result.json".
+A worker that is interrupted leaves its jobs in claimed. While it plays a job it touches the job's file regularly, so a job that hasn't been
+touched for a while is taken to be abandoned, and is put back in pending for another worker. Finished jobs are never played again."""
+
+_resultSuffix = ".result.json"
+
+class JobQueue:
+    """A directory based job queue."""
+
+    def __init__(self, directory):
+        """Opens the queue in the given directory, creating its subdirectories if they don't already exist."""
+        self.directory = directory
+        self.pendingDirectory = os.path.join(directory, "pending")
+        self.claimedDirectory = os.path.join(directory, "claimed")
+        self.doneDirectory = os.path.join(directory, "done")
+        for subdirectory in [self.pendingDirectory, self.claimedDirectory, self.doneDirectory]:
+            os.makedirs(subdirectory, exist_ok = True)
+        #The name of this worker, recorded in the results of the jobs it plays.
+        self.workerName = socket.gethostname() + ":" + str(os.getpid())
+
+    def _getJobNames(self, subdirectory):
+        """Returns the names of the jobs in a subdirectory, in order."""
+        return sorted(filename[:-5] for filename in os.listdir(subdirectory) if filename.endswith(".json") and not filename.endswith(_resultSuffix))
+
+    def addJob(self, jobName, job):
+        """Adds a job (a dictionary describing the match) to the queue, unless a job of the same name has already been added."""
+        if os.sep in jobName or jobName.startswith("."):
+            raise RuntimeError("Invalid job name " + jobName + ".")
+        for subdirectory in [self.pendingDirectory, self.claimedDirectory, self.doneDirectory]:
+            if os.path.exists(os.path.join(subdirectory, jobName + ".json")):
+                return False
+        #The job is written under a temporary name first, so that no worker can claim it half written.
+        temporaryPath = os.path.join(self.pendingDirectory, "." + jobName + ".tmp")
+        with open(temporaryPath, "w") as jobFile:
+            json.dump(job, jobFile, indent = 4)
+        os.replace(temporaryPath, os.path.join(self.pendingDirectory, jobName + ".json"))
+        return True
+
+    def claimJob(self):
+        """Claims the next pending job, and returns its name and the job, or None if there are no pending jobs.
+        If another worker claims a job first, the next one is tried."""
+        for jobName in self._getJobNames(self.pendingDirectory):
+            claimedPath = os.path.join(self.claimedDirectory, jobName + ".json")
+            try:
+                os.rename(os.path.join(self.pendingDirectory, jobName + ".json"), claimedPath)
+            except FileNotFoundError:
+                continue
+            #The rename keeps the time the job was added, so the job is touched to show that it is being worked on.
+            os.utime(claimedPath)
+            with open(claimedPath) as jobFile:
+                return jobName, json.loads(jobFile.read())
+        return None
+
+    def touchJob(self, jobName):
+        """Marks a claimed job as still being worked on, so that it isn't taken to be abandoned."""
+        try:
+            os.utime(os.path.join(self.claimedDirectory, jobName + ".json"))
+        except FileNotFoundError:
+            #The job was taken to be abandoned and put back in pending, but the result can still be used once it is finished.
+            pass
+
+    def completeJob(self, jobName, result):
+        """Writes the result of a claimed job next to it in done, and moves the job there.
+        If the job was taken to be abandoned and put back in pending, it is taken back from there (or from claimed, if another worker has claimed it again)."""
+        result = dict(result)
+        result["Worker"] = self.workerName
+        temporaryPath = os.path.join(self.doneDirectory, "." + jobName + ".tmp")
+        with open(temporaryPath, "w") as resultFile:
+            json.dump(result, resultFile, indent = 4)
+        #The result is in place before the job is moved, so a job in done always has a result.
+        os.replace(temporaryPath, os.path.join(self.doneDirectory, jobName + _resultSuffix))
+        for subdirectory in [self.claimedDirectory, self.pendingDirectory]:
+            try:
+                os.replace(os.path.join(subdirectory, jobName + ".json"), os.path.join(self.doneDirectory, jobName + ".json"))
+                return
+            except FileNotFoundError:
+                continue
+
+    def releaseJob(self, jobName):
+        """Puts a claimed job back in pending, for when it can't be finished."""
+        os.replace(os.path.join(self.claimedDirectory, jobName + ".json"), os.path.join(self.pendingDirectory, jobName + ".json"))
+
+    def requeueAbandonedJobs(self, staleTime):
+        """Puts claimed jobs that haven't been touched for staleTime seconds back in pending, and returns their names.
+        A job whose result was written before its worker was interrupted is moved to done instead."""
+        requeuedJobs = []
+        for jobName in self._getJobNames(self.claimedDirectory):
+            claimedPath = os.path.join(self.claimedDirectory, jobName + ".json")
+            try:
+                if time.time() - os.path.getmtime(claimedPath) < staleTime:
+                    continue
+                if os.path.exists(os.path.join(self.doneDirectory, jobName + _resultSuffix)):
+                    os.rename(claimedPath, os.path.join(self.doneDirectory, jobName + ".json"))
+                else:
+                    os.rename(claimedPath, os.path.join(self.pendingDirectory, jobName + ".json"))
+                    requeuedJobs.append(jobName)
+            except FileNotFoundError:
+                #Another worker finished or requeued the job first.
+                continue
+        return requeuedJobs
+
+    def getResult(self, jobName):
+        """Returns the result of a finished job, or None if it hasn't finished."""
+        try:
+            with open(os.path.join(self.doneDirectory, jobName + _resultSuffix)) as resultFile:
+                return json.loads(resultFile.read())
+        except FileNotFoundError:
+            return None
+
+    def getCounts(self):
+        """Returns the number of pending, claimed and finished jobs."""
+        return (len(self._getJobNames(self.pendingDirectory)), len(self._getJobNames(self.claimedDirectory)), len(self._getJobNames(self.doneDirectory)))
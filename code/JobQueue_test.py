@@ -0,0 +1,72 @@
+import unittest
+import os
+import tempfile
+
+import JobQueue
+
+class JobQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.queue = JobQueue.JobQueue(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testEachJobClaimedOnce(self):
+        """Tests that two workers sharing a queue claim different jobs, and that finished jobs have their results next to them."""
+        otherQueue = JobQueue.JobQueue(self.directory.name)
+        self.assertTrue(self.queue.addJob("match 1", {"Programs" : ["TestProgramLazy.py"]}))
+        self.assertTrue(self.queue.addJob("match 2", {"Programs" : ["TestProgramFancy.py"]}))
+        self.assertFalse(self.queue.addJob("match 1", {"Programs" : []}))
+        firstName, firstJob = self.queue.claimJob()
+        secondName, secondJob = otherQueue.claimJob()
+        self.assertEqual((firstName, firstJob), ("match 1", {"Programs" : ["TestProgramLazy.py"]}))
+        self.assertEqual(secondName, "match 2")
+        self.assertIsNone(self.queue.claimJob())
+        self.queue.completeJob(firstName, {"Scores" : [[1, 0, 0, 0]]})
+        self.assertEqual(self.queue.getResult(firstName)["Scores"], [[1, 0, 0, 0]])
+        self.assertIsNone(self.queue.getResult(secondName))
+        self.assertEqual(self.queue.getCounts(), (0, 1, 1))
+        #A finished job isn't added again.
+        self.assertFalse(self.queue.addJob("match 1", {"Programs" : []}))
+
+    def testAbandonedJobsRequeued(self):
+        """Tests that a job left claimed by an interrupted worker is put back in the queue once it is stale, unless its result was already written."""
+        self.queue.addJob("match 1", {"Programs" : ["TestProgramLazy.py"]})
+        self.queue.addJob("match 2", {"Programs" : ["TestProgramLazy.py"]})
+        self.queue.claimJob()
+        self.queue.claimJob()
+        self.assertEqual(self.queue.requeueAbandonedJobs(60), [])
+        #The second worker was interrupted after writing its result, but before moving its job to done.
+        self.queue.completeJob("match 2", {"Scores" : [[0, 0, 0, 0]]})
+        os.rename(os.path.join(self.queue.doneDirectory, "match 2.json"), os.path.join(self.queue.claimedDirectory, "match 2.json"))
+        for jobName in ["match 1", "match 2"]:
+            os.utime(os.path.join(self.queue.claimedDirectory, jobName + ".json"), (0, 0))
+        self.assertEqual(self.queue.requeueAbandonedJobs(60), ["match 1"])
+        self.assertEqual(self.queue.getCounts(), (1, 0, 1))
+        self.assertEqual(self.queue.claimJob()[0], "match 1")
+
+    def testSlowJobCompletedAfterRequeue(self):
+        """Tests that a job taken to be abandoned while its worker was still playing it is finished by that worker, whether or not it has been claimed again."""
+        otherQueue = JobQueue.JobQueue(self.directory.name)
+        self.queue.addJob("match 1", {"Programs" : ["TestProgramLazy.py"]})
+        self.queue.addJob("match 2", {"Programs" : ["TestProgramLazy.py"]})
+        self.queue.claimJob()
+        self.queue.claimJob()
+        for jobName in ["match 1", "match 2"]:
+            os.utime(os.path.join(self.queue.claimedDirectory, jobName + ".json"), (0, 0))
+        self.assertEqual(otherQueue.requeueAbandonedJobs(60), ["match 1", "match 2"])
+        self.assertEqual(otherQueue.claimJob()[0], "match 1")
+        self.queue.touchJob("match 2")
+        self.queue.completeJob("match 1", {"Scores" : [[1, 0, 0, 0]]})
+        self.queue.completeJob("match 2", {"Scores" : [[2, 0, 0, 0]]})
+        self.assertEqual(self.queue.getResult("match 1")["Scores"], [[1, 0, 0, 0]])
+        self.assertEqual(self.queue.getResult("match 2")["Scores"], [[2, 0, 0, 0]])
+        self.assertEqual(self.queue.getCounts(), (0, 0, 2))
+        #The worker that claimed the job again can still finish it.
+        otherQueue.completeJob("match 1", {"Scores" : [[1, 0, 0, 0]]})
+        self.assertEqual(self.queue.getCounts(), (0, 0, 2))
+
+if __name__ == '__main__':
+    unittest.main()
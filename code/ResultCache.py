@@ -0,0 +1,104 @@
+import glob
+import hashlib
+import json
+import os
+
+"""A cache of the results of matches, kept as files in a directory, so that a match that has already been played is never simulated again.
+
+Each result is stored under a hash of everything that decides how the match plays out: the source of each robot program (in team order),
+the contents of the arena, token and robot config files, the version of the simulator (a hash of its source), and the seed of the robots' noise.
+Matches are only repeatable when they are seeded, and when the robot programs don't use any randomness of their own.
+The cache is kept under a maximum size by deleting the results that were least recently used, which are the ones whose files were least recently touched."""
+
+_resultSuffix = ".result.json"
+
+def _hashFiles(hasher, filenames):
+    """Adds the names and contents of the files to a hash, in order."""
+    for filename in filenames:
+        hasher.update(os.path.basename(filename).encode("UTF-8") + b"\0")
+        with open(filename, "rb") as hashedFile:
+            contents = hashedFile.read()
+        hasher.update(str(len(contents)).encode("UTF-8") + b"\0" + contents)
+
+def getSimulatorVersion():
+    """Returns a hash of the source of the modules the simulator and the robot programs' clients run, which changes whenever either of them does."""
+    hasher = hashlib.sha256()
+    filenames = [filename for filename in glob.glob("Sim*.py") if not filename.endswith("_test.py")] + ["vector3.py", "RobotClient.py", "AsyncRobotClient.py"]
+    _hashFiles(hasher, sorted(filenames))
+    return hasher.hexdigest()
+
+def getConfigFilenames(arenaConfig = None, tokenConfig = None):
+    """Returns the config files a match reads: the arena and token config files given (or the defaults), and every robot config file."""
+    return [arenaConfig or "Arena Config.json", tokenConfig or "Token Position Config.json"] + sorted(glob.glob("Robot * Config.json"))
+
+class ResultCache:
+    """A directory of match results, kept under a maximum size."""
+
+    def __init__(self, directory, maxSize = 100 * 1024 * 1024):
+        """Opens the cache in the given directory (creating it if needed), which is kept under maxSize bytes."""
+        self.directory = directory
+        self.maxSize = maxSize
+        self._simulatorVersion = None
+        os.makedirs(directory, exist_ok = True)
+
+    def getKey(self, programFilenames, configFilenames, randomSeed):
+        """Returns the key of a match between the robot programs (in team order), using the config files and the seed."""
+        if self._simulatorVersion == None:
+            self._simulatorVersion = getSimulatorVersion()
+        hasher = hashlib.sha256()
+        hasher.update(self._simulatorVersion.encode("UTF-8") + b"\0" + str(randomSeed).encode("UTF-8") + b"\0")
+        hasher.update(b"Programs\0")
+        _hashFiles(hasher, programFilenames)
+        hasher.update(b"Configs\0")
+        _hashFiles(hasher, configFilenames)
+        return hasher.hexdigest()
+
+    def _getPath(self, key):
+        """Returns the path of the file a result is stored in."""
+        return os.path.join(self.directory, key + _resultSuffix)
+
+    def get(self, key):
+        """Returns the result stored under the key, or None if there isn't one. The result is marked as the most recently used."""
+        path = self._getPath(key)
+        try:
+            with open(path) as resultFile:
+                result = json.loads(resultFile.read())
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return result
+
+    def put(self, key, result):
+        """Stores a result (a dictionary that can be written as json) under the key, then deletes the least recently used results
+        until the cache is under its maximum size."""
+        #The result is written under a temporary name first, so that no one reads it half written.
+        temporaryPath = os.path.join(self.directory, "." + key + "." + str(os.getpid()) + ".tmp")
+        with open(temporaryPath, "w") as resultFile:
+            json.dump(result, resultFile)
+        os.replace(temporaryPath, self._getPath(key))
+        self.evict()
+
+    def evict(self):
+        """Deletes the least recently used results until the cache is under its maximum size, and returns the number deleted."""
+        entries = []
+        totalSize = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(_resultSuffix):
+                try:
+                    status = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((status.st_mtime, status.st_size, entry.path))
+                totalSize += status.st_size
+        evictedCount = 0
+        for modifiedTime, size, path in sorted(entries):
+            if totalSize <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+                evictedCount += 1
+            except FileNotFoundError:
+                #Another process sharing the cache deleted it first.
+                pass
+            totalSize -= size
+        return evictedCount
@@ -0,0 +1,46 @@
+import unittest
+import os
+import tempfile
+
+#The cache hashes the simulator's source files, which are in the directory this file is in.
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import ResultCache
+
+class ResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ResultCache.ResultCache(self.directory.name, 800)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testKeys(self):
+        """Tests that a match's key changes with its programs, their order, its configs and its seed, but not otherwise."""
+        configFilenames = ResultCache.getConfigFilenames()
+        key = self.cache.getKey(["TestProgramFancy.py", "TestProgramLazy.py"], configFilenames, 1)
+        self.assertEqual(self.cache.getKey(["TestProgramFancy.py", "TestProgramLazy.py"], configFilenames, 1), key)
+        self.assertNotEqual(self.cache.getKey(["TestProgramLazy.py", "TestProgramFancy.py"], configFilenames, 1), key)
+        self.assertNotEqual(self.cache.getKey(["TestProgramFancy.py", "TestProgramLazy.py"], configFilenames, 2), key)
+        self.assertNotEqual(self.cache.getKey(["TestProgramFancy.py", "TestProgramLazy.py"], configFilenames[1:], 1), key)
+
+    def testLeastRecentlyUsedEvicted(self):
+        """Tests that results are returned until the cache is too big, and then the least recently used ones are deleted."""
+        result = {"Scores" : [0, 1, 2, 3], "Output" : ["x" * 200]}
+        for key in ["a", "b", "c"]:
+            self.cache.put(key, result)
+            #The times the files were last used are only compared, so they are set apart rather than waiting between puts.
+            os.utime(os.path.join(self.directory.name, key + ".result.json"), (0, {"a" : 100, "b" : 200, "c" : 300}[key]))
+        self.assertEqual(self.cache.get("b"), result)
+        self.assertIsNone(self.cache.get("d"))
+        self.cache.put("d", result)
+        #Three results fit in the cache, so only the oldest is deleted. Getting "b" made it more recently used than "c".
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.put("e", result)
+        self.assertIsNone(self.cache.get("c"))
+        self.assertEqual(self.cache.get("b"), result)
+        self.assertEqual(self.cache.get("d"), result)
+
+if __name__ == '__main__':
+    unittest.main()
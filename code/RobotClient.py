@@ -72,31 +72,29 @@ class Point:
 
 class MarkerInfo:
 
-    def __init__(self, id, size, teamNumber):
+    def __init__(self, id, size, bodyType, offset, teamNumber):
+        """The type of the body the marker is on ("Arena", "Ore" or "Team t Gold") and the marker's offset are sent by the simulator,
+        as marker ids are allocated to fit the number of teams and tokens in the arena."""
         self.code = id
         self.size = size
-        if id <= 23:
+        self.offset = offset
+        if bodyType == "Arena":
             self.marker_type = MARKER_ARENA
             self.token_type = TOKEN_NONE
-            self.offset = id
-        elif id >= 32 and id <= 41:
+        elif bodyType == "Ore":
             self.marker_type = MARKER_TOKEN
             self.token_type = TOKEN_ORE
-            self.offset = id - 32
         else:
-            goldOffset = id - 42
             self.marker_type = MARKER_TOKEN
-            goldTeam = id // 4
-            if goldTeam == teamNumber:
+            if bodyType == "Team " + str(teamNumber) + " Gold":
                 self.token_type = TOKEN_GOLD
             else:
                 self.token_type = TOKEN_FOOLS_GOLD
-            self.offset = goldOffset % 4
 
 class Marker:
 
     def __init__(self, resolution, fieldOfView, cameraPosition, cameraNormal, currentTimestamp, teamNumber, markerDictionary):
-        self.info = MarkerInfo(markerDictionary["Id"], markerDictionary["Size"], teamNumber)
+        self.info = MarkerInfo(markerDictionary["Id"], markerDictionary["Size"], markerDictionary["Type"], markerDictionary["Offset"], teamNumber)
         markerCentrePoint = 0.5 * ( constructFromDictionary(markerDictionary["Corners"][0]) + constructFromDictionary(markerDictionary["Corners"][2]) )
         self.centre = Point(resolution, fieldOfView, cameraPosition, cameraNormal, markerCentrePoint)
         self.vertices = []
@@ -1,151 +1,237 @@
+import math
 import sys
 import threading
 import xmlrpc.server
-import time
 import pymunk
 import json
 
 #my modules
 import SimBase
 import SimRobot
+import SimScoring
+import SimState
+import SimTrace
 
-def _tokenTypeToInteger(tokenType):
-    """A helper function to convert from the type of the token to the first token with that id."""
-    typeToInt = {
-        "Ore" : 32,
-        "Team 0 Gold" : 42,
-        "Team 1 Gold" : 45,
-        "Team 2 Gold" : 48,
-        "Team 3 Gold" : 51
-    }
-    return typeToInt[tokenType]
+def _getTeamOfGold(tokenType):
+    """A helper function that returns the team of a gold token type, for example 2 for "Team 2 Gold"."""
+    words = tokenType.split(" ")
+    if len(words) != 3 or words[0] != "Team" or words[2] != "Gold" or not words[1].isdigit():
+        raise RuntimeError("Invalid token type " + tokenType + " in the token config.")
+    return int(words[1])
 
+def _getFirstTokenIds(tokenCounts, firstTokenId):
+    """A helper function that takes the number of tokens of each type, and allocates a block of ids to each type.
+    Returns a dictionary of the first id of each type.
+
+    Ore gets the first block, followed by the gold for each team in order. Ore gets a block of at least 10 ids, and each team's gold a block
+    of at least 3, so that with the competition's tokens the ids are the same as the competition's. Types with more tokens get larger blocks."""
+    goldTeams = set(range(SimBase.teamCount))
+    for tokenType in tokenCounts:
+        if tokenType != "Ore":
+            goldTeams.add(_getTeamOfGold(tokenType))
+
+    firstTokenIds = {}
+    currentId = firstTokenId
+    firstTokenIds["Ore"] = currentId
+    currentId += max(10, tokenCounts.get("Ore", 0))
+    for team in sorted(goldTeams):
+        tokenType = "Team " + str(team) + " Gold"
+        firstTokenIds[tokenType] = currentId
+        currentId += max(3, tokenCounts.get(tokenType, 0))
+    return firstTokenIds
 class ArenaService:
     """Handles the creation of the arena and provides services to the Controller."""
 
-    def __init__(self):
+    def __init__(self, arenaConfig = None, tokenConfig = None):
         """Initialises the arena, creating and configuring the space, creating a collision handler to track all active token and robot collisions,
-        and populates the arena with walls, zones and tokens (but not robots)."""
-        SimBase.space = pymunk.Space()
+        and populates the arena with walls, zones and tokens (but not robots).
+        The arena and tokens are configured using the dictionaries given, or the ones in the arena and token config files if none are given."""
+        if arenaConfig == None:
+            with open("Arena Config.json") as ArenaConfig:
+                arenaConfig = json.loads(ArenaConfig.read())[0]
+        if tokenConfig == None:
+            with open("Token Position Config.json") as TokenConfig:
+                tokenConfig = json.loads(TokenConfig.read())
+        #The configs are kept so that the arena can be built again for the next match without reading them again.
+        self._arenaConfig = arenaConfig
+        self._tokenConfig = tokenConfig
+        self._matchLength = SimBase.endTime
+        self._createArena()
+
+    def _createArena(self):
+        """Creates and configures a new space, and populates it with walls, zones and tokens from the configs."""
+        arenaConfig = self._arenaConfig
+        tokenConfig = self._tokenConfig
+        #The arena has a side for each team, so it needs at least three teams to be enclosed.
+        SimBase.teamCount = SimBase.sanitiseInput(arenaConfig["Teams"], int, 4, 3)
+        SimBase.wallDistance = SimBase.sanitiseInput(arenaConfig["Wall Distance"], float, 3, 1)
+
+        #pymunk's threaded solver is not available on Windows.
+        isThreaded = SimBase.sanitiseInput(arenaConfig["Threaded Solver"], bool, False) and sys.platform != "win32"
+        SimBase.space = pymunk.Space(threaded = isThreaded)
+        if isThreaded:
+            #pymunk supports at most 2 solver threads.
+            SimBase.space.threads = SimBase.sanitiseInput(arenaConfig["Solver Threads"], int, 2, 1, 2)
+        SimBase.space.iterations = SimBase.sanitiseInput(arenaConfig["Solver Iterations"], int, 10, 1)
         SimBase.space.damping = 0.01
+        #Bodies that have been moving slower than the idle speed for longer than the sleep time are put to sleep, and drop out of the solver
+        #until something touches them. A sleep time of 0 turns sleeping off.
+        sleepTimeThreshold = SimBase.sanitiseInput(arenaConfig["Sleep Time Threshold"], float, 0, 0)
+        if sleepTimeThreshold > 0:
+            SimBase.space.sleep_time_threshold = sleepTimeThreshold
+            SimBase.space.idle_speed_threshold = SimBase.sanitiseInput(arenaConfig["Idle Speed Threshold"], float, 0.02, 0)
+        SimBase.stepSize = SimBase.sanitiseInput(arenaConfig["Step Size"], float, 1/64, 0.001, 0.1)
+        SimBase.substeps = SimBase.sanitiseInput(arenaConfig["Substeps"], int, 1, 1, 100)
 
-        #Set up collision handler for when a robot touches a token.
-        self._scoringCollisions = []
-        #This is a list, indexed by the id of the robot, and the value is a list of token ids that are colliding with that robot.
-        #Since the arena doesn't know how many robots are going to be in the simulation yet, the list is populated with empty lists as robots are added.
-        collisionHandler = SimBase.space.add_collision_handler(1, 2)
-        collisionHandler.begin = self._robotTokenCollisionBegin
-        collisionHandler.separate = self._robotTokenCollisionEnd
+        #The score tracker binds collision handlers to keep track of which robots are touching which tokens, and which tokens are in which zones.
+        SimBase.scoreTracker = SimScoring.ScoreTracker(SimBase.space, SimBase.teamCount)
+        #The state table is read by the vision, display and robot services instead of reading each body from pymunk.
+        SimBase.stateTable = SimState.BodyStateTable()
 
-        #Create the walls:
+        #Create the walls. Each side is split into segments as close to 1m long as possible:
+        sideLength = SimBase.getSideLength()
+        segmentsPerSide = max(1, round(sideLength))
+        segmentLength = sideLength / segmentsPerSide
         id = 0
-        for teamSide in range(4):
-            for offset in range(6):
-                SimBase.WallSegment(id, offset, teamSide)
+        for teamSide in range(SimBase.teamCount):
+            for segmentNumber in range(segmentsPerSide):
+                SimBase.WallSegment(id, (segmentNumber + 0.5) * segmentLength - sideLength / 2, segmentLength, teamSide)
                 id += 1
         
         #Create the zones:
-        for team in range(4):
+        for team in range(SimBase.teamCount):
             SimBase.Zone(team)
         
-        #Create the tokens:
-        with open('Token Position Config.json') as TokenConfig:
-            TokenList = json.loads(TokenConfig.read())
-            for tokenType, tokenPositions in TokenList.items():
-                currentId = _tokenTypeToInteger(tokenType)
-                for tokenPosition in tokenPositions:
-                    #Sanitise the two coordinates, returning False if it is not the correct datatype, and restricting the values to within the arena.
-                    xPosition = SimBase.sanitiseInput(tokenPosition[0], float, False, -2.945, 2.945)
-                    yPosition = SimBase.sanitiseInput(tokenPosition[1], float, False, -2.945, 2.945)
-                    if isinstance(xPosition, float) and isinstance(yPosition, float):
-                        SimBase.Token(currentId, tokenType, xPosition, yPosition)
-                        currentId += 1
-
-    def _robotTokenCollisionBegin(self, arbiter, space, data):
-        """A function that gets bound to the CollisionHandler, which adds the token/robot pair to the list of active collisions."""
-        #First, work out which of the shapes is the robot, and which is the token.
-        token = None
-        robot = None
-        if isinstance(arbiter.shapes[0].body, SimBase.Token):
-            token = arbiter.shapes[0].body
-            robot = arbiter.shapes[1].body
-        else:
-            robot = arbiter.shapes[0].body
-            token = arbiter.shapes[1].body
-        self._scoringCollisions[robot.teamNumber].append(token.id)
-        return True
-        #This tells the collision handler to handle the physics of the collision normally.
-
-    def _robotTokenCollisionEnd(self, arbiter, space, data):
-        """A function that gets bound to the CollisionHandler, which removes the token/robot pair from the list of active collisions."""
-        #First, work out which of the shapes is the robot, and which is the token.
-        token = None
-        robot = None
-        if isinstance(arbiter.shapes[0].body, SimBase.Token):
-            token = arbiter.shapes[0].body
-            robot = arbiter.shapes[1].body
-        else:
-            robot = arbiter.shapes[0].body
-            token = arbiter.shapes[1].body
-        self._scoringCollisions[robot.teamNumber].remove(token.id)
+        #Create the tokens. Token ids start after the wall segment ids, and no earlier than 32:
+        tokenCounts = {}
+        for tokenType, tokenPositions in tokenConfig.items():
+            tokenCounts[tokenType] = len(tokenPositions)
+        firstTokenIds = _getFirstTokenIds(tokenCounts, max(32, id))
+        #Tokens are restricted to within the arena's walls, whatever its number of sides.
+        wallNormals = [(-math.cos(SimBase.getTeamAngle(team)), -math.sin(SimBase.getTeamAngle(team))) for team in range(SimBase.teamCount)]
+        positionLimit = SimBase.wallDistance - 0.055
+        for tokenType, tokenPositions in tokenConfig.items():
+            offset = 0
+            for tokenPosition in tokenPositions:
+                #Sanitise the two coordinates, returning False if it is not the correct datatype, and then move the position inside the walls.
+                xPosition = SimBase.sanitiseInput(tokenPosition[0], float, False)
+                yPosition = SimBase.sanitiseInput(tokenPosition[1], float, False)
+                if isinstance(xPosition, float) and isinstance(yPosition, float):
+                    xPosition, yPosition = SimBase.clampInsideWalls(xPosition, yPosition, wallNormals, positionLimit)
+                    SimBase.Token(firstTokenIds[tokenType] + offset, tokenType, xPosition, yPosition, offset)
+                    offset += 1
 
     def createRobot(self, teamNumber):
         """Creates a new robot thread (which then creates a robot service and robot body), and returns the connection URL to it's xmlrpc server."""
         if not SimBase.isSimulationRunning():
             raise RuntimeError("Attempted to create a robot when the simulation had already ended.")
-        
+        if teamNumber < 0 or teamNumber >= SimBase.teamCount:
+            raise RuntimeError("Attempted to create a robot for team " + str(teamNumber) + ", but the arena only has " + str(SimBase.teamCount) + " teams.")
+
+        #A robot thread left over from an earlier match is given a new robot body, rather than starting a new thread and server.
+        for idleThread in SimBase.idleRpcThreads:
+            if idleThread.teamNumber == teamNumber:
+                SimBase.idleRpcThreads.remove(idleThread)
+                idleThread.createRobotBody()
+                SimBase.rpcThreads.append(idleThread)
+                return idleThread.getUrl()
+
         newThread = SimRobot.RobotThread(teamNumber)
         SimBase.rpcThreads.append(newThread)
         newThread.start()
         url = newThread.getUrl()
-        self._scoringCollisions.append([])
 
         return url
 
+    def reset(self, randomSeed = None):
+        """Puts the arena back to how it was at the start of the match, ready for another match: the time, the walls, zones and tokens, and the scores.
+        The robots are removed, and their threads are kept to be reused when robots are created for the next match.
+        If a seed is given, the next match's robots' noise is seeded with it, otherwise the same seed is used again (if there is one).
+        This can only be called once the simulation has ended, and the previous match's robot programs should have been stopped first.
+        Returns False, without resetting the arena, if the display's window has been closed, as that ends the whole run."""
+        if SimBase.isSimulationRunning():
+            raise RuntimeError("Attempted to reset the arena before the simulation had ended.")
+        if SimBase.isQuitRequested:
+            return False
+        SimTrace.trace("startup", "Resetting the arena for the next match.")
+        arenaThread = threading.current_thread()
+        arenaThread.isReadyToStart = False
+        arenaThread.wakeUpTime = 0
+        for robotThread in SimBase.rpcThreads[1:]:
+            robotThread.isReadyToStart = False
+            robotThread.wakeUpTime = 0
+            robotThread.lastResponseTime = None
+            robotThread.thinkTime = 0
+            robotThread.chargedTime = 0
+            robotThread.isOverBudget = False
+            SimBase.idleRpcThreads.append(robotThread)
+        del SimBase.rpcThreads[1:]
+
+        if randomSeed != None:
+            SimBase.randomSeed = randomSeed
+        SimBase.theTime = 0
+        SimBase.endTime = self._matchLength
+        SimBase.pendingOutput = []
+        SimBase.wallSegments = []
+        SimBase.tokens = []
+        SimBase.robots = []
+        SimBase.zones = []
+        self._createArena()
+        return True
+
     def getScores(self):
-        """Calculates the scores of each team.
-        This is done by first summing the scores of each token, and then awarding an additional point to the team of each robot that left it's zone."""
-        scores = [0, 0, 0, 0]
-        for token in SimBase.tokens:
-            score, team = token.getScore(self._scoringCollisions)
-            scores[team] += score
-        
-        for robot in SimBase.robots:
-            if robot.hasLeftZone:
-                scores[robot.teamNumber] += 1
-            
-        return scores
+        """Returns the scores of each team.
+        These are kept up to date by the score tracker: each token's score, plus an additional point for the team of each robot that left it's zone."""
+        return SimBase.scoreTracker.getScores()
+
+    def getThinkTimes(self):
+        """Returns a list of the wall-clock time each team's robot program has spent thinking between its calls this match, while the simulation waited for it,
+        in team order. Each is a dictionary of the "Team", the "Think Time", the "Charged Time" (the simulated time it was charged for it),
+        and if it went "Over Budget"."""
+        thinkTimes = []
+        for robotThread in sorted(SimBase.rpcThreads[1:], key = lambda thread: thread.teamNumber):
+            thinkTimes.append({
+                "Team" : robotThread.teamNumber,
+                "Think Time" : robotThread.thinkTime,
+                "Charged Time" : robotThread.chargedTime,
+                "Over Budget" : robotThread.isOverBudget
+            })
+        return thinkTimes
+
+    def getMetrics(self):
+        """Returns the metrics of the simulation so far: the calls to each method of the arena and robot services (with their latencies and sizes),
+        the wall-clock time spent handing control between the simulator and the services, and the physics steps run per second."""
+        return SimBase.metrics.getMetrics(SimBase.theTime)
 
     def waitForOutput(self, time):
         """Clears the list of pending messages to send to the Controller, then waits for the simulated time to have elapsed, and then returns a tuple of
         if the simulation has finished yet, and a list of messages to print to the Standard Output."""
-        SimBase.trace("Entering ArenaService.waitForOutput()")
+        SimTrace.begin("arena", "ArenaService.waitForOutput()")
         messagesToSend = SimBase.pendingOutput
         SimBase.pendingOutput = []
 
         if not SimBase.isSimulationRunning():
-            SimBase.trace("Exiting ArenaService.waitForOutput()")
+            SimTrace.end("arena", "ArenaService.waitForOutput()")
             return (False, messagesToSend)
 
         arenaThread = threading.current_thread()
         arenaThread.wakeUpTime += time
         arenaThread.block()
 
-        SimBase.trace("Exiting ArenaService.waitForOutput()")
+        SimTrace.end("arena", "ArenaService.waitForOutput()")
         return (True, messagesToSend)
 
     def waitForStart(self):
         """Marks the arena as ready, then waits until all other threads (the robots) are ready, then blocks itself,
         unblocking the main thread and allowing it to enter the main simulator loop."""
-        SimBase.trace("Entering ArenaService.waitForStart()")
+        SimTrace.trace("startup", "Entering ArenaService.waitForStart()")
         arenaThread = threading.current_thread()
-        arenaThread.isReadyToStart = True
-        for thread in SimBase.rpcThreads:
-            SimBase.trace("Arena is waiting for " + str(thread.name))
-            while thread.isReadyToStart == False:
-               time.sleep(1)
-        
-        SimBase.trace("All robots ready, leaving ArenaService.waitForStart()")
+        arenaThread.markReadyToStart()
+        SimTrace.trace("startup", "Arena is waiting for %d robot(s)", len(SimBase.rpcThreads) - 1)
+        with SimBase.startCondition:
+            SimBase.startCondition.wait_for(lambda: all(thread.isReadyToStart for thread in SimBase.rpcThreads))
+
+        SimTrace.trace("startup", "All robots ready, leaving ArenaService.waitForStart()")
         arenaThread.block()
         return True
 
@@ -162,13 +248,20 @@ class ArenaService:
 class ArenaThread(SimBase.RpcThread):
     """A thread that handles the xmlrpc server to communicate with the Controller."""
     
+    def __init__(self, arenaConfig = None, tokenConfig = None):
+        """Initialises the thread, naming its service "Arena" in the metrics. The arena is configured using the dictionaries given, as in ArenaService."""
+        super().__init__()
+        self.serviceName = "Arena"
+        self._arenaConfig = arenaConfig
+        self._tokenConfig = tokenConfig
+
     def run(self):
         """Initialises the xmlrpc server, then prints connection details to the standard output, where they are caught by the Controller.
         Then connects the xmlrpc server to the ArenaService, and serves until stopped."""
-        self.server = xmlrpc.server.SimpleXMLRPCServer( ('localhost', 0), logRequests=False )
+        self.server = SimBase.MeteredXMLRPCServer(self.serviceName, ('localhost', 0))
         address = self.server.server_address
         print("Arena URL = http://{}:{}".format(address[0], address[1]))
         sys.stdout.flush() #flushing the stdout is required to allow the controller to see the message
-        self.server.register_instance(ArenaService())
+        self.server.register_instance(ArenaService(self._arenaConfig, self._tokenConfig))
         self.server.serve_forever()
         self.server.server_close()
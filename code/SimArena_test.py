@@ -0,0 +1,60 @@
+import unittest
+import json
+import math
+
+import SimTestCase
+import SimBase
+
+class ResetTest(SimTestCase.SimTestCase):
+
+    def _getBodyStates(self):
+        """Returns the position and angle of every body in the space."""
+        return [(tuple(body.position), body.angle) for body in SimBase.space.bodies]
+
+    def testSameAsNewArena(self):
+        """Tests that resetting the arena after a match puts the tokens back, and clears the robots, time and scores."""
+        #A short match, which the arena should keep the length of.
+        SimBase.endTime = 10
+        arena = self.createArena()
+        newStates = self._getBodyStates()
+        newScores = arena.getScores()
+
+        for teamNumber in range(SimBase.teamCount):
+            robot = SimBase.Robot(teamNumber)
+            robot.leftPower = 100
+            robot.rightPower = 80
+        while SimBase.isSimulationRunning():
+            SimBase.stepSimulation()
+
+        arena.reset()
+        self.assertEqual(SimBase.theTime, 0)
+        self.assertEqual(SimBase.endTime, 10)
+        self.assertTrue(SimBase.isSimulationRunning())
+        self.assertEqual(SimBase.robots, [])
+        self.assertEqual(arena.getScores(), newScores)
+        self.assertEqual(self._getBodyStates(), newStates)
+        self.assertRaises(RuntimeError, arena.reset)
+
+class TokenPlacementTest(SimTestCase.SimTestCase):
+
+    def testTokensInsideTriangularArena(self):
+        """Tests that tokens are moved inside the walls of a three sided arena, onto the nearest wall or corner, and that tokens already inside them are left alone,
+        even where they are further from the centre than the wall distance."""
+        with open("Arena Config.json") as ArenaConfig:
+            arenaConfig = json.loads(ArenaConfig.read())[0]
+        arenaConfig["Teams"] = 3
+        #The walls are 3m from the centre, with team 0's wall at x = -3, and the other two meeting in a corner at (6, 0).
+        self.createArena(arenaConfig, {"Ore" : [[4.0, 0.0], [2.9, 2.9], [-5.0, 1.0], [9.0, 0.0]]})
+        positions = [tuple(token.position) for token in SimBase.tokens]
+        self.assertEqual(positions[0], (4.0, 0.0))
+        self.assertAlmostEqual(positions[2][0], -2.945)
+        self.assertAlmostEqual(positions[2][1], 1.0)
+        self.assertAlmostEqual(positions[3][0], 2 * 2.945)
+        self.assertAlmostEqual(positions[3][1], 0)
+        for team in range(3):
+            angle = SimBase.getTeamAngle(team)
+            for x, y in positions:
+                self.assertLessEqual(-x * math.cos(angle) - y * math.sin(angle), 2.945 + 1e-9)
+
+if __name__ == '__main__':
+    unittest.main()
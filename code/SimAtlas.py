@@ -0,0 +1,167 @@
+import hashlib
+import json
+import math
+import os
+
+import numpy
+
+import SimBase
+
+"""A precomputed atlas of which wall markers a robot's camera could possibly see from each pose, so that SimVision.see() only tests those.
+
+The wall markers never move, so whether one passes the field of view and resolvability tests in SimVision.see() only depends on where the camera is,
+which way it faces, the camera's config and the image's width. The atlas is a grid of cells over the robot's position and heading, and stores
+the wall markers that could pass both tests from any pose in each cell. The tests are worked out at the centre of each cell, with margins for
+how far the camera's view can change within the cell, and with the lowest pixel threshold the noise can give, so no marker that could pass is left out.
+see() still runs the exact tests (and the occlusion test) on the candidates, so it finds exactly the same markers with or without the atlas.
+
+Atlases are built offline by BuildVisibilityAtlas.py, and saved as NumPy files named after a hash of everything they depend on, in the directory
+set by atlasDirectory. They are memory-mapped when first used, so only the pages for the cells the robots visit are read from the disk."""
+
+#The directory the atlases are kept in, or None if the atlas isn't used.
+atlasDirectory = None
+#The size of the cells of the grid over the robots' positions (in metres), and the number of cells the heading is split into.
+cellSize = 0.1
+headingCellCount = 72
+#The height of the centre of each wall marker, and its half size, the same as in SimVision.
+_wallMarkerHeight = 0.175
+_wallMarkerRadius = 0.125
+
+#The atlases that have been loaded, by the config of the camera they are for (None for those that haven't been built).
+_loadedAtlases = {}
+
+def getParameters(robot, resolution):
+    """Returns a dictionary of everything that decides which wall markers the robot's camera could see at the resolution, or None if it can't see any."""
+    if resolution[0] == 0 or robot.fieldOfView == 0:
+        return None
+    return {
+        "Teams" : SimBase.teamCount,
+        "Wall Distance" : SimBase.wallDistance,
+        "Cell Size" : cellSize,
+        "Heading Cells" : headingCellCount,
+        "Camera Offset" : robot.length / 2,
+        "Camera Height" : robot.cameraHeight,
+        "Field of View" : robot.fieldOfView,
+        "Marker Pixels Minimum" : robot.markerPixelsMinimum,
+        "Marker Pixels Noise Range" : robot.markerPixelsNoise,
+        "Image Width" : resolution[0]
+    }
+
+def getFilename(parameters):
+    """Returns the path of the atlas file for the parameters."""
+    parameterHash = hashlib.sha256(json.dumps(parameters, sort_keys = True).encode("UTF-8")).hexdigest()[:32]
+    return os.path.join(atlasDirectory, "Visibility Atlas " + parameterHash + ".npy")
+
+def _getWallMarkerCorners(teamCount, wallDistance):
+    """Returns an array of wall markers x 4 corners x 3 of the corners of every wall marker, in the order of the wall segments' ids."""
+    sideLength = round(2 * wallDistance * math.tan(math.pi / teamCount), 9)
+    segmentsPerSide = max(1, round(sideLength))
+    segmentLength = sideLength / segmentsPerSide
+    markers = []
+    for teamSide in range(teamCount):
+        angle = SimBase.getTeamAngle(teamSide)
+        cosAngle = math.cos(angle)
+        sinAngle = math.sin(angle)
+        for segmentNumber in range(segmentsPerSide):
+            #The same corners as SimVision._getMarkerCornersFromWallSegment().
+            x = -wallDistance
+            y = (segmentNumber + 0.5) * segmentLength - sideLength / 2
+            centre = numpy.array([x * cosAngle - y * sinAngle, x * sinAngle + y * cosAngle, _wallMarkerHeight])
+            radius = numpy.array([-_wallMarkerRadius * sinAngle, _wallMarkerRadius * cosAngle, 0])
+            up = numpy.array([0, 0, _wallMarkerRadius])
+            markers.append([centre - radius - up, centre + radius - up, centre + radius + up, centre - radius + up])
+    return numpy.array(markers)
+
+def _getAngles(vectorsA, vectorsB):
+    """Returns the angles between two arrays of vectors, along the last axis."""
+    cosAngles = (vectorsA * vectorsB).sum(axis = -1) / (numpy.linalg.norm(vectorsA, axis = -1) * numpy.linalg.norm(vectorsB, axis = -1))
+    return numpy.arccos(numpy.clip(cosAngles, -1, 1))
+
+def buildAtlas(parameters):
+    """Works out the wall markers that could be seen from each cell, and returns them as an array of x cells x y cells x heading cells x bytes,
+    with a bit for each wall marker (in the order of their ids, packed with numpy.packbits)."""
+    corners = _getWallMarkerCorners(parameters["Teams"], parameters["Wall Distance"])
+    wallDistance = parameters["Wall Distance"]
+    positionCellCount = int(math.ceil(2 * wallDistance / parameters["Cell Size"]))
+    positionCentres = -wallDistance + (numpy.arange(positionCellCount) + 0.5) * parameters["Cell Size"]
+    headingCellSize = 2 * math.pi / parameters["Heading Cells"]
+    headingCentres = -math.pi + (numpy.arange(parameters["Heading Cells"]) + 0.5) * headingCellSize
+    #The furthest the camera can be from where it is at the centre of a cell, and the most its direction can turn from it.
+    headingMargin = headingCellSize / 2
+    cameraMargin = parameters["Cell Size"] * math.sqrt(2) / 2 + parameters["Camera Offset"] * headingMargin
+    #The lowest pixel threshold see() can draw, and the smallest angle a marker can subtend and still be resolved with it.
+    pixelsMinimum = parameters["Marker Pixels Minimum"] + (-parameters["Marker Pixels Noise Range"] // 2)
+    minimumResolvableAngle = pixelsMinimum * parameters["Field of View"] / parameters["Image Width"]
+
+    #The cells are worked out a row of x at a time, as the vectors to every corner from every cell at once wouldn't fit in memory.
+    rows = []
+    for xCentre in positionCentres:
+        ys, headings = numpy.meshgrid(positionCentres, headingCentres, indexing = "ij")
+        cameraNormals = numpy.stack([numpy.cos(headings), numpy.sin(headings), numpy.zeros(headings.shape)], axis = -1)
+        cameraPositions = numpy.stack([numpy.full(ys.shape, xCentre), ys, numpy.full(ys.shape, parameters["Camera Height"])], axis = -1)
+        cameraPositions = cameraPositions + cameraNormals * parameters["Camera Offset"]
+        #An array of cells x markers x corners x 3 of the vectors from the camera to each corner.
+        vectors = corners - cameraPositions[..., None, None, :]
+        distances = numpy.linalg.norm(vectors, axis = -1)
+        #A vector turns by at most asin(margin / distance) when its start moves by the margin, and by any amount if it could move past its end.
+        turns = numpy.where(distances > cameraMargin, numpy.arcsin(numpy.minimum(cameraMargin / numpy.maximum(distances, 1e-9), 1)), math.pi)
+
+        #see() only needs the first corner inside the field of view for the marker to be visible.
+        isInView = _getAngles(cameraNormals[..., None, :], vectors[..., 0, :]) - headingMargin - turns[..., 0] <= parameters["Field of View"]
+        #The same angles as SimVision._isMarkerResolvable(), between the first corner and the second and fourth.
+        isResolvable = ((_getAngles(vectors[..., 0, :], vectors[..., 1, :]) + turns[..., 0] + turns[..., 1] > minimumResolvableAngle)
+                        & (_getAngles(vectors[..., 0, :], vectors[..., 3, :]) + turns[..., 0] + turns[..., 3] > minimumResolvableAngle))
+        rows.append(numpy.packbits(isInView & isResolvable, axis = -1))
+    return numpy.stack(rows)
+
+def saveAtlas(parameters):
+    """Builds the atlas for the parameters and saves it in the atlas directory, returning its filename."""
+    os.makedirs(atlasDirectory, exist_ok = True)
+    filename = getFilename(parameters)
+    #The atlas is written under a temporary name first, so that no simulator maps it half written.
+    temporaryFilename = filename + "." + str(os.getpid()) + ".tmp.npy"
+    numpy.save(temporaryFilename, buildAtlas(parameters))
+    os.replace(temporaryFilename, filename)
+    return filename
+
+class VisibilityAtlas:
+    """A memory-mapped atlas, which looks up the wall markers that could be seen from a pose."""
+
+    def __init__(self, filename, parameters):
+        """Maps the atlas file, built with the given parameters."""
+        self.cells = numpy.load(filename, mmap_mode = "r")
+        self._wallDistance = parameters["Wall Distance"]
+        self._cellSize = parameters["Cell Size"]
+        self._headingCellSize = 2 * math.pi / parameters["Heading Cells"]
+        markerCount = len(_getWallMarkerCorners(parameters["Teams"], parameters["Wall Distance"]))
+        self._markerIds = numpy.arange(markerCount)
+        #Most cells share the same few sets of candidates, so the set for each pattern of bits is only built once.
+        self._candidatesOfBits = {}
+
+    def getCandidates(self, x, y, angle):
+        """Returns the set of the ids of the wall markers that could be seen by a robot at the position and angle, or None if it is outside the atlas."""
+        xCell = int((x + self._wallDistance) // self._cellSize)
+        yCell = int((y + self._wallDistance) // self._cellSize)
+        if xCell < 0 or yCell < 0 or xCell >= self.cells.shape[0] or yCell >= self.cells.shape[1]:
+            return None
+        headingCell = int(((angle + math.pi) % (2 * math.pi)) // self._headingCellSize) % self.cells.shape[2]
+        bits = self.cells[xCell, yCell, headingCell].tobytes()
+        if bits not in self._candidatesOfBits:
+            isCandidate = numpy.unpackbits(numpy.frombuffer(bits, dtype = numpy.uint8))[:len(self._markerIds)].astype(bool)
+            self._candidatesOfBits[bits] = frozenset(self._markerIds[isCandidate].tolist())
+        return self._candidatesOfBits[bits]
+
+def getAtlas(robot, resolution):
+    """Returns the atlas for the robot's camera at the resolution, or None if the atlas isn't used or hasn't been built for it."""
+    if atlasDirectory == None:
+        return None
+    #This is called on every see(), so the atlas is looked up by the camera's config rather than hashing the parameters each time.
+    cameraKey = (SimBase.teamCount, SimBase.wallDistance, robot.length, robot.cameraHeight, robot.fieldOfView, robot.markerPixelsMinimum,
+                 robot.markerPixelsNoise, resolution[0])
+    if cameraKey not in _loadedAtlases:
+        parameters = getParameters(robot, resolution)
+        atlas = None
+        if parameters != None and os.path.exists(getFilename(parameters)):
+            atlas = VisibilityAtlas(getFilename(parameters), parameters)
+        _loadedAtlases[cameraKey] = atlas
+    return _loadedAtlases[cameraKey]
@@ -0,0 +1,58 @@
+import unittest
+import random
+import tempfile
+
+import SimTestCase
+import SimBase
+import SimAtlas
+import SimVision
+
+class VisibilityAtlasTest(SimTestCase.SimTestCase):
+
+    def setUp(self):
+        """Creates an arena with a robot per team, and a coarse atlas (which is quick to build) for team 0's robot."""
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.savedSettings = (SimAtlas.atlasDirectory, SimAtlas.cellSize, SimAtlas.headingCellCount)
+        SimAtlas.atlasDirectory = self.directory.name
+        SimAtlas.cellSize = 0.5
+        SimAtlas.headingCellCount = 16
+        self.createArena()
+        self.robots = [SimBase.Robot(teamNumber) for teamNumber in range(4)]
+        SimAtlas.saveAtlas(SimAtlas.getParameters(self.robots[0], (640, 480)))
+
+    def tearDown(self):
+        SimAtlas.atlasDirectory, SimAtlas.cellSize, SimAtlas.headingCellCount = self.savedSettings
+        SimAtlas._loadedAtlases.clear()
+        self.directory.cleanup()
+        super().tearDown()
+
+    def testSameMarkersAsWithoutAtlas(self):
+        """Tests that see() finds exactly the same markers with the atlas as without it, from random poses, and that the atlas skips most wall markers."""
+        robot = self.robots[0]
+        randomGenerator = random.Random(2019)
+        candidateCount = 0
+        for trial in range(20):
+            for movedRobot in self.robots:
+                movedRobot.position = (randomGenerator.uniform(-2.7, 2.7), randomGenerator.uniform(-2.7, 2.7))
+                movedRobot.angle = randomGenerator.uniform(-10, 10)
+            SimBase.stateTable.refresh()
+            #The marker noise is drawn from the robot's random generator, so it is put back to the same state for both calls.
+            randomState = robot.randomGenerator.getstate()
+            directory = SimAtlas.atlasDirectory
+            SimAtlas.atlasDirectory = None
+            markersWithoutAtlas = SimVision.see(robot, (640, 480), False)
+            SimAtlas.atlasDirectory = directory
+            robot.randomGenerator.setstate(randomState)
+            self.assertEqual(SimVision.see(robot, (640, 480), False), markersWithoutAtlas)
+            atlas = SimAtlas.getAtlas(robot, (640, 480))
+            candidateCount += len(atlas.getCandidates(robot.position[0], robot.position[1], robot.angle))
+        self.assertLess(candidateCount, 20 * len(SimBase.wallSegments) / 2)
+
+    def testNoAtlasForOtherWidths(self):
+        """Tests that no atlas is used for a width it wasn't built for."""
+        self.assertIsNotNone(SimAtlas.getAtlas(self.robots[0], (640, 480)))
+        self.assertIsNone(SimAtlas.getAtlas(self.robots[0], (1920, 1440)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,19 +4,58 @@ import xmlrpc.server
 import pymunk
 import json
 import math
+import os
 import random
+import socket
+import time
+
+#my modules
+import SimMetrics
+import SimTrace
 
 """Global Variables"""
 #The pymunk "world". This is initialised when the ArenaThread is created, but stored here for visibility.
 space = None
+#The SimScoring.ScoreTracker that keeps the scores up to date. Like the space, this is initialised when the ArenaThread is created.
+scoreTracker = None
+#The SimState.BodyStateTable holding the state of every body after the latest step. This is also initialised when the ArenaThread is created.
+stateTable = None
 #The current time of the simulation (in seconds).
 theTime = 0
+#The amount of simulated time (in seconds) each step of the main loop advances by, and the number of pymunk steps it is split into.
+#These are set from the arena config file when the ArenaThread is created.
+stepSize = 1/64
+substeps = 1
+#The number of teams, and the distance (in metres) from the centre of the arena to each wall. The arena is a regular polygon with one side
+#for each team (a square for four teams). These are set from the arena config file when the ArenaThread is created.
+teamCount = 4
+wallDistance = 3
 #The time at which the simulation ends (in seconds).
 endTime = 180
+#If the display's window has been closed, which ends the whole run, rather than just the match that is being played.
+isQuitRequested = False
 #A threading event used to block the main (Simulator) thread.
 mainGate = threading.Event()
-#A list of all running rpcThreads.
+#A list of all running rpcThreads, and of robot threads left over from earlier matches, which are reused for the next match's robots.
 rpcThreads = []
+idleRpcThreads = []
+#The number of rpcThreads released by the main thread that haven't blocked again yet, and a lock protecting it. The last of them to block unblocks the main thread.
+runningThreadCount = 0
+runningThreadLock = threading.Lock()
+#A lock held while recording a sighting, as several robots can look at the same time.
+sightingLock = threading.Lock()
+#A condition variable that is notified whenever an rpcThread becomes ready to start the simulation.
+startCondition = threading.Condition()
+#The SimMetrics.MetricsRecorder counting the calls to every service, the handoffs between threads, and the physics steps.
+metrics = SimMetrics.MetricsRecorder()
+#What is done about the wall-clock time each robot program spends thinking between its calls, while the simulation waits for it:
+#"measure" only records it, "charge" charges it as simulated time (thinkTimeScale simulated seconds per wall-clock second), and "throttle" slows down
+#programs that think for more than thinkTimeBudget wall-clock seconds per simulated second, so that they keep to it.
+thinkTimePolicy = "measure"
+thinkTimeScale = 1
+thinkTimeBudget = 0.1
+#The seed of the random noise in each robot's motors and camera, or None to seed it from the operating system, so that each run is different.
+randomSeed = None
 #A list of all the print statements for the controller to print in the next timestep.
 pendingOutput = []
 #Lists containing all the bodies of the respective type that are currently in the arena.
@@ -26,16 +65,123 @@ robots = []
 zones = []
 
 """Global Helper Functions"""
-def trace(text):
-    """Print a message to Standard Error, to avoid polluting the Standard Output (which is read by some processes)."""
-    id = threading.current_thread().getName()
-    line = "In " + id + " at " + str(theTime) + ": " + str(text)
-    print(line, file = sys.stderr)
+#Trace messages are written to Standard Error (to avoid polluting the Standard Output, which is read by some processes), stamped with the simulated time.
+SimTrace.setTimeSource(lambda: theTime)
+
+def getRandomGenerator(name):
+    """Returns a new random generator for one source of noise, such as a robot. When a seed is set, the generator is seeded from it and the name,
+    so each source gets the same noise every run whatever order they are created and used in."""
+    if randomSeed == None:
+        return random.Random()
+    return random.Random(str(randomSeed) + ":" + name)
+
+def releaseThreads(threads):
+    """Unblocks the threads all at once, and blocks the main thread until every one of them has blocked again (unless the simulation has ended).
+    The calls from their programs are handled in parallel, so the main thread waits for the slowest of them, rather than for each of them in turn.
+    What each thread prints is kept by the thread until they have all blocked, then added to the pending output in the order the threads were given,
+    which is the same order as if they had been released one at a time."""
+    global runningThreadCount
+    if not threads:
+        return
+    SimTrace.begin("handoff", "releaseThreads(%s)", ", ".join(thread.name for thread in threads))
+    mainGate.clear()
+    with runningThreadLock:
+        runningThreadCount = len(threads)
+    releaseTime = time.perf_counter()
+    for thread in threads:
+        thread.releaseTime = releaseTime
+        thread.gate.set()
+    mainGate.wait()
+    for thread in threads:
+        if thread.pendingOutput:
+            pendingOutput.extend(thread.pendingOutput)
+            thread.pendingOutput = []
+    SimTrace.end("handoff", "releaseThreads(%s)", ", ".join(thread.name for thread in threads))
 
 def isSimulationRunning():
     """Returns if the simulation has finished running."""
     return theTime < endTime
 
+def stepSimulation():
+    """Advances the simulation by one step, split into the configured number of substeps.
+    pymunk clears the forces on every body after each step, so the robots' motor forces are applied again before every substep."""
+    global theTime
+    for substep in range(substeps):
+        for robot in robots:
+            robot.applyMotorForce()
+        space.step(stepSize / substeps)
+    theTime += stepSize
+    scoreTracker.update()
+    stateTable.markStale()
+    metrics.steps += 1
+
+def isWorldAtRest():
+    """Returns if nothing in the arena will move until a robot program next acts: every robot has both motors off, and every robot and token is asleep.
+    Sleeping bodies are left out of the space's step entirely, so stepping a world at rest changes nothing but the time."""
+    for robot in robots:
+        if robot.leftPower != 0 or robot.rightPower != 0:
+            return False
+    for body in robots + tokens:
+        if not body.is_sleeping:
+            return False
+    return True
+
+def fastForward(untilTime):
+    """Advances the time as if stepSimulation() had been called until the time reached untilTime (or the end of the simulation), without stepping the space.
+    This takes at least one step, like a single call to stepSimulation(), and returns the number of steps taken. It must only be called when isWorldAtRest().
+    The step size is added once per step (rather than all at once) so the time is exactly the same as stepping normally."""
+    global theTime
+    steps = 1
+    theTime += stepSize
+    while theTime < untilTime and theTime < endTime:
+        theTime += stepSize
+        steps += 1
+    metrics.skippedSteps += steps
+    return steps
+
+def getTeamAngle(teamNumber):
+    """Returns the rotation corresponding to a team.
+    For example, with four teams, relative to an object created for team 0, an object created for team 1 is rotated -90 degrees about the origin."""
+    #The fraction of a half turn is kept within (-1, 1], so four teams get exactly 0, -pi/2, pi and pi/2.
+    halfTurns = -2 * teamNumber / teamCount
+    if halfTurns <= -1:
+        halfTurns += 2
+    return math.pi * halfTurns
+
+def getSideLength():
+    """Returns the length (in metres) of each side of the arena.
+    This is rounded, so that the four sided arena is exactly twice the wall distance across."""
+    return round(2 * wallDistance * math.tan(math.pi / teamCount), 9)
+
+def clampInsideWalls(x, y, wallNormals, limit):
+    """Returns the closest point to (x, y) that is no further than limit from the centre along any of the wall normals (the unit vectors from the centre towards each wall).
+    This keeps a point inside the walls of an arena with any number of sides, moving it onto the nearest wall or corner if it is outside."""
+    def isInside(point):
+        return all(normal[0] * point[0] + normal[1] * point[1] <= limit + 1e-9 for normal in wallNormals)
+    if isInside((x, y)):
+        return x, y
+    #The closest point is either on one of the walls, or in a corner between two of them.
+    candidates = []
+    for normal in wallNormals:
+        excess = normal[0] * x + normal[1] * y - limit
+        if excess > 0:
+            candidates.append((x - excess * normal[0], y - excess * normal[1]))
+    for i in range(len(wallNormals)):
+        for j in range(i + 1, len(wallNormals)):
+            determinant = wallNormals[i][0] * wallNormals[j][1] - wallNormals[i][1] * wallNormals[j][0]
+            if abs(determinant) > 1e-9:
+                candidates.append((limit * (wallNormals[j][1] - wallNormals[i][1]) / determinant, limit * (wallNormals[i][0] - wallNormals[j][0]) / determinant))
+    closest = min([point for point in candidates if isInside(point)], key = lambda point: (point[0] - x) ** 2 + (point[1] - y) ** 2)
+    return float(closest[0]), float(closest[1])
+
+def recordSighting(body, teamNumber):
+    """Records that a wall segment or token has been seen by the robot of the given team at the current time.
+    Only the most recent sighting is kept, as that is all the display needs. If several robots see it at the same time, the lowest team is kept."""
+    with sightingLock:
+        if theTime > body.lastSeenTime or (theTime == body.lastSeenTime and teamNumber < body.lastSeenTeam):
+            body.lastSeenTime = theTime
+            body.lastSeenTeam = teamNumber
+
 def sanitiseInput(input, datatype, default, minimum = None, maximum = None):
     """Takes an input and ensures that it is the correct datatype, and that it is within the allowable range.
     If it is not, the value will be set to an allowable value, to allow the simulation to run."""
@@ -54,6 +200,64 @@ def sanitiseInput(input, datatype, default, minimum = None, maximum = None):
         return default
 
 """Threading"""
+class PersistentXMLRPCRequestHandler(xmlrpc.server.SimpleXMLRPCRequestHandler):
+    """An xmlrpc request handler that keeps each connection open for further requests (using HTTP/1.1), so that a client can send several requests
+    without waiting for the responses. They are still handled one at a time, in the order they were sent.
+    The server's thread is kept on a connection until the client closes it, so only one client can use the server at a time."""
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        """Notes the connection on the server, so that it can be closed when the server shuts down."""
+        super().setup()
+        self.server.openConnections.add(self.connection)
+
+    def finish(self):
+        """Removes the connection from the server's open connections once the client has closed it."""
+        self.server.openConnections.discard(self.connection)
+        super().finish()
+
+class MeteredXMLRPCServer(xmlrpc.server.SimpleXMLRPCServer):
+    """An xmlrpc server that records every call it handles in the metrics: the method called, how long it took to respond, and the size of the
+    request and response. Each server is only run by one thread, so the method being called can be stored on the server while it is handled."""
+
+    def __init__(self, serviceName, address, isPersistent = False):
+        """Creates the server for the named service (for example "Arena" or "Robot 0") on the given address.
+        If isPersistent is set, connections are kept open for further requests (see PersistentXMLRPCRequestHandler)."""
+        requestHandler = PersistentXMLRPCRequestHandler if isPersistent else xmlrpc.server.SimpleXMLRPCRequestHandler
+        super().__init__(address, requestHandler = requestHandler, logRequests = False)
+        self.serviceName = serviceName
+        self._methodName = None
+        self.openConnections = set()
+
+    def closeConnections(self):
+        """Closes any connections left open, so that the server's thread isn't left waiting on them for another request."""
+        for connection in list(self.openConnections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                #The client closed it first.
+                pass
+
+    def _dispatch(self, method, params):
+        """Notes the method being called, then calls it."""
+        self._methodName = method
+        return super()._dispatch(method, params)
+
+    def _marshaled_dispatch(self, data, dispatch_method = None, path = None):
+        """Handles a request, and records it in the metrics. A request that could not be read is recorded as a call to "<invalid>"."""
+        self._methodName = "<invalid>"
+        startTime = time.perf_counter()
+        serverThread = threading.current_thread()
+        isRpcThread = isinstance(serverThread, RpcThread)
+        if isRpcThread:
+            serverThread.startCall(startTime)
+        response = super()._marshaled_dispatch(data, dispatch_method, path)
+        endTime = time.perf_counter()
+        metrics.recordCall(self.serviceName, self._methodName, endTime - startTime, len(data), len(response))
+        if isRpcThread:
+            serverThread.endCall(endTime)
+        return response
+
 class RpcThread(threading.Thread):
     """A base class for the ArenaThread and RobotThread classes - this contains all the common functions for blocking, unblocking and stopping a thread."""
     
@@ -66,52 +270,94 @@ class RpcThread(threading.Thread):
         self.wakeUpTime = 0
         self.gate = threading.Event()
         self.server = None
+        #The name the thread's service is given in the metrics.
+        self.serviceName = self.name
         self.isReadyToStart = False
+        #The wall-clock time the main thread last released the thread, and the messages printed since then.
+        self.releaseTime = None
+        self.pendingOutput = []
+        #The wall-clock time the last call was responded to while the thread was released, the wall-clock time the program has spent thinking this match,
+        #and the simulated time it has been charged for it.
+        self.lastResponseTime = None
+        self.thinkTime = 0
+        self.chargedTime = 0
+
+    def markReadyToStart(self):
+        """Flags the thread as ready to start, and wakes up any thread waiting for all threads to be ready."""
+        with startCondition:
+            self.isReadyToStart = True
+            startCondition.notify_all()
 
     def block(self):
-        """Block the thread, and unblocks the main thread."""
+        """Block the thread, and unblocks the main thread if this is the last of the threads it released to block."""
+        global runningThreadCount
         self.gate.clear()
-        trace("Yielding control to MainThread")
-        mainGate.set()
+        SimTrace.begin("handoff", "RpcThread.block()")
+        startTime = time.perf_counter()
+        #The time since the thread was released is the wall-clock time its program held up the simulation.
+        if self.releaseTime != None:
+            metrics.recordUnblock(self.serviceName, startTime - self.releaseTime)
+            self.releaseTime = None
+        with runningThreadLock:
+            runningThreadCount -= 1
+            isLastToBlock = runningThreadCount <= 0
+        if isLastToBlock:
+            mainGate.set()
         self.gate.wait()
-        trace("Receiving control from MainThread")
+        metrics.recordBlock(self.serviceName, time.perf_counter() - startTime)
+        SimTrace.end("handoff", "RpcThread.block()")
         
 
+    def startCall(self, startTime):
+        """Called as a call to the thread's server starts. If the thread has been released since the last call was responded to,
+        the time in between is the time the program spent thinking while the simulation waited for it, which is recorded and charged."""
+        if self.releaseTime != None and self.lastResponseTime != None:
+            thinkTime = startTime - self.lastResponseTime
+            self.thinkTime += thinkTime
+            chargedTime = self.chargeThinkTime(thinkTime)
+            self.chargedTime += chargedTime
+            metrics.recordThink(self.serviceName, thinkTime, chargedTime)
+
+    def endCall(self, endTime):
+        """Called once a call to the thread's server has been handled. Only responses sent while the thread is released start a time spent thinking,
+        as otherwise the simulation isn't waiting for the program."""
+        self.lastResponseTime = endTime if self.releaseTime != None else None
+
+    def chargeThinkTime(self, thinkTime):
+        """Charges the program for thinking for thinkTime wall-clock seconds, and returns the simulated time it was charged.
+        Only robot programs are charged, so this charges nothing."""
+        return 0
+
     def unblock(self):
-        """Unblocks the thread, blocking the main thread (unless the simulation has ended)."""
-        mainGate.clear()
-        self.gate.set()
-        mainGate.wait()
+        """Unblocks the thread, blocking the main thread until it blocks again (unless the simulation has ended)."""
+        releaseThreads([self])
 
     def shutdownAndWaitToExit(self):
         """Exits the thread cleanly, yielding the program until the shutdown is complete."""
-        trace("Releasing " + self.name + " to shut down.")
+        SimTrace.trace("shutdown", "Releasing %s to shut down.", self.name)
         self.gate.set()
+        self.server.closeConnections()
         self.server.shutdown()
         self.join()
-        trace(self.name + " has shut down.")
+        SimTrace.trace("shutdown", "%s has shut down.", self.name)
         #For some reason, the function for "cleanly terminate thread" is "join".
 
 """Pymunk Body Classes"""
-#The rotation corresponding to each team.
-#For example, relative to an object created for team 0, an object created for team 1 is rotated -90 degrees about the origin.
-_teamAngles = {
-    0 : 0,
-    1 : math.pi / -2,
-    2 : math.pi,
-    3 : math.pi / 2
-}
-
 class Robot(pymunk.Body):
     """This class is derived from the body class, and in addition to the base pymunk body attributes, it contains all
     the information regarding that robot's configuration options, and some flags on if the robot has left it's zone or is moving.
+    The flag for leaving the zone is set by the score tracker's collision handler when the robot separates from its zone.
     It initialises itself using the config file accociated with it's team number."""
 
     def __init__(self, teamNumber):
         """Initialises the body using information from the config file accociated with that teamNumber."""
         super().__init__(body_type = pymunk.Body.DYNAMIC)
         self.teamNumber = teamNumber
-        with open("Robot " + str(teamNumber) + " Config.json") as RobotConfig:
+        configFilename = "Robot " + str(teamNumber) + " Config.json"
+        #There are only config files for the first four teams, so any other team uses the first team's config.
+        if not os.path.exists(configFilename):
+            configFilename = "Robot 0 Config.json"
+        with open(configFilename) as RobotConfig:
             InitialiseDictionary = json.loads(RobotConfig.read())[0]
 
             #Create the pymunk body and shape:
@@ -122,12 +368,13 @@ class Robot(pymunk.Body):
             #These constants are useful when constructing the object:
             halfWidth = self.width / 2
             halfLength = self.length / 2
+            halfSideLength = getSideLength() / 2
             startingOffset = pymunk.Vec2d(
-                sanitiseInput(InitialiseDictionary["Starting Position"][0], float, 0, -0.25 + halfLength, 5.75 - halfLength),
-                sanitiseInput(InitialiseDictionary["Starting Position"][1], float, 0, -3 + halfWidth, 3 - halfWidth)
+                sanitiseInput(InitialiseDictionary["Starting Position"][0], float, 0, -0.25 + halfLength, 2 * wallDistance - 0.25 - halfLength),
+                sanitiseInput(InitialiseDictionary["Starting Position"][1], float, 0, -halfSideLength + halfWidth, halfSideLength - halfWidth)
             )
-            self.position = (pymunk.Vec2d(-2.75, 0) + startingOffset).rotated(_teamAngles[teamNumber])
-            self.angle = _teamAngles[teamNumber]
+            self.position = (pymunk.Vec2d(0.25 - wallDistance, 0) + startingOffset).rotated(getTeamAngle(teamNumber))
+            self.angle = getTeamAngle(teamNumber)
             points = [(-halfLength, -halfWidth), (halfLength, -halfWidth), (halfLength, halfWidth), (-halfLength, halfWidth)]
             box = pymunk.Poly(self, points)
             #The mass can't be set until the shape is constructed, so this is stored as a variable for later.
@@ -143,9 +390,10 @@ class Robot(pymunk.Body):
             self._axleLength = sanitiseInput(InitialiseDictionary["Distance Between Wheels"], float, 0, 0)
             baseMaxPower = sanitiseInput(InitialiseDictionary["Maximum Motor Power"], float, 1, 0)
             powerOffset = sanitiseInput(InitialiseDictionary["Motor Noise Range"], float, 0, 0)
-            random.seed()
-            self._leftMaxPower = baseMaxPower + random.uniform(0, powerOffset / 2)
-            self._rightMaxPower = baseMaxPower + random.uniform(0, powerOffset / 2)
+            #Each robot has its own random generator for the noise in its motors and camera.
+            self.randomGenerator = getRandomGenerator("Robot " + str(teamNumber))
+            self._leftMaxPower = baseMaxPower + self.randomGenerator.uniform(0, powerOffset / 2)
+            self._rightMaxPower = baseMaxPower + self.randomGenerator.uniform(0, powerOffset / 2)
             #These will be set when the service recieves a call to update the motor power.
             self.leftPower = 0
             self.rightPower = 0
@@ -158,6 +406,8 @@ class Robot(pymunk.Body):
             self.markerPixelsMinimum = sanitiseInput(InitialiseDictionary["Marker Pixels Minimum"], int, 0, 0)
             self.markerPixelsNoise = sanitiseInput(InitialiseDictionary["Marker Pixels Noise Range"], int, 0, 0)
             self.isIgnoringMotionBlur = sanitiseInput(InitialiseDictionary["Ignore Motion Blur"], bool, False)
+            #The body that hid each marker corner from the camera the last time the robot looked, kept by SimVision.see().
+            self.obstructionOfCorner = {}
             self.hasLeftZone = False
 
             robots.append(self)
@@ -165,59 +415,54 @@ class Robot(pymunk.Body):
     @property
     def isMoving(self):
         """Returns if the object is moving.
-        Small thresholds are acceptable, as objects in pymunk usually take a while to stop moving entirely."""
-        return self.velocity.length > 0.02 or self.angular_velocity > 0.05
+        Small thresholds are acceptable, as objects in pymunk usually take a while to stop moving entirely.
+        Sleeping bodies are never moving, so their velocity doesn't need to be looked at."""
+        if self.is_sleeping:
+            return False
+        return self.velocity.get_length_sqrd() > 0.02 ** 2 or self.angular_velocity > 0.05
 
     def applyMotorForce(self):
-        """Applies the motor forces to the robot body."""
+        """Applies the motor forces to the robot body.
+        Applying a force wakes a sleeping body, so nothing is applied while both motors are off to let a stationary robot sleep."""
+        if self.leftPower == 0 and self.rightPower == 0:
+            return
         leftMotorPower = ( self.leftPower / 100 ) * self._leftMaxPower
         self.apply_force_at_local_point( (leftMotorPower, 0), (0, self._axleLength/2) )
         rightMotorPower = ( self.rightPower / 100 ) * self._rightMaxPower
         self.apply_force_at_local_point( (rightMotorPower, 0), (0, self._axleLength/-2) )
 
-    def checkIfLeftZone(self):
-        """Checks if the robot is outside its zone, and updates the flag if it is."""
-        zone = zones[self.teamNumber]
-        for shape in zone.shapes:
-            zoneBB = shape.cache_bb()
-            for shapeInfo in space.shape_query(shape):
-                body = shapeInfo.shape.body
-                if body == self:
-                    #if the shape has entirely left the zone
-                    for robotShape in body.shapes:
-                        if not( zoneBB.contains(robotShape.cache_bb()) ):
-                            self.hasLeftZone = True
-
 class WallSegment(pymunk.Body):
     """This class is derived from the body class, and in addition to the base pymunk body attributes, it contains
-    the id of the wall segment and a list of timestamps the four robots last saw it at."""
-    def __init__(self, segmentId, offset, teamSide):
+    the id of the wall segment and when (and by which team) it was last seen."""
+    def __init__(self, segmentId, offset, length, teamSide):
+        """Creates a wall segment of the given length, centred at offset metres along the wall on the given team's side."""
         super().__init__(body_type = pymunk.Body.STATIC)
-        rotation = _teamAngles[teamSide]
-        self.position = pymunk.Vec2d(-3, offset - 2.5 )
+        rotation = getTeamAngle(teamSide)
+        self.position = pymunk.Vec2d(-wallDistance, offset)
         self.position = self.position.rotated(rotation)
         self.angle = rotation
 
         #Centred on the middle of the side pointing towards the arena.
-        halfLength = 0.5
+        halfLength = length / 2
         width = 0.1
         points = [(-width, -halfLength), (-width, halfLength), (0, halfLength), (0, -halfLength)]
         box = pymunk.Poly(self, points)
         space.add(self, box)
         wallSegments.append(self)
         self.id = segmentId
-        self.lastSeenList = [-5, -5, -5, -5]
+        self.lastSeenTime = -5
+        self.lastSeenTeam = None
 
 class Zone(pymunk.Body):
     """This class is derived from the body class, and in addition to the base pymunk body attributes, it contains
     the team accociated with it, and a function to return a list of all the tokens fully within it's bounds."""
     def __init__(self, teamNumber):
         super().__init__(body_type = pymunk.Body.STATIC)
-        rotation = _teamAngles[teamNumber]
+        rotation = getTeamAngle(teamNumber)
         self.teamNumber = teamNumber
 
         #Half of the sensor zone exists inside the wall - this is to ensure tokens stay in the sensor even when pushed up against the wall.
-        self.position = pymunk.Vec2d(-3, 0)
+        self.position = pymunk.Vec2d(-wallDistance, 0)
         self.position = self.position.rotated(rotation)
         self.angle = rotation
 
@@ -226,6 +471,8 @@ class Zone(pymunk.Body):
         points = [(-halfLength, -halfWidth), (halfLength, -halfWidth), (halfLength, halfWidth), (-halfLength, halfWidth)]
         box = pymunk.Poly(self, points)
         box.sensor = True
+        #collision_type 3 is for zones, so tokens entering and leaving them can be tracked by a collision handler.
+        box.collision_type = 3
         space.add(self, box)
         zones.append(self)
 
@@ -245,10 +492,11 @@ class Zone(pymunk.Body):
 
 class Token(pymunk.Body):
     """This class is derived from the body class, and in addition to the base pymunk body attributes, it contains
-    the id of the token, corresponding type, and a list of timestamps the four robots last saw it at. It also contains
+    the id of the token, corresponding type, and when (and by which team) it was last seen. It also contains
     a function which returns who and what the token is currently scoring for.
     """    
-    def __init__(self, TokenId, TokenType, XPosition, YPosition):
+    def __init__(self, TokenId, TokenType, XPosition, YPosition, Offset = 0):
+        """Creates a token of the given type. The offset is the position of its id within the block of ids for its type."""
         super().__init__(body_type = pymunk.Body.DYNAMIC)
         #radius is a useful constant for construction purposes - it represents the distance from the centre of the box to an edge
         radius = 0.055
@@ -264,7 +512,9 @@ class Token(pymunk.Body):
         tokens.append(self)
         self.id = TokenId
         self.type = TokenType
-        self.lastSeenList = [-5, -5, -5, -5]
+        self.offset = Offset
+        self.lastSeenTime = -5
+        self.lastSeenTeam = None
 
     def getScore(self, robotCollisions):
         """Takes a list of all current collisions between robots and tokens, and returns a tuple containing the number of
@@ -311,5 +561,8 @@ class Token(pymunk.Body):
     @property
     def isMoving(self):
         """Returns if the object is moving.
-        Small thresholds are acceptable, as objects in pymunk usually take a while to stop moving entirely."""
-        return self.velocity.length > 0.02 or self.angular_velocity > 0.05
+        Small thresholds are acceptable, as objects in pymunk usually take a while to stop moving entirely.
+        Sleeping bodies are never moving, so their velocity doesn't need to be looked at."""
+        if self.is_sleeping:
+            return False
+        return self.velocity.get_length_sqrd() > 0.02 ** 2 or self.angular_velocity > 0.05
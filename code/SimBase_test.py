@@ -0,0 +1,105 @@
+import unittest
+import random
+import time
+
+import SimTestCase
+import SimBase
+
+class FastForwardTest(SimTestCase.SimTestCase):
+
+    def _runArena(self, isFastForwardAllowed):
+        """Creates a new arena, drives the robots around at random, waits with the motors off until a wake up time, and then drives them again.
+        Returns the time, scores and the position, angle and velocity of every body at the end, and the number of times the time was skipped."""
+        SimBase.endTime = 180
+        arena = self.createArena()
+        for teamNumber in range(4):
+            robot = SimBase.Robot(teamNumber)
+            #The motor noise is random, so it is fixed for both runs to be the same.
+            robot._leftMaxPower = 10
+            robot._rightMaxPower = 10
+        randomGenerator = random.Random(2019)
+        fastForwards = 0
+        for wakeUpTime in [3, 30, 33]:
+            while SimBase.theTime < wakeUpTime:
+                if isFastForwardAllowed and SimBase.isWorldAtRest():
+                    SimBase.fastForward(wakeUpTime)
+                    fastForwards += 1
+                else:
+                    SimBase.stepSimulation()
+            for robot in SimBase.robots:
+                if wakeUpTime == 3:
+                    robot.leftPower = 0
+                    robot.rightPower = 0
+                else:
+                    robot.leftPower = randomGenerator.uniform(-100, 100)
+                    robot.rightPower = randomGenerator.uniform(-100, 100)
+        bodyStates = [(tuple(body.position), body.angle, tuple(body.velocity), body.angular_velocity) for body in SimBase.space.bodies]
+        return SimBase.theTime, arena.getScores(), bodyStates, fastForwards
+
+    def testSameAsStepping(self):
+        """Tests that skipping the time while the world is at rest ends in exactly the same state as stepping through it."""
+        steppedTime, steppedScores, steppedStates, steppedFastForwards = self._runArena(False)
+        fastTime, fastScores, fastStates, fastForwards = self._runArena(True)
+        self.assertEqual(steppedFastForwards, 0)
+        self.assertGreater(fastForwards, 0)
+        self.assertEqual(fastTime, steppedTime)
+        self.assertEqual(fastScores, steppedScores)
+        self.assertEqual(fastStates, steppedStates)
+
+    def testNotAtRestWithMotorsOn(self):
+        """Tests that a robot with a motor on stops the time being skipped, even while it is asleep."""
+        self.createArena()
+        robot = SimBase.Robot(0)
+        while not SimBase.isWorldAtRest():
+            SimBase.stepSimulation()
+        robot.leftPower = 1
+        self.assertTrue(robot.is_sleeping)
+        self.assertFalse(SimBase.isWorldAtRest())
+
+class RandomSeedTest(SimTestCase.SimTestCase):
+
+    def _getMotorNoise(self, randomSeed, teamNumbers):
+        """Creates a new arena with robots for the given teams, in order, and returns the maximum powers of each team's motors."""
+        SimBase.randomSeed = randomSeed
+        self.createArena()
+        maxPowers = {}
+        for teamNumber in teamNumbers:
+            robot = SimBase.Robot(teamNumber)
+            maxPowers[teamNumber] = (robot._leftMaxPower, robot._rightMaxPower)
+        SimBase.randomSeed = None
+        return maxPowers
+
+    def testSeededNoiseRepeats(self):
+        """Tests that each robot gets the same motor noise with the same seed, whatever order the robots are created in, and different noise with another seed."""
+        maxPowers = self._getMotorNoise(3, [0, 1, 2, 3])
+        self.assertEqual(self._getMotorNoise(3, [3, 2, 1, 0]), maxPowers)
+        self.assertNotEqual(self._getMotorNoise(4, [0, 1, 2, 3]), maxPowers)
+        self.assertNotEqual(maxPowers[0], maxPowers[1])
+
+class ReleaseThreadsTest(unittest.TestCase):
+
+    class _PrintingThread(SimBase.RpcThread):
+        """A thread that prints its name after a delay each time it's released, the slowest first."""
+
+        def __init__(self, delay):
+            super().__init__()
+            self.delay = delay
+
+        def run(self):
+            self.gate.wait()
+            while True:
+                time.sleep(self.delay)
+                self.pendingOutput.append(self.name)
+                self.block()
+
+    def testOutputKeepsThreadOrder(self):
+        """Tests that releasing threads together waits for all of them, and adds what they print in the order they were given, not the order they finished."""
+        threads = [self._PrintingThread(delay) for delay in [0.03, 0.02, 0.01, 0]]
+        for thread in threads:
+            thread.start()
+        SimBase.pendingOutput.clear()
+        for round in range(2):
+            SimBase.releaseThreads(threads)
+        self.assertEqual(SimBase.pendingOutput, [thread.name for thread in threads] * 2)
+        self.assertEqual(SimBase.runningThreadCount, 0)
+        SimBase.pendingOutput.clear()
@@ -0,0 +1,114 @@
+import os
+import json
+import queue
+import threading
+
+import pygame
+
+import SimBase
+
+class FrameWriter(threading.Thread):
+    """A background thread that saves the frames drawn by the Display, so that recording a match never slows down the simulation.
+    Frames are passed to the thread through a bounded queue. When the queue is full, the frame is either dropped (the "drop" policy),
+    or the simulation waits for space in the queue (the "block" policy)."""
+
+    def __init__(self, directory, format = "png", queueSize = 64, policy = "drop"):
+        """Creates the output directory and the queue, but does not start the thread.
+        The format is either "png" (one numbered image per frame), or "raw" (every frame's pixels appended to a single file,
+        with the information needed to encode it described in a json file alongside it)."""
+        if format not in ("png", "raw"):
+            raise ValueError("Capture format must be either 'png' or 'raw'.")
+        if policy not in ("drop", "block"):
+            raise ValueError("Capture queue policy must be either 'drop' or 'block'.")
+        super().__init__(daemon = True, name = "Capture-Thread")
+        self.directory = directory
+        self.format = format
+        self.policy = policy
+        self._queue = queue.Queue(maxsize = queueSize)
+        self.framesWritten = 0
+        #Frames dropped because the queue was full are counted by the simulation thread, and frames the writer could not write by this thread.
+        self.framesDropped = 0
+        self._framesNotWritten = 0
+        self._frameTimes = []
+        self._frameSize = None
+        self._pixelFormat = None
+        self._rawFile = None
+        os.makedirs(directory, exist_ok = True)
+
+    def submit(self, surface):
+        """Queues a frame to be written, and returns if the frame was queued.
+        The surface is copied (a single blit) as the display surface will be drawn over by the next frame, and the copy is handed to the writer
+        thread as-is, so its pixel buffer is written out without any further copies."""
+        frame = (SimBase.theTime, surface.copy())
+        if self.policy == "block":
+            self._queue.put(frame)
+            return True
+        try:
+            self._queue.put_nowait(frame)
+            return True
+        except queue.Full:
+            self.framesDropped += 1
+            return False
+
+    def close(self):
+        """Writes all the frames left in the queue, then stops the thread and writes the capture information file."""
+        self._queue.put(None)
+        self.join()
+        if self._rawFile != None:
+            self._rawFile.close()
+        information = {
+            "Format" : self.format,
+            "Frames Written" : self.framesWritten,
+            "Frames Dropped" : self.framesDropped + self._framesNotWritten,
+            "Frame Times" : self._frameTimes
+        }
+        if self.format == "raw" and self._frameSize != None:
+            information["Width"], information["Height"] = self._frameSize
+            #This is the pixel format name used by ffmpeg, so the video can be encoded with:
+            #ffmpeg -f rawvideo -pix_fmt <Pixel Format> -s <Width>x<Height> -i capture.raw capture.mp4
+            information["Pixel Format"] = self._pixelFormat
+        with open(os.path.join(self.directory, "capture.json"), "w") as informationFile:
+            json.dump(information, informationFile, indent = 4)
+
+    def _getPixelFormat(self, surface):
+        """Returns the ffmpeg name of the pixel format of a 32 bit surface, for example "bgr0", by working out which channel is stored in each byte."""
+        channelNames = ["r", "g", "b", "a"]
+        masks = surface.get_masks()
+        pixelFormat = ""
+        for byteNumber in range(4):
+            byteMask = 0xff << (8 * byteNumber)
+            for channelName, mask in zip(channelNames, masks):
+                if mask == byteMask:
+                    pixelFormat += channelName
+                    break
+            else:
+                #This byte is padding.
+                pixelFormat += "0"
+        return pixelFormat
+
+    def _writeFrame(self, frameTime, surface):
+        """Writes one frame to the output directory, returning if it was written."""
+        if self.format == "png":
+            pygame.image.save(surface, os.path.join(self.directory, "frame_{:06d}.png".format(self.framesWritten)))
+        else:
+            if self._rawFile == None:
+                self._frameSize = surface.get_size()
+                self._pixelFormat = self._getPixelFormat(surface)
+                self._rawFile = open(os.path.join(self.directory, "capture.raw"), "wb")
+            elif surface.get_size() != self._frameSize:
+                #A raw video can only contain frames of the same size, so frames after the window has been resized cannot be written.
+                return False
+            self._rawFile.write(surface.get_view("0"))
+        self._frameTimes.append(frameTime)
+        return True
+
+    def run(self):
+        """Writes frames from the queue until it receives None."""
+        while True:
+            frame = self._queue.get()
+            if frame == None:
+                return
+            if self._writeFrame(*frame):
+                self.framesWritten += 1
+            else:
+                self._framesNotWritten += 1
@@ -1,3 +1,6 @@
+import os
+import time
+
 import pygame
 from pygame.locals import *
 
@@ -18,86 +21,191 @@ class Display:
         2 : Color(100, 0, 0),
         3 : Color(0, 0, 100)
     }
-    _tokenTypeColourDictionary = {
-        "Ore" : Color("Grey"),
-        "Team 0 Gold" : Color("Gold"),
-        "Team 1 Gold" : Color("Lime Green"),
-        "Team 2 Gold" : Color("Red"),
-        "Team 3 Gold" : Color("Blue")
-    }
 
-    def __init__(self):
-        """Creates the window for the display, and populates it with the objects currently in the arena."""
+    @staticmethod
+    def _getTeamColour(team, isDark = False):
+        """Returns the colour of the team, or the dark version of it if isDark is set.
+        Teams after the first four are given colours spread around the colour wheel, which are added to the dictionaries the first time they are needed."""
+        if team not in Display._teamColourDictionary:
+            colour = Color(0, 0, 0)
+            #Step the hue by the golden angle, so that any number of teams get colours that are easy to tell apart.
+            colour.hsva = ((team * 137.508) % 360, 90, 90, 100)
+            Display._teamColourDictionary[team] = colour
+            darkColour = Color(0, 0, 0)
+            darkColour.hsva = ((team * 137.508) % 360, 100, 40, 100)
+            Display._darkTeamColourDictionary[team] = darkColour
+        if isDark:
+            return Display._darkTeamColourDictionary[team]
+        return Display._teamColourDictionary[team]
+
+    @staticmethod
+    def _getTokenColour(tokenType):
+        """Returns the colour of a type of token: grey for ore, and the team's colour for gold."""
+        if tokenType == "Ore":
+            return Color("Grey")
+        #Gold token types are "Team t Gold".
+        return Display._getTeamColour(int(tokenType.split(" ")[1]))
+
+    def __init__(self, frameWriter = None):
+        """Creates the window for the display, and populates it with the objects currently in the arena.
+        If a SimCapture.FrameWriter is given, the display is drawn offscreen (so it works without a screen attached), and every frame is passed to it."""
+        self._frameWriter = frameWriter
+        if frameWriter != None:
+            #SDL only reads this when the display is initialised, so it has to be set before pygame.init().
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
         pygame.init()
         pygame.display.set_caption("Test program.")
         self.screen = pygame.display.set_mode( (620, 620), pygame.RESIZABLE )
-        #The screen is set to slightly larger than 6m by 6m, to allow the arena walls to be displayed.
-        self.clock = pygame.time.Clock()
+        #The screen shows a square just large enough for the arena walls, which is 6.2m by 6.2m for the four team arena.
+        #This is rounded so that floating point error in the wall positions doesn't change how the pixels are rounded.
+        self._viewHalfSize = 0
+        for wallSegment in SimBase.wallSegments:
+            for shape in wallSegment.shapes:
+                wallBB = shape.cache_bb()
+                self._viewHalfSize = max(self._viewHalfSize, abs(wallBB.left), abs(wallBB.right), abs(wallBB.bottom), abs(wallBB.top))
+        self._viewHalfSize = round(self._viewHalfSize, 6)
+        #The zones and walls never move, so they are drawn once onto this surface, which is rebuilt when the window is resized.
+        self._staticLayer = None
+        #The areas of the screen covered by moving bodies on the previous frame, which are restored from the static layer before drawing the next one.
+        self._previousMovingRects = []
+        #The area of the screen each wall segment covers, and the colour it was highlighted in on the previous frame, indexed by the wall segment id.
+        self._wallRects = {}
+        self._previousWallColours = {}
         self.updateDisplay()
     
-    def _pymunkToPygame(self, point):
-        """Converts pymunk coordinates to pygame coordinates."""
+    def _getPygameVertexes(self, shape):
+        """Takes a pymunk Poly shape and returns its vertexes in pygame coordinates.
+        The world positions of the vertexes are read from the state table, and scaled to the screen all at once."""
+        worldVertexes = SimBase.stateTable.getVertexes(shape)
         width, height = self.screen.get_size()
-        return int((point.x + 3.1) * width / 6.2), int((3.1 - point.y) * height / 6.2)
+        viewHalfSize = self._viewHalfSize
+        viewSize = 2 * viewHalfSize
+        pygameXs = ((worldVertexes[:, 0] + viewHalfSize) * width / viewSize).astype(int)
+        pygameYs = ((viewHalfSize - worldVertexes[:, 1]) * height / viewSize).astype(int)
+        return list(zip(pygameXs.tolist(), pygameYs.tolist()))
 
-    def _drawPoly(self, shape, colour, borderColour = None):
-        """Takes a pymunk Poly shape and draws the polygon in the specified colour, with a border if the borderColour argument is set."""
-        vertexes = shape.get_vertices()
-        pygameVertexes = []
-        for vertex in vertexes:
-            worldVertex = shape.body.local_to_world(vertex)
-            pygameVertexes.append(self._pymunkToPygame(worldVertex))
-
-        pygame.draw.polygon(self.screen, colour , pygameVertexes)
+    def _drawPoly(self, shape, colour, borderColour = None, surface = None):
+        """Takes a pymunk Poly shape and draws the polygon in the specified colour, with a border if the borderColour argument is set.
+        Draws onto the screen unless another surface is given, and returns the rectangle that was drawn over."""
+        if surface == None:
+            surface = self.screen
+        pygameVertexes = self._getPygameVertexes(shape)
+        drawnRect = pygame.draw.polygon(surface, colour , pygameVertexes)
         if borderColour != None:
-            pygame.draw.polygon(self.screen, borderColour , pygameVertexes, 3)
+            drawnRect.union_ip(pygame.draw.polygon(surface, borderColour , pygameVertexes, 3))
+        #Pad the rectangle slightly, so that rounding never leaves part of the polygon behind when it is erased.
+        return drawnRect.inflate(2, 2)
+
+    def _getMostRecentlySeenTeam(self, body):
+        """Returns the team that most recently saw the body within the last second, or None if no team has."""
+        if SimBase.theTime - body.lastSeenTime < 1:
+            return body.lastSeenTeam
+        return None
+
+    def _renderStaticLayer(self):
+        """Draws the background, zones and unhighlighted walls onto a surface matching the size of the screen."""
+        self._staticLayer = pygame.Surface(self.screen.get_size()).convert()
+        self._staticLayer.fill((255,255,255))
+        #Zones are drawn first to ensure they are underneath the walls.
+        for zone in SimBase.zones:
+            for shape in zone.shapes:
+                self._drawPoly(shape, Display._getTeamColour(zone.teamNumber, True), surface = self._staticLayer)
+        self._wallRects = {}
+        for wallSegment in SimBase.wallSegments:
+            for shape in wallSegment.shapes:
+                self._wallRects[wallSegment.id] = self._drawPoly(shape, Color("Black"), surface = self._staticLayer)
 
     def processInputs(self):
         """Checks to see if the window has been closed or the Escape key has been pressed,
-        and if it has, ends the simulation by setting the duration to the current time.
+        and if it has, ends the simulation by setting the duration to the current time. Closing the window also stops any more matches being played.
         Also rescales the display if the window size is changed."""
         for event in pygame.event.get():
             if event.type == QUIT:
                 SimBase.endTime = SimBase.theTime
+                SimBase.isQuitRequested = True
             elif event.type == KEYDOWN and event.key == K_ESCAPE:
                 SimBase.endTime = SimBase.theTime
             elif event.type == VIDEORESIZE:
                 self.screen = pygame.display.set_mode((event.w, event.h), pygame.RESIZABLE)
+                self._staticLayer = None
 
     def updateDisplay(self):
-        """Updates the display to the current state of SimBase.space, and then waits
-        a variable amount of time to keep the framerate consistent at 64 fps"""
-        self.screen.lock()
-        self.screen.fill((255,255,255))
-        #Drawing is done in two passes to ensure the zones are drawn underneath the tokens or walls.
-        for shape in SimBase.space.shapes:
-            if isinstance(shape.body, SimBase.Zone):
-                colour = Display._darkTeamColourDictionary[shape.body.teamNumber]
-                self._drawPoly(shape, colour)
-        
-        for shape in SimBase.space.shapes:
-            if isinstance(shape.body, SimBase.Token):
-                mostRecentSeen = -5
-                bestBorderColor = None
-                for team in range(4):
-                    if (SimBase.theTime - shape.body.lastSeenList[team] < 1) and (shape.body.lastSeenList[team] > mostRecentSeen):
-                        bestBorderColor = Display._darkTeamColourDictionary[team]
-                        mostRecentSeen = shape.body.lastSeenList[team]
-
-                self._drawPoly(shape, self._tokenTypeColourDictionary[shape.body.type], bestBorderColor)
-            elif isinstance(shape.body, SimBase.WallSegment):
-                bestColour = Color("Black")
-                mostRecentSeen = -5
-                for team in range(4):
-                    if (SimBase.theTime - shape.body.lastSeenList[team] < 1) and (shape.body.lastSeenList[team] > mostRecentSeen):
-                        bestColour = Display._teamColourDictionary[team]
-                        mostRecentSeen = shape.body.lastSeenList[team]
-
-                self._drawPoly(shape, bestColour)
-            
-            elif isinstance(shape.body, SimBase.Robot):
-                self._drawPoly(shape, Display._teamColourDictionary[shape.body.teamNumber])
-                
-        self.screen.unlock()
-        pygame.display.flip()
-        self.clock.tick(64)
+        """Updates the display to the current state of SimBase.space.
+        How often this is called (and so the frame rate) is decided by the Simulator's main loop.
+
+        Only the parts of the screen that have changed are redrawn: the areas covered by moving bodies on the last frame, and walls
+        that have changed colour, are restored from the cached static layer. Then the highlighted walls in those areas and all the
+        moving bodies are drawn on top."""
+        wallColours = {}
+        for wallSegment in SimBase.wallSegments:
+            team = self._getMostRecentlySeenTeam(wallSegment)
+            if team != None:
+                wallColours[wallSegment.id] = Display._getTeamColour(team)
+
+        isFullRedraw = self._staticLayer == None
+        if isFullRedraw:
+            self._renderStaticLayer()
+            restoredRects = [self.screen.get_rect()]
+        else:
+            restoredRects = self._previousMovingRects
+            for wallSegment in SimBase.wallSegments:
+                if wallColours.get(wallSegment.id) != self._previousWallColours.get(wallSegment.id):
+                    restoredRects.append(self._wallRects[wallSegment.id])
+        for restoredRect in restoredRects:
+            self.screen.blit(self._staticLayer, restoredRect, restoredRect)
+
+        for wallSegment in SimBase.wallSegments:
+            if wallSegment.id in wallColours and self._wallRects[wallSegment.id].collidelist(restoredRects) != -1:
+                for shape in wallSegment.shapes:
+                    self._drawPoly(shape, wallColours[wallSegment.id])
+
+        movingRects = []
+        for token in SimBase.tokens:
+            team = self._getMostRecentlySeenTeam(token)
+            borderColour = None
+            if team != None:
+                borderColour = Display._getTeamColour(team, True)
+            for shape in token.shapes:
+                movingRects.append(self._drawPoly(shape, Display._getTokenColour(token.type), borderColour))
+        for robot in SimBase.robots:
+            for shape in robot.shapes:
+                movingRects.append(self._drawPoly(shape, Display._getTeamColour(robot.teamNumber)))
+
+        if isFullRedraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(restoredRects + movingRects)
+        self._previousMovingRects = movingRects
+        self._previousWallColours = wallColours
+        if self._frameWriter != None:
+            self._frameWriter.submit(self.screen)
+
+class FrameScheduler:
+    """Decides when the display is drawn during a match: every stepsPerFrame physics steps if that's set, otherwise once every frameInterval seconds of wall-clock time.
+    If drawing has fallen behind, because drawing a frame took longer than the interval, the frames missed are skipped rather than drawn late,
+    and the next frame is due a whole interval after the last one was drawn, so the physics still gets to run between frames."""
+
+    def __init__(self, display, frameInterval, stepsPerFrame = 0, clock = time.perf_counter):
+        """Creates a scheduler for the display, with the first frame due one interval from now by the clock (in seconds)."""
+        self._display = display
+        self._frameInterval = frameInterval
+        self._stepsPerFrame = stepsPerFrame
+        self._clock = clock
+        self.nextFrameTime = clock() + frameInterval
+
+    def update(self, stepCount):
+        """Draws the display if a frame is due, now that stepCount steps of the match have been simulated. Returns whether it was drawn."""
+        if self._stepsPerFrame > 0:
+            if stepCount % self._stepsPerFrame != 0:
+                return False
+            self._display.updateDisplay()
+            return True
+        if self._clock() < self.nextFrameTime:
+            return False
+        self._display.updateDisplay()
+        currentTime = self._clock()
+        if self.nextFrameTime + self._frameInterval < currentTime:
+            self.nextFrameTime = currentTime + self._frameInterval
+        else:
+            self.nextFrameTime += self._frameInterval
+        return True
@@ -0,0 +1,62 @@
+import unittest
+
+import SimDisplay
+
+class FakeClock:
+    """A wall clock that only moves when it's told to, so the frame scheduler can be tested without waiting."""
+
+    def __init__(self):
+        self.time = 0
+
+    def __call__(self):
+        return self.time
+
+class FakeDisplay:
+    """A display that counts the frames drawn, and takes drawTime seconds of the clock to draw each one."""
+
+    def __init__(self, clock, drawTime):
+        self._clock = clock
+        self._drawTime = drawTime
+        self.frameCount = 0
+
+    def updateDisplay(self):
+        self.frameCount += 1
+        self._clock.time += self._drawTime
+
+class FrameSchedulerTest(unittest.TestCase):
+
+    def _run(self, drawTime, stepTime, stepCount, stepsPerFrame = 0):
+        """Steps the scheduler stepCount times, with each step taking stepTime seconds of the clock,
+        and returns the display and which of the steps drew a frame."""
+        clock = FakeClock()
+        display = FakeDisplay(clock, drawTime)
+        scheduler = SimDisplay.FrameScheduler(display, 1 / 64, stepsPerFrame, clock)
+        framesDrawn = []
+        for step in range(1, stepCount + 1):
+            clock.time += stepTime
+            framesDrawn.append(scheduler.update(step))
+        return display, framesDrawn, clock.time
+
+    def testFrameRate(self):
+        """Tests that frames are drawn at the frame rate when drawing is quick, without drifting."""
+        display, framesDrawn, endTime = self._run(0, 0.001, 1000)
+        self.assertEqual(display.frameCount, 64)
+
+    def testSlowDrawing(self):
+        """Tests that when drawing a frame takes longer than the frame interval, the frames missed are skipped,
+        and the physics is stepped for the interval between each frame rather than a frame being drawn after every step."""
+        display, framesDrawn, endTime = self._run(0.1, 0.001, 1000)
+        for step in range(1, len(framesDrawn)):
+            self.assertFalse(framesDrawn[step - 1] and framesDrawn[step])
+        #Each frame takes 0.1s to draw, and is followed by an interval of 1/64s without drawing.
+        self.assertAlmostEqual(display.frameCount, endTime / (0.1 + 1 / 64), delta = 1)
+        self.assertEqual(framesDrawn[:17].count(True), 1)
+
+    def testStepsPerFrame(self):
+        """Tests that with a number of steps per frame, frames are drawn every that many steps however long they take to draw."""
+        display, framesDrawn, endTime = self._run(0.1, 0.001, 100, 10)
+        self.assertEqual(display.frameCount, 10)
+        self.assertEqual([step + 1 for step in range(100) if framesDrawn[step]], list(range(10, 101, 10)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,308 @@
+import json
+import math
+
+import numpy
+
+import SimBase
+import SimKinematic
+
+"""A vectorised, gym style environment for training robot controllers, which steps many arenas in lockstep inside one process.
+
+Each call to step() takes the motor powers of every robot in every arena as one array, and returns NumPy arrays of what the robots observe,
+the points each robot's team scored, and which arenas' matches have ended. Arenas whose matches end are reset straight away with new motor noise,
+so the batch never has to wait for them. The arenas are simulated by SimKinematic.KinematicArena rather than pymunk, and the markers
+each robot can see are worked out in the same vectorised way, following the tests SimVision.see() makes on the corners of each marker:
+the marker has to be in the camera's field of view, large enough to be resolved, and have a corner that no token or other robot is in front of.
+Unlike see(), there is no random noise in the number of pixels a marker needs to be resolved, and as the kinematic tokens don't rotate,
+their markers are always square to the arena."""
+
+#The corners of a wall marker, relative to the centre of the wall segment, before it is rotated to the wall's angle. As in SimVision, the marker is 0.25m square,
+#0.05m above the floor.
+_wallMarkerCorners = numpy.array([(0, -0.125, 0.05), (0, 0.125, 0.05), (0, 0.125, 0.3), (0, -0.125, 0.3)])
+#The height of a token, and the corners of the markers on its two sides facing each way along x, its two sides facing each way along y, and its top,
+#relative to its centre. Each marker leaves a 5mm border around the edge of the face, and its corners are in the same order as SimVision's, as see() checks them in turn.
+_tokenHeight = 0.11
+_tokenFaceCorners = numpy.array([
+    [(-0.055, -0.05, 0.005), (-0.055, 0.05, 0.005), (-0.055, 0.05, 0.105), (-0.055, -0.05, 0.105)],
+    [(0.05, -0.055, 0.005), (-0.05, -0.055, 0.005), (-0.05, -0.055, 0.105), (0.05, -0.055, 0.105)],
+    [(0.05, 0.055, 0.005), (0.05, 0.055, 0.105), (-0.05, 0.055, 0.105), (-0.05, 0.055, 0.005)],
+    [(0.055, -0.05, 0.005), (0.055, -0.05, 0.105), (0.055, 0.05, 0.105), (0.055, 0.05, 0.005)],
+    [(-0.05, -0.05, 0.11), (-0.05, 0.05, 0.11), (0.05, 0.05, 0.11), (0.05, -0.05, 0.11)]
+])
+_tokenFaceNormals = numpy.array([(-1, 0, 0), (0, -1, 0), (0, 1, 0), (1, 0, 0), (0, 0, 1)])
+
+class VectorEnvironment:
+    """A batch of environments, each a KinematicArena match with one robot per team, all controlled at once.
+
+    The observations are a dictionary of arrays, each with the environment as the first dimension and the robot as the second:
+        "Poses"         environments x robots x 3: the position and angle of each robot.
+        "Velocities"    environments x robots x 3: the velocity and angular velocity of each robot.
+        "Markers"       environments x robots x markers x 3: for each wall and token marker, if the robot can see it (1 or 0),
+                        and the distance and bearing to it from the robot's camera (0 if it can't be seen).
+        "Score Deltas"  environments x robots: the points the robot's team scored in the last step."""
+
+    def __init__(self, environmentCount = 1, arenaConfig = None, tokenConfig = None, seed = 0, resolution = (640, 480), stepsPerAction = 1, matchLength = None):
+        """Creates the environments, configured using the given dictionaries or the config files if none are given.
+        The robots' cameras take images of the given resolution, each action is held for stepsPerAction physics steps,
+        and each match lasts matchLength simulated seconds (the full match length if not given)."""
+        if arenaConfig == None:
+            with open("Arena Config.json") as ArenaConfig:
+                arenaConfig = json.loads(ArenaConfig.read())[0]
+        self.environmentCount = environmentCount
+        self.arena = SimKinematic.KinematicArena(environmentCount, arenaConfig, tokenConfig, seed)
+        self.robotCount = self.arena.teamCount
+        self.stepsPerAction = stepsPerAction
+        self.matchLength = matchLength if matchLength != None else self.arena.endTime
+        self._createCameras(resolution)
+        self._createWallMarkers()
+        self.markerCount = len(self._wallMarkerPositions) + len(self.arena.tokenTypes)
+        self.reset(seed)
+
+    def _createCameras(self, resolution):
+        """Reads each team's camera config and the size of its robot (which can get in the way of the other robots' cameras),
+        and works out the smallest angle a marker can subtend and still be resolved by each robot's camera."""
+        fieldsOfView = []
+        pixelsMinimums = []
+        cameraOffsets = []
+        cameraHeights = []
+        halfSizes = []
+        heights = []
+        for teamNumber in range(self.robotCount):
+            config = SimKinematic._readRobotConfig(teamNumber)
+            width = SimBase.sanitiseInput(config["Width"], float, 0.3, 0.01, 0.4)
+            length = SimBase.sanitiseInput(config["Length"], float, 0.4, 0.01, 0.4)
+            halfSizes.append((length / 2, width / 2))
+            heights.append(SimBase.sanitiseInput(config["Height"], float, 0.4, 0))
+            #The camera is at the front of the robot, as in SimVision.see().
+            cameraOffsets.append(length / 2)
+            cameraHeights.append(SimBase.sanitiseInput(config["Camera Height"], float, 0.3, 0))
+            #The same half angle, in radians, as SimBase.Robot.fieldOfView.
+            fieldsOfView.append(SimBase.sanitiseInput(config["Camera Field of View"], float, 45, 0, 360) * math.pi / 360)
+            pixelsMinimums.append(SimBase.sanitiseInput(config["Marker Pixels Minimum"], int, 0, 0))
+        self._cameraOffsets = numpy.array(cameraOffsets)
+        self._cameraHeights = numpy.array(cameraHeights)
+        self._robotHalfSizes = numpy.array(halfSizes)
+        self._robotHeights = numpy.array(heights)
+        self._fieldsOfView = numpy.array(fieldsOfView)
+        #As in SimVision, a marker is resolvable if the angles between its corners are more than its minimum number of pixels at the camera's pixels per radian.
+        #A camera without any pixels or field of view can't resolve anything.
+        if resolution[0] == 0:
+            self._minimumResolvableAngles = numpy.full(self.robotCount, math.inf)
+        else:
+            self._minimumResolvableAngles = numpy.where(self._fieldsOfView == 0, math.inf, numpy.array(pixelsMinimums) * self._fieldsOfView / resolution[0])
+
+    def _createWallMarkers(self):
+        """Works out the position and corners of the marker on each wall segment, in the same order as ArenaService creates them."""
+        sideLength = round(2 * self.arena.wallDistance * math.tan(math.pi / self.robotCount), 9)
+        segmentsPerSide = max(1, round(sideLength))
+        segmentLength = sideLength / segmentsPerSide
+        positions = []
+        corners = []
+        for teamSide in range(self.robotCount):
+            angle = self.arena.teamAngles[teamSide]
+            rotation = numpy.array([[math.cos(angle), -math.sin(angle), 0], [math.sin(angle), math.cos(angle), 0], [0, 0, 1]])
+            for segmentNumber in range(segmentsPerSide):
+                x = -self.arena.wallDistance
+                y = (segmentNumber + 0.5) * segmentLength - sideLength / 2
+                position = rotation @ (x, y, 0)
+                positions.append(position[:2])
+                corners.append(position + _wallMarkerCorners @ rotation.T)
+        self._wallMarkerPositions = numpy.array(positions)
+        self._wallMarkerCorners = numpy.array(corners)
+
+    def seed(self, seed):
+        """Seeds each environment's own random generator, which draws its motor noise whenever it is reset. Takes a single seed,
+        from which every environment's seed is derived, or a list of a seed per environment."""
+        if numpy.ndim(seed) == 0:
+            seeds = [(seed, environment) for environment in range(self.environmentCount)]
+        else:
+            if len(seed) != self.environmentCount:
+                raise RuntimeError("Attempted to seed " + str(self.environmentCount) + " environments with " + str(len(seed)) + " seeds.")
+            seeds = list(seed)
+        self._randomGenerators = [numpy.random.default_rng(environmentSeed) for environmentSeed in seeds]
+
+    def _resetEnvironments(self, environmentIndexes):
+        """Puts the given environments (or all of them) back to the start of a match, with new motor noise from their own random generators."""
+        self.arena.reset(environmentIndexes)
+        for environment in range(self.environmentCount) if environmentIndexes is None else environmentIndexes:
+            self.arena.randomiseMotorNoise(environment, self._randomGenerators[environment])
+
+    def reset(self, seed = None):
+        """Resets every environment (seeding them first, if a seed is given), and returns the observations."""
+        if seed is not None:
+            self.seed(seed)
+        self._resetEnvironments(None)
+        self._scores = self.arena.getScores()
+        return self._getObservations(numpy.zeros((self.environmentCount, self.robotCount)))
+
+    @staticmethod
+    def _getAnglesBetween(vectorsA, vectorsB):
+        """Returns the angles in radians between two arrays of 3D vectors, along their last dimension."""
+        dots = vectorsA[..., 0] * vectorsB[..., 0] + vectorsA[..., 1] * vectorsB[..., 1] + vectorsA[..., 2] * vectorsB[..., 2]
+        lengthsA = numpy.sqrt(vectorsA[..., 0] ** 2 + vectorsA[..., 1] ** 2 + vectorsA[..., 2] ** 2)
+        lengthsB = numpy.sqrt(vectorsB[..., 0] ** 2 + vectorsB[..., 1] ** 2 + vectorsB[..., 2] ** 2)
+        return numpy.arccos(numpy.clip(dots / numpy.maximum(lengthsA * lengthsB, 1e-12), -1, 1))
+
+    def _getHiddenCorners(self, cameraPositions, environments, robots, corners):
+        """Takes the positions of the cameras (environments x robots x 3), and a list of the markers they are looking at: the environment and robot of the camera,
+        and the corners of the marker (markers x corners x 3). Returns an array of markers x corners of if a token or another robot is in the way of each corner,
+        as SimVision's planes would find. Each body is a box on the floor, and the line to the corner is clipped to the box's footprint: it is in the way
+        if the line is below the top of the box where it enters or leaves the footprint. The line to a corner on the box's own surface only touches it there,
+        so a token never hides the markers it faces the camera with."""
+        arena = self.arena
+        tokenCount = arena.tokenPositions.shape[1]
+        #The bodies are the tokens and then the robots, with their positions and angles (environments x bodies), half sizes and heights.
+        bodyX = numpy.concatenate([arena.tokenPositions[:, :, 0], arena.robotPositions[:, :, 0]], axis = 1)
+        bodyY = numpy.concatenate([arena.tokenPositions[:, :, 1], arena.robotPositions[:, :, 1]], axis = 1)
+        bodyAngles = numpy.concatenate([numpy.zeros((self.environmentCount, tokenCount)), arena.robotAngles], axis = 1)
+        bodyHalfLengths = numpy.concatenate([numpy.full(tokenCount, SimKinematic._tokenRadius), self._robotHalfSizes[:, 0]])
+        bodyHalfWidths = numpy.concatenate([numpy.full(tokenCount, SimKinematic._tokenRadius), self._robotHalfSizes[:, 1]])
+        bodyRadii = numpy.hypot(bodyHalfLengths, bodyHalfWidths)
+        bodyHeights = numpy.concatenate([numpy.full(tokenCount, _tokenHeight), self._robotHeights])
+
+        #Like SimVision._Obstruction, a body is only tested against the corners if it could be in the way: looking down from above, the line to the centre
+        #of the marker has to pass within the circle around the body's footprint (widened by the marker's size), and the line to a corner has to be
+        #below the top of the body somewhere. The first and third corners of a marker are opposite each other, so they give its centre, size and lowest point.
+        cameraX = cameraPositions[environments, robots, 0]
+        cameraY = cameraPositions[environments, robots, 1]
+        cameraZ = cameraPositions[environments, robots, 2]
+        markerX = (corners[:, 0, 0] + corners[:, 2, 0]) / 2
+        markerY = (corners[:, 0, 1] + corners[:, 2, 1]) / 2
+        markerRadii = numpy.hypot(corners[:, 2, 0] - corners[:, 0, 0], corners[:, 2, 1] - corners[:, 0, 1]) / 2
+        sightX = (markerX - cameraX)[:, None]
+        sightY = (markerY - cameraY)[:, None]
+        offsetsX = bodyX[environments] - cameraX[:, None]
+        offsetsY = bodyY[environments] - cameraY[:, None]
+        fractions = numpy.clip((offsetsX * sightX + offsetsY * sightY) / numpy.maximum(sightX * sightX + sightY * sightY, 1e-12), 0, 1)
+        clearances = numpy.hypot(offsetsX - fractions * sightX, offsetsY - fractions * sightY) - bodyRadii - markerRadii[:, None]
+        couldObstruct = (clearances <= 1e-6) & (numpy.minimum(cameraZ, numpy.minimum(corners[:, 0, 2], corners[:, 2, 2]))[:, None] < bodyHeights)
+        #A robot's own body isn't in the way of its camera.
+        couldObstruct[numpy.arange(len(robots)), tokenCount + robots] = False
+        markers, bodies = numpy.nonzero(couldObstruct)
+        pairEnvironments = environments[markers]
+        cameraX, cameraY, cameraZ = cameraX[markers], cameraY[markers], cameraZ[markers]
+        pairBodyX = bodyX[pairEnvironments, bodies]
+        pairBodyY = bodyY[pairEnvironments, bodies]
+
+        #Put the ends of each line into the body's frame (pairs of a marker and a body x corners).
+        cosAngles = numpy.cos(bodyAngles[pairEnvironments, bodies])[:, None]
+        sinAngles = numpy.sin(bodyAngles[pairEnvironments, bodies])[:, None]
+        startsX = (cameraX - pairBodyX)[:, None]
+        startsY = (cameraY - pairBodyY)[:, None]
+        endsX = corners[markers, :, 0] - pairBodyX[:, None]
+        endsY = corners[markers, :, 1] - pairBodyY[:, None]
+        localStartsX = startsX * cosAngles + startsY * sinAngles
+        localStartsY = startsY * cosAngles - startsX * sinAngles
+        localEndsX = endsX * cosAngles + endsY * sinAngles
+        localEndsY = endsY * cosAngles - endsX * sinAngles
+        enterXs, leaveXs = self._getFractionsBetweenSides(localStartsX, localEndsX - localStartsX, bodyHalfLengths[bodies][:, None])
+        enterYs, leaveYs = self._getFractionsBetweenSides(localStartsY, localEndsY - localStartsY, bodyHalfWidths[bodies][:, None])
+        enterFractions = numpy.maximum(numpy.maximum(enterXs, enterYs), 0)
+        leaveFractions = numpy.minimum(numpy.minimum(leaveXs, leaveYs), 1)
+        cameraHeights = cameraZ[:, None]
+        rises = corners[markers, :, 2] - cameraHeights
+        lowestHeights = cameraHeights + numpy.minimum(enterFractions * rises, leaveFractions * rises)
+        isHiddenByBody = (leaveFractions - enterFractions > 1e-9) & (lowestHeights < bodyHeights[bodies][:, None] - 1e-9)
+        isHidden = numpy.zeros(corners.shape[:2], dtype = bool)
+        numpy.logical_or.at(isHidden, markers, isHiddenByBody)
+        return isHidden
+
+    @staticmethod
+    def _getFractionsBetweenSides(starts, directions, halfSizes):
+        """Takes the starts and directions of lines along one axis of a box's frame, and returns the fractions of the way along each line
+        where it goes between the two sides of the box that are halfSize either side of its centre, and where it leaves from between them.
+        A line parallel to the sides is between them all the way, or not at all."""
+        with numpy.errstate(divide = "ignore", invalid = "ignore"):
+            fractionsA = (-halfSizes - starts) / directions
+            fractionsB = (halfSizes - starts) / directions
+        isParallel = directions == 0
+        isBetween = numpy.abs(starts) <= halfSizes
+        enterFractions = numpy.where(isParallel, numpy.where(isBetween, -math.inf, math.inf), numpy.minimum(fractionsA, fractionsB))
+        leaveFractions = numpy.where(isParallel, numpy.where(isBetween, math.inf, -math.inf), numpy.maximum(fractionsA, fractionsB))
+        return enterFractions, leaveFractions
+
+    def _getMarkerFeatures(self):
+        """Returns an array of environments x robots x markers x 3: if each robot can see each marker, and the distance and bearing to it.
+        A token can be seen if the marker on any of its faces can be."""
+        arena = self.arena
+        cosAngles = numpy.cos(arena.robotAngles)
+        sinAngles = numpy.sin(arena.robotAngles)
+        cameraX = arena.robotPositions[:, :, 0] + cosAngles * self._cameraOffsets
+        cameraY = arena.robotPositions[:, :, 1] + sinAngles * self._cameraOffsets
+        wallCount = len(self._wallMarkerPositions)
+        tokenCount = arena.tokenPositions.shape[1]
+        markerX = numpy.concatenate([numpy.broadcast_to(self._wallMarkerPositions[:, 0], (self.environmentCount, wallCount)), arena.tokenPositions[:, :, 0]], axis = 1)
+        markerY = numpy.concatenate([numpy.broadcast_to(self._wallMarkerPositions[:, 1], (self.environmentCount, wallCount)), arena.tokenPositions[:, :, 1]], axis = 1)
+        offsetsX = markerX[:, None, :] - cameraX[:, :, None]
+        offsetsY = markerY[:, None, :] - cameraY[:, :, None]
+        distances = numpy.hypot(offsetsX, offsetsY)
+        #The bearing of each marker from the direction the camera faces, within (-pi, pi].
+        bearings = numpy.arctan2(offsetsY, offsetsX) - arena.robotAngles[:, :, None]
+        bearings = (bearings + math.pi) % (2 * math.pi) - math.pi
+
+        #The markers are the wall markers, and then the five faces of each token in turn.
+        tokenPositions = numpy.concatenate([arena.tokenPositions, numpy.zeros((self.environmentCount, tokenCount, 1))], axis = 2)
+        firstCorners = numpy.concatenate([numpy.broadcast_to(self._wallMarkerCorners[:, 0], (self.environmentCount, wallCount, 3)),
+                                          (tokenPositions[:, :, None, :] + _tokenFaceCorners[:, 0]).reshape(self.environmentCount, tokenCount * 5, 3)], axis = 1)
+        cameraPositions = numpy.stack([cameraX, cameraY, numpy.broadcast_to(self._cameraHeights, cameraX.shape)], axis = 2)
+        cameraNormals = numpy.stack([cosAngles, sinAngles, numpy.zeros(cosAngles.shape)], axis = 2)
+        #As in SimVision.see(), the corners of a marker are checked in turn until one is outside of the field of view, so only the markers
+        #with their first corner in view need to be looked at any further. The markers on the faces of a token facing away from the camera
+        #are always hidden by the token itself, so they aren't either.
+        firstCornerOffsets = firstCorners[:, None, :, :] - cameraPositions[:, :, None, :]
+        isChecked = self._getAnglesBetween(cameraNormals[:, :, None, :], firstCornerOffsets) <= self._fieldsOfView[:, None]
+        tokenFaceOffsets = firstCornerOffsets[:, :, wallCount:].reshape(self.environmentCount, self.robotCount, tokenCount, 5, 3)
+        isFacingAway = (tokenFaceOffsets[..., 0] * _tokenFaceNormals[:, 0] + tokenFaceOffsets[..., 1] * _tokenFaceNormals[:, 1] + tokenFaceOffsets[..., 2] * _tokenFaceNormals[:, 2]) >= 0
+        isChecked[:, :, wallCount:] &= ~isFacingAway.reshape(self.environmentCount, self.robotCount, tokenCount * 5)
+        environments, robots, markers = numpy.nonzero(isChecked)
+        #Work out all the corners of just those markers (markers x corners x 3).
+        isWall = markers < wallCount
+        tokenFaces = numpy.maximum(markers - wallCount, 0)
+        corners = numpy.where(isWall[:, None, None], self._wallMarkerCorners[numpy.minimum(markers, wallCount - 1)],
+                              tokenPositions[environments, tokenFaces // 5][:, None, :] + _tokenFaceCorners[tokenFaces % 5])
+        #The marker has to be resolvable, and then it is visible if any of the corners before the first outside of the field of view isn't hidden.
+        cornerOffsets = corners - cameraPositions[environments, robots][:, None, :]
+        minimumAngles = self._minimumResolvableAngles[robots]
+        isResolvable = ((self._getAnglesBetween(cornerOffsets[:, 0], cornerOffsets[:, 1]) > minimumAngles)
+                        & (self._getAnglesBetween(cornerOffsets[:, 0], cornerOffsets[:, 3]) > minimumAngles))
+        environments, robots, markers = environments[isResolvable], robots[isResolvable], markers[isResolvable]
+        corners, cornerOffsets = corners[isResolvable], cornerOffsets[isResolvable]
+        isInView = numpy.logical_and.accumulate(self._getAnglesBetween(cameraNormals[environments, robots][:, None, :], cornerOffsets) <= self._fieldsOfView[robots][:, None], axis = 1)
+        isHidden = self._getHiddenCorners(cameraPositions, environments, robots, corners)
+        isMarkerVisible = numpy.zeros(isChecked.shape, dtype = bool)
+        isCornerVisible = isInView & ~isHidden
+        isMarkerVisible[environments, robots, markers] = isCornerVisible[:, 0] | isCornerVisible[:, 1] | isCornerVisible[:, 2] | isCornerVisible[:, 3]
+        isFaceVisible = isMarkerVisible[:, :, wallCount:].reshape(self.environmentCount, self.robotCount, tokenCount, 5)
+        isVisible = numpy.concatenate([isMarkerVisible[:, :, :wallCount], isFaceVisible[..., 0] | isFaceVisible[..., 1] | isFaceVisible[..., 2] | isFaceVisible[..., 3] | isFaceVisible[..., 4]], axis = 2)
+        #Tokens being pushed are blurred, as in SimVision.see().
+        isVisible[:, :, wallCount:] &= ~arena.tokenIsMoving[:, None, :]
+        return numpy.stack([isVisible, numpy.where(isVisible, distances, 0), numpy.where(isVisible, bearings, 0)], axis = 3)
+
+    def _getObservations(self, scoreDeltas):
+        """Returns the dictionary of observation arrays for the current state of the arenas."""
+        arena = self.arena
+        return {
+            "Poses" : numpy.concatenate([arena.robotPositions, arena.robotAngles[:, :, None]], axis = 2),
+            "Velocities" : numpy.concatenate([arena.robotVelocities, arena.robotAngularVelocities[:, :, None]], axis = 2),
+            "Markers" : self._getMarkerFeatures(),
+            "Score Deltas" : scoreDeltas
+        }
+
+    def step(self, actions):
+        """Takes an array (or anything that broadcasts to one) of environments x robots x 2: the left and right motor powers of every robot,
+        from -100 to 100. Holds them for stepsPerAction physics steps, then returns the observations, the rewards (the points each robot's team scored),
+        an array of which environments' matches ended, and a dictionary of extra information: the "Final Scores" of each environment's match,
+        for the environments that ended. Environments whose matches ended are reset, so their observations are of the start of the next match."""
+        actions = numpy.broadcast_to(actions, (self.environmentCount, self.robotCount, 2))
+        self.arena.setMotorPowers(actions[:, :, 0], actions[:, :, 1])
+        for step in range(self.stepsPerAction):
+            self.arena.step()
+        scores = self.arena.getScores()
+        rewards = (scores - self._scores).astype(float)
+        dones = self.arena.times >= self.matchLength - 1e-9
+        infos = {"Final Scores" : numpy.where(dones[:, None], scores, 0)}
+        if dones.any():
+            self._resetEnvironments(numpy.nonzero(dones)[0])
+            scores = self.arena.getScores()
+        self._scores = scores
+        return self._getObservations(rewards), rewards, dones, infos
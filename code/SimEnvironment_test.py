@@ -0,0 +1,111 @@
+import unittest
+import random
+import math
+
+import numpy
+
+import SimTestCase
+import SimBase
+import SimVision
+import SimEnvironment
+
+class VectorEnvironmentTest(SimTestCase.SimTestCase):
+
+    def testAutoReset(self):
+        """Tests that driving out of the zones is rewarded, and that each environment is reset when its match ends."""
+        environment = SimEnvironment.VectorEnvironment(3, seed = 1, matchLength = 2)
+        totalRewards = numpy.zeros((3, environment.robotCount))
+        for step in range(128):
+            observations, rewards, dones, infos = environment.step([100, 100])
+            totalRewards += rewards
+        self.assertTrue(dones.all())
+        self.assertEqual(infos["Final Scores"].tolist(), [[1, 1, 1, 1]] * 3)
+        self.assertEqual(totalRewards.tolist(), [[1, 1, 1, 1]] * 3)
+        self.assertEqual(environment.arena.times.tolist(), [0, 0, 0])
+        self.assertEqual(observations["Poses"].tolist(), environment.reset()["Poses"].tolist())
+
+    def testSeeding(self):
+        """Tests that environments given the same seed behave the same, whichever batch they are in."""
+        environment = SimEnvironment.VectorEnvironment(2)
+        otherEnvironment = SimEnvironment.VectorEnvironment(3)
+        environment.reset([5, 6])
+        otherEnvironment.reset([7, 6, 5])
+        for step in range(64):
+            observations = environment.step([[[100, 60]], [[60, 100]]])[0]
+            otherObservations = otherEnvironment.step([[[0, 0]], [[60, 100]], [[100, 60]]])[0]
+        self.assertTrue(numpy.array_equal(observations["Poses"][0], otherObservations["Poses"][2]))
+        self.assertTrue(numpy.array_equal(observations["Markers"][1], otherObservations["Markers"][1]))
+        self.assertFalse(numpy.array_equal(observations["Poses"][0], observations["Poses"][1]))
+
+    def testMarkersSameAsVision(self):
+        """Tests that at the start of a match, each robot sees the same markers as SimVision.see() finds in the pymunk arena."""
+        self.createArena()
+        robots = [SimBase.Robot(teamNumber) for teamNumber in range(4)]
+        environment = SimEnvironment.VectorEnvironment(1)
+        markers = environment.reset()["Markers"]
+        self.assertEqual(markers.shape, (1, environment.robotCount, environment.markerCount, 3))
+        #The markers are the wall segments and then the tokens, in the order of their ids.
+        markerIds = [wallSegment.id for wallSegment in SimBase.wallSegments] + [token.id for token in SimBase.tokens]
+        for robot in robots:
+            #see() adds random noise to the pixel threshold, which the environment doesn't, so it is turned off.
+            robot.markerPixelsNoise = 0
+            seenIds = sorted(marker["Id"] for marker in SimVision.see(robot, (640, 480), False)["List of Markers"])
+            visibleIds = sorted(markerIds[marker] for marker in numpy.nonzero(markers[0, robot.teamNumber, :, 0])[0])
+            self.assertEqual(visibleIds, seenIds)
+
+    def _getVisibleIds(self, environment, robots, markerIds):
+        """Returns the ids of the markers each robot sees with SimVision.see() in the pymunk arena, and that the environment finds it can see."""
+        markers = environment._getMarkerFeatures()
+        SimBase.stateTable.markStale()
+        seenIds = []
+        visibleIds = []
+        for robot in robots:
+            #A token can be seen through more than one of its faces, so the markers are compared by the bodies they are on.
+            seenIds.append({marker["Id"] for marker in SimVision.see(robot, (640, 480), False)["List of Markers"]})
+            visibleIds.append({markerIds[marker] for marker in numpy.nonzero(markers[0, robot.teamNumber, :, 0])[0]})
+        return seenIds, visibleIds
+
+    def testMarkersSameAsVisionMidMatch(self):
+        """Tests that with the robots and tokens scattered around the arena, as they are during a match, each robot sees the same markers
+        as SimVision.see() finds in the pymunk arena, including when tokens are in front of other tokens' markers."""
+        self.createArena()
+        robots = [SimBase.Robot(teamNumber) for teamNumber in range(4)]
+        for robot in robots:
+            robot.markerPixelsNoise = 0
+        environment = SimEnvironment.VectorEnvironment(1)
+        environment.reset()
+        arena = environment.arena
+        markerIds = [wallSegment.id for wallSegment in SimBase.wallSegments] + [token.id for token in SimBase.tokens]
+        def moveToken(tokenNumber, x, y):
+            SimBase.tokens[tokenNumber].position = (x, y)
+            arena.tokenPositions[0, tokenNumber] = (x, y)
+        def moveRobot(robot, x, y, angle):
+            robot.position = (x, y)
+            robot.angle = angle
+            arena.robotPositions[0, robot.teamNumber] = (x, y)
+            arena.robotAngles[0, robot.teamNumber] = angle
+
+        #Robot 0 looks along the x axis, straight at two tokens. The token just in front of the other hides its markers, but not once it is moved aside.
+        moveRobot(robots[0], -2.75, -0.25, 0)
+        moveToken(0, -1.6, -0.25)
+        moveToken(1, -1.48, -0.25)
+        seenIds, visibleIds = self._getVisibleIds(environment, robots, markerIds)
+        self.assertIn(SimBase.tokens[0].id, seenIds[0])
+        self.assertNotIn(SimBase.tokens[1].id, seenIds[0])
+        self.assertEqual(visibleIds, seenIds)
+        moveToken(0, 2.0, -2.0)
+        seenIds, visibleIds = self._getVisibleIds(environment, robots, markerIds)
+        self.assertIn(SimBase.tokens[1].id, seenIds[0])
+        self.assertEqual(visibleIds, seenIds)
+
+        randomGenerator = random.Random(4)
+        for state in range(20):
+            for tokenNumber in range(len(SimBase.tokens)):
+                moveToken(tokenNumber, randomGenerator.uniform(-2.5, 2.5), randomGenerator.uniform(-2.5, 2.5))
+            for robot in robots:
+                moveRobot(robot, randomGenerator.uniform(-2.5, 2.5), randomGenerator.uniform(-2.5, 2.5), randomGenerator.uniform(-math.pi, math.pi))
+            seenIds, visibleIds = self._getVisibleIds(environment, robots, markerIds)
+            self.assertEqual(visibleIds, seenIds)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,468 @@
+import json
+import math
+import os
+
+import numpy
+
+import SimBase
+
+"""A lightweight alternative to the pymunk simulation, for strategy searches that need many matches more than they need accurate physics.
+
+Instead of a rigid body solver, the robots' differential drive is integrated directly, the same way pymunk integrates a free body
+(the motor forces and the space's damping), and contacts are approximated: tokens are pushed out of the robots' footprints, robots are
+pushed apart as circles, and everything is clamped inside the walls.
+
+This is deliberately less than a full replacement for pymunk, and strategies found with it should be checked in the full simulation:
+ - Tokens never rotate, and never push each other, so a robot can push one token through another.
+ - Robots collide with each other as the circles that fit inside their footprints, so their corners can overlap.
+ - It is only faster when many arenas are stepped together. Every array has the arena as its first dimension, so any number of arenas
+   can be stepped with the same handful of NumPy operations, but the overhead of each NumPy call makes a single arena about three times
+   slower than pymunk. With hundreds of arenas or more it runs over ten times as many arena steps per second as one pymunk arena.
+CalibrateKinematic.py measures how far its trajectories drift from pymunk's, and its speed on the machine it is run on.
+
+BodyAdapter shows one of the arenas through the pymunk bodies that SimVision.see(), the robot services and the score reporting read,
+so robot programs can be run against it."""
+
+#The half size of a token, the same as SimBase.Token.
+_tokenRadius = 0.055
+#The half length and half width of a zone, the same as SimBase.Zone.
+_zoneHalfLength = 0.5
+_zoneHalfWidth = 1
+#The pymunk space's damping, which ArenaService always sets to 0.01.
+_damping = 0.01
+#How close a robot has to be to a token to count as touching it.
+_contactDistance = 0.005
+
+def _readRobotConfig(teamNumber):
+    """Returns the dictionary of configuration options for the team's robot, falling back to the first team's config like SimBase.Robot."""
+    configFilename = "Robot " + str(teamNumber) + " Config.json"
+    if not os.path.exists(configFilename):
+        configFilename = "Robot 0 Config.json"
+    with open(configFilename) as RobotConfig:
+        return json.loads(RobotConfig.read())[0]
+
+def _getIndexesWhere(isTrue):
+    """Returns a tuple of arrays of the indexes of the True elements of a boolean array, the same as numpy.nonzero().
+    For the large, mostly False arrays of the contact tests, finding the flat indexes and dividing them up is several times faster."""
+    flatIndexes = numpy.flatnonzero(isTrue)
+    indexes = []
+    for size in reversed(isTrue.shape[1:]):
+        flatIndexes, lastIndexes = numpy.divmod(flatIndexes, size)
+        indexes.insert(0, lastIndexes)
+    indexes.insert(0, flatIndexes)
+    return tuple(indexes)
+
+class KinematicArena:
+    """A batch of arenas, each with one robot per team, simulated with differential drive kinematics in NumPy.
+
+    The state of the arenas is held in arrays that can be read directly: robotPositions (arenas x robots x 2), robotAngles, robotVelocities,
+    robotAngularVelocities, tokenPositions (arenas x tokens x 2) and times. The motor powers are set with setMotorPowers(), and the arenas are
+    advanced with step(). Every arena uses the same arena, token and robot configs, but gets its own motor noise."""
+
+    def __init__(self, arenaCount = 1, arenaConfig = None, tokenConfig = None, seed = 0):
+        """Creates the arenas in their starting layout, from the given config dictionaries or the config files if none are given.
+        The seed is used to generate the motor noise for each robot in each arena."""
+        if arenaConfig == None:
+            with open("Arena Config.json") as ArenaConfig:
+                arenaConfig = json.loads(ArenaConfig.read())[0]
+        if tokenConfig == None:
+            with open("Token Position Config.json") as TokenConfig:
+                tokenConfig = json.loads(TokenConfig.read())
+        self.arenaCount = arenaCount
+        self.teamCount = SimBase.sanitiseInput(arenaConfig["Teams"], int, 4, 3)
+        self.wallDistance = SimBase.sanitiseInput(arenaConfig["Wall Distance"], float, 3, 1)
+        self.stepSize = SimBase.sanitiseInput(arenaConfig["Step Size"], float, 1/64, 0.001, 0.1)
+        self.endTime = SimBase.endTime
+        self._randomGenerator = numpy.random.default_rng(seed)
+
+        #The rotation of each team's side of the arena, the same as SimBase.getTeamAngle(), kept within (-pi, pi].
+        halfTurns = -2 * numpy.arange(self.teamCount) / self.teamCount
+        halfTurns[halfTurns <= -1] += 2
+        self.teamAngles = math.pi * halfTurns
+        #The direction from the centre of the arena to each side's wall, and the centre of each team's zone.
+        self._wallNormals = -numpy.stack([numpy.cos(self.teamAngles), numpy.sin(self.teamAngles)], axis = 1)
+        self.zonePositions = self._wallNormals * self.wallDistance
+        self._zoneCos = numpy.cos(self.teamAngles)
+        self._zoneSin = numpy.sin(self.teamAngles)
+        #The same as SimBase.getSideLength().
+        halfSideLength = round(2 * self.wallDistance * math.tan(math.pi / self.teamCount), 9) / 2
+
+        self._createRobots(halfSideLength)
+        self._createTokens(tokenConfig)
+        self.reset()
+
+    def _createRobots(self, halfSideLength):
+        """Reads each team's robot config, and works out the constants used to integrate the robots' motion and their starting positions."""
+        self.robotTeams = numpy.arange(self.teamCount)
+        masses = []
+        moments = []
+        axleLengths = []
+        maxPowers = []
+        powerOffsets = []
+        halfLengths = []
+        halfWidths = []
+        radii = []
+        startingPositions = []
+        for teamNumber in range(self.teamCount):
+            config = _readRobotConfig(teamNumber)
+            width = SimBase.sanitiseInput(config["Width"], float, 0.3, 0.01, 0.4)
+            length = SimBase.sanitiseInput(config["Length"], float, 0.4, 0.01, 0.4)
+            mass = SimBase.sanitiseInput(config["Mass"], float, 1, 0.001)
+            masses.append(mass)
+            #The moment of inertia of a box, which is what pymunk calculates for the robot's shape.
+            moments.append(mass * (width ** 2 + length ** 2) / 12)
+            axleLengths.append(SimBase.sanitiseInput(config["Distance Between Wheels"], float, 0, 0))
+            maxPowers.append(SimBase.sanitiseInput(config["Maximum Motor Power"], float, 1, 0))
+            powerOffsets.append(SimBase.sanitiseInput(config["Motor Noise Range"], float, 0, 0))
+            halfLengths.append(length / 2)
+            halfWidths.append(width / 2)
+            #The robot is treated as a circle that fits inside its footprint when it pushes tokens and other robots.
+            radii.append(min(width, length) / 2)
+            startingOffset = (
+                SimBase.sanitiseInput(config["Starting Position"][0], float, 0, -0.25 + length / 2, 2 * self.wallDistance - 0.25 - length / 2),
+                SimBase.sanitiseInput(config["Starting Position"][1], float, 0, -halfSideLength + width / 2, halfSideLength - width / 2)
+            )
+            x = 0.25 - self.wallDistance + startingOffset[0]
+            y = startingOffset[1]
+            angle = self.teamAngles[teamNumber]
+            startingPositions.append((x * math.cos(angle) - y * math.sin(angle), x * math.sin(angle) + y * math.cos(angle)))
+        self._robotMasses = numpy.array(masses)
+        self._robotMoments = numpy.array(moments)
+        self._robotAxleLengths = numpy.array(axleLengths)
+        self._robotHalfLengths = numpy.array(halfLengths)
+        self._robotHalfWidths = numpy.array(halfWidths)
+        self.robotRadii = numpy.array(radii)
+        self._startingRobotPositions = numpy.array(startingPositions)
+        self._startingRobotAngles = numpy.array(self.teamAngles)
+        self._robotMaxPowers = numpy.array(maxPowers)
+        self._robotPowerOffsets = numpy.array(powerOffsets)
+        self.leftMaxPowers = numpy.zeros((self.arenaCount, self.teamCount))
+        self.rightMaxPowers = numpy.zeros((self.arenaCount, self.teamCount))
+        self.randomiseMotorNoise()
+
+    def _createTokens(self, tokenConfig):
+        """Reads the token positions, clamped within the arena like ArenaService does, and the team of each gold token (-1 for ore)."""
+        positionLimit = self.wallDistance - _tokenRadius
+        self.tokenTypes = []
+        tokenGoldTeams = []
+        startingPositions = []
+        for tokenType, tokenPositions in tokenConfig.items():
+            for tokenPosition in tokenPositions:
+                xPosition = SimBase.sanitiseInput(tokenPosition[0], float, False)
+                yPosition = SimBase.sanitiseInput(tokenPosition[1], float, False)
+                if isinstance(xPosition, float) and isinstance(yPosition, float):
+                    xPosition, yPosition = SimBase.clampInsideWalls(xPosition, yPosition, self._wallNormals, positionLimit)
+                    self.tokenTypes.append(tokenType)
+                    #Gold token types are "Team t Gold".
+                    tokenGoldTeams.append(-1 if tokenType == "Ore" else int(tokenType.split(" ")[1]))
+                    startingPositions.append((xPosition, yPosition))
+        self._tokenGoldTeams = numpy.array(tokenGoldTeams, dtype = int)
+        self._startingTokenPositions = numpy.array(startingPositions, dtype = float).reshape(-1, 2)
+
+    def randomiseMotorNoise(self, arenaIndexes = None, randomGenerator = None):
+        """Gives the robots in the given arenas (or all of them) new motor noise, drawn from the given NumPy random generator or the arenas' own.
+        Like SimBase.Robot, each motor's maximum power is increased by a random amount up to half the noise range."""
+        if arenaIndexes is None:
+            arenaIndexes = slice(None)
+        if randomGenerator == None:
+            randomGenerator = self._randomGenerator
+        shape = self.leftMaxPowers[arenaIndexes].shape
+        self.leftMaxPowers[arenaIndexes] = self._robotMaxPowers + randomGenerator.uniform(0, 1, shape) * self._robotPowerOffsets / 2
+        self.rightMaxPowers[arenaIndexes] = self._robotMaxPowers + randomGenerator.uniform(0, 1, shape) * self._robotPowerOffsets / 2
+
+    def reset(self, arenaIndexes = None):
+        """Puts the given arenas (or all of them) back to their starting layout, with the motors off and the time at 0."""
+        if arenaIndexes is None:
+            robotShape = (self.arenaCount, self.teamCount)
+            self.robotPositions = numpy.broadcast_to(self._startingRobotPositions, robotShape + (2,)).copy()
+            self.robotAngles = numpy.broadcast_to(self._startingRobotAngles, robotShape).copy()
+            self.robotVelocities = numpy.zeros(robotShape + (2,))
+            self.robotAngularVelocities = numpy.zeros(robotShape)
+            self.leftPowers = numpy.zeros(robotShape)
+            self.rightPowers = numpy.zeros(robotShape)
+            self.hasLeftZone = numpy.zeros(robotShape, dtype = bool)
+            #Like the score tracker, which only finds out about a robot overlapping its zone when the space is stepped, no robot is known to overlap its zone until the first step.
+            self._isOverlappingZone = numpy.zeros(robotShape, dtype = bool)
+            self.tokenPositions = numpy.broadcast_to(self._startingTokenPositions, (self.arenaCount,) + self._startingTokenPositions.shape).copy()
+            self.tokenIsMoving = numpy.zeros(self.tokenPositions.shape[:2], dtype = bool)
+            self.times = numpy.zeros(self.arenaCount)
+            self._updateRobotDirections()
+            return
+        self.robotPositions[arenaIndexes] = self._startingRobotPositions
+        self.robotAngles[arenaIndexes] = self._startingRobotAngles
+        self.robotVelocities[arenaIndexes] = 0
+        self.robotAngularVelocities[arenaIndexes] = 0
+        self.leftPowers[arenaIndexes] = 0
+        self.rightPowers[arenaIndexes] = 0
+        self.hasLeftZone[arenaIndexes] = False
+        self._isOverlappingZone[arenaIndexes] = False
+        self.tokenPositions[arenaIndexes] = self._startingTokenPositions
+        self.tokenIsMoving[arenaIndexes] = False
+        self.times[arenaIndexes] = 0
+        self._updateRobotDirections()
+
+    def _updateRobotDirections(self):
+        """Works out the cosine and sine of every robot's angle, which are needed by most of the contact calculations."""
+        self._robotCos = numpy.cos(self.robotAngles)
+        self._robotSin = numpy.sin(self.robotAngles)
+
+    def setMotorPowers(self, leftPowers, rightPowers):
+        """Sets the power (from -100 to 100) of every robot's motors, from arrays (or anything that broadcasts to them) of arenas x robots."""
+        self.leftPowers[:] = numpy.clip(leftPowers, -100, 100)
+        self.rightPowers[:] = numpy.clip(rightPowers, -100, 100)
+
+    @property
+    def robotIsMoving(self):
+        """Returns an array of if each robot is moving, using the same thresholds as SimBase.Robot.isMoving."""
+        speedsSquared = (self.robotVelocities ** 2).sum(axis = 2)
+        return (speedsSquared > 0.02 ** 2) | (self.robotAngularVelocities > 0.05)
+
+    def step(self):
+        """Advances every arena by one step."""
+        dt = self.stepSize
+        cosAngles = self._robotCos
+        sinAngles = self._robotSin
+
+        #The same forces as SimBase.Robot.applyMotorForce(): each motor pushes forwards at its wheel, half the axle length from the centre.
+        leftForces = self.leftPowers / 100 * self.leftMaxPowers
+        rightForces = self.rightPowers / 100 * self.rightMaxPowers
+        forwardForces = leftForces + rightForces
+        torques = (rightForces - leftForces) * self._robotAxleLengths / 2
+
+        #Integrate the way pymunk does: move by the current velocity, then damp the velocity and add the acceleration from the forces
+        #(which point the way the robot was facing when they were applied, at the start of the step).
+        self.robotPositions += self.robotVelocities * dt
+        self.robotAngles += self.robotAngularVelocities * dt
+        dampingFactor = _damping ** dt
+        accelerations = forwardForces / self._robotMasses
+        self.robotVelocities *= dampingFactor
+        self.robotVelocities[:, :, 0] += accelerations * cosAngles * dt
+        self.robotVelocities[:, :, 1] += accelerations * sinAngles * dt
+        self.robotAngularVelocities = self.robotAngularVelocities * dampingFactor + torques / self._robotMoments * dt
+        self._updateRobotDirections()
+
+        self._separateRobots()
+        self._clampRobotsInsideWalls()
+        self._pushTokens()
+        self._updateHasLeftZone()
+        self.times += dt
+
+    def _separateRobots(self):
+        """Moves overlapping robots apart, each by half of the overlap.
+        Only the pairs of robots that overlap are worked on, as in most steps there are none."""
+        offsetsX = self.robotPositions[:, :, None, 0] - self.robotPositions[:, None, :, 0]
+        offsetsY = self.robotPositions[:, :, None, 1] - self.robotPositions[:, None, :, 1]
+        reaches = self.robotRadii[:, None] + self.robotRadii[None, :]
+        #A robot never overlaps itself, and robots exactly on top of each other have no direction to be separated in.
+        distancesSquared = offsetsX * offsetsX + offsetsY * offsetsY
+        isOverlapping = (distancesSquared < reaches * reaches) & (distancesSquared > 0)
+        if not isOverlapping.any():
+            return
+        arenas, robots, otherRobots = _getIndexesWhere(isOverlapping)
+        distances = numpy.sqrt(distancesSquared[arenas, robots, otherRobots])
+        pushes = (reaches[robots, otherRobots] - distances) / (2 * distances)
+        numpy.add.at(self.robotPositions, (arenas, robots, 0), offsetsX[arenas, robots, otherRobots] * pushes)
+        numpy.add.at(self.robotPositions, (arenas, robots, 1), offsetsY[arenas, robots, otherRobots] * pushes)
+
+    def _getTokenPenetrations(self, arenas, robots, tokens):
+        """Takes arrays of arena, robot and token indexes, and returns how far each token has gone into the robot's footprint along the
+        robot's length and width (negative if it is clear of it), and the token's position relative to the robot, in the robot's frame."""
+        offsets = self.tokenPositions[arenas, tokens] - self.robotPositions[arenas, robots]
+        cosAngles = self._robotCos[arenas, robots]
+        sinAngles = self._robotSin[arenas, robots]
+        localX = offsets[:, 0] * cosAngles + offsets[:, 1] * sinAngles
+        localY = -offsets[:, 0] * sinAngles + offsets[:, 1] * cosAngles
+        penetrationsX = self._robotHalfLengths[robots] + _tokenRadius - numpy.abs(localX)
+        penetrationsY = self._robotHalfWidths[robots] + _tokenRadius - numpy.abs(localY)
+        return penetrationsX, penetrationsY, localX, localY, cosAngles, sinAngles
+
+    def _pushTokens(self):
+        """Pushes every token that overlaps a robot's footprint out of the way (along whichever of the robot's axes is the shortest way out),
+        and keeps it inside the walls. Only the tokens that overlap a robot are worked on, and these are the only tokens that can be moving."""
+        self.tokenIsMoving[:] = False
+        #Most tokens are nowhere near a robot, so first find the few that are close along the x axis, which only needs one subtraction.
+        reaches = numpy.hypot(self._robotHalfLengths, self._robotHalfWidths) + _tokenRadius
+        offsetsX = self.tokenPositions[:, None, :, 0] - self.robotPositions[:, :, None, 0]
+        numpy.abs(offsetsX, out = offsetsX)
+        arenas, robots, tokens = _getIndexesWhere(offsetsX < reaches[None, :, None])
+        isClose = numpy.abs(self.tokenPositions[arenas, tokens, 1] - self.robotPositions[arenas, robots, 1]) < reaches[robots]
+        arenas = arenas[isClose]
+        robots = robots[isClose]
+        tokens = tokens[isClose]
+        if len(arenas) == 0:
+            return
+        penetrationsX, penetrationsY, localX, localY, cosAngles, sinAngles = self._getTokenPenetrations(arenas, robots, tokens)
+        isOverlapping = (penetrationsX > 0) & (penetrationsY > 0)
+        if not isOverlapping.any():
+            return
+        arenas = arenas[isOverlapping]
+        tokens = tokens[isOverlapping]
+        penetrationsX = penetrationsX[isOverlapping]
+        penetrationsY = penetrationsY[isOverlapping]
+        isPushedAlongX = penetrationsX < penetrationsY
+        localPushesX = numpy.where(isPushedAlongX, numpy.copysign(penetrationsX, localX[isOverlapping]), 0)
+        localPushesY = numpy.where(isPushedAlongX, 0, numpy.copysign(penetrationsY, localY[isOverlapping]))
+        cosAngles = cosAngles[isOverlapping]
+        sinAngles = sinAngles[isOverlapping]
+        pushes = numpy.stack([localPushesX * cosAngles - localPushesY * sinAngles, localPushesX * sinAngles + localPushesY * cosAngles], axis = 1)
+
+        previousPositions = self.tokenPositions[arenas, tokens]
+        numpy.add.at(self.tokenPositions, (arenas, tokens), pushes)
+        pushedPositions = self.tokenPositions[arenas, tokens]
+        #Tokens are kept inside the walls the same way as ArenaService limits their starting positions.
+        excesses = numpy.maximum(pushedPositions @ self._wallNormals.T - (self.wallDistance - _tokenRadius), 0)
+        pushedPositions -= excesses @ self._wallNormals
+        self.tokenPositions[arenas, tokens] = pushedPositions
+        #The token moved as fast as it was pushed, so it is moving if it was pushed further than the isMoving threshold in one step.
+        self.tokenIsMoving[arenas, tokens] = ((pushedPositions - previousPositions) ** 2).sum(axis = 1) > (0.02 * self.stepSize) ** 2
+
+    def _getRobotExtents(self, arenas, robots, directionCos, directionSin):
+        """Takes arrays of arena and robot indexes, and of the directions to measure in (as the cosine and sine of their angles),
+        and returns how far each robot's footprint reaches from its centre in that direction."""
+        robotCos = self._robotCos[arenas, robots]
+        robotSin = self._robotSin[arenas, robots]
+        cosRelativeAngles = robotCos * directionCos + robotSin * directionSin
+        sinRelativeAngles = robotSin * directionCos - robotCos * directionSin
+        return self._robotHalfLengths[robots] * numpy.abs(cosRelativeAngles) + self._robotHalfWidths[robots] * numpy.abs(sinRelativeAngles)
+
+    def _clampRobotsInsideWalls(self):
+        """Moves any robot whose footprint has gone through a wall back inside the arena, and stops it moving further into the wall.
+        Only the robots near enough to a wall for any part of them to reach it are worked on."""
+        normalsX = self._wallNormals[:, 0]
+        normalsY = self._wallNormals[:, 1]
+        distances = self.robotPositions[:, :, 0, None] * normalsX + self.robotPositions[:, :, 1, None] * normalsY
+        reaches = numpy.hypot(self._robotHalfLengths, self._robotHalfWidths)
+        arenas, robots, walls = _getIndexesWhere(distances > self.wallDistance - reaches[None, :, None])
+        if len(arenas) == 0:
+            return
+        extents = self._getRobotExtents(arenas, robots, normalsX[walls], normalsY[walls])
+        excesses = distances[arenas, robots, walls] - (self.wallDistance - extents)
+        isThroughWall = excesses > 0
+        arenas = arenas[isThroughWall]
+        robots = robots[isThroughWall]
+        walls = walls[isThroughWall]
+        excesses = excesses[isThroughWall]
+        #Robots in a corner are pushed out of both walls, and robots touching two walls are pushed out of the one they are furthest through.
+        numpy.add.at(self.robotPositions, (arenas, robots), -excesses[:, None] * self._wallNormals[walls])
+        velocities = self.robotVelocities[arenas, robots]
+        speedsIntoWalls = numpy.maximum((velocities * self._wallNormals[walls]).sum(axis = 1), 0)
+        numpy.add.at(self.robotVelocities, (arenas, robots), -speedsIntoWalls[:, None] * self._wallNormals[walls])
+
+    def _getPositionsInZones(self, positions):
+        """Returns the positions relative to each zone, in the zone's frame: an array of arenas x objects x zones x 2."""
+        offsets = positions[:, :, None, :] - self.zonePositions[None, None, :, :]
+        localX = offsets[..., 0] * self._zoneCos + offsets[..., 1] * self._zoneSin
+        localY = -offsets[..., 0] * self._zoneSin + offsets[..., 1] * self._zoneCos
+        return numpy.stack([localX, localY], axis = 3)
+
+    def _updateHasLeftZone(self):
+        """Flags robots as having left their own zone the same way as SimScoring.ScoreTracker, which only checks robots while they overlap their zone,
+        and once more as they stop overlapping it: a robot that overlaps its zone, or did on the last step, has left it if its footprint isn't entirely inside it.
+        So a robot that starts outside its zone isn't flagged unless it drives onto it. Robots that have already left are skipped."""
+        arenas, robots = _getIndexesWhere(~self.hasLeftZone)
+        if len(arenas) == 0:
+            return
+        teams = self.robotTeams[robots]
+        zoneCos = self._zoneCos[teams]
+        zoneSin = self._zoneSin[teams]
+        offsets = self.robotPositions[arenas, robots] - self.zonePositions[teams]
+        localX = offsets[:, 0] * zoneCos + offsets[:, 1] * zoneSin
+        localY = -offsets[:, 0] * zoneSin + offsets[:, 1] * zoneCos
+        #The extent of each robot along its own zone's x and y axes.
+        extentsX = self._getRobotExtents(arenas, robots, zoneCos, zoneSin)
+        extentsY = self._getRobotExtents(arenas, robots, -zoneSin, zoneCos)
+        isInside = (numpy.abs(localX) + extentsX <= _zoneHalfLength) & (numpy.abs(localY) + extentsY <= _zoneHalfWidth)
+        #This only checks for a gap along the zone's axes, like the score tracker's bounding boxes do for zones square to the arena.
+        isOverlapping = (numpy.abs(localX) < _zoneHalfLength + extentsX) & (numpy.abs(localY) < _zoneHalfWidth + extentsY)
+        self.hasLeftZone[arenas, robots] = ~isInside & (isOverlapping | self._isOverlappingZone[arenas, robots])
+        self._isOverlappingZone[arenas, robots] = isOverlapping
+
+    def getScores(self):
+        """Returns an array of the score of each team in each arena, using the same rules as SimScoring.ScoreTracker."""
+        arenaIndexes = numpy.arange(self.arenaCount)[:, None]
+        isGold = self._tokenGoldTeams >= 0
+
+        #Tokens fully inside a zone score for that zone's team.
+        localPositions = self._getPositionsInZones(self.tokenPositions)
+        isInZone = ((numpy.abs(localPositions) <= numpy.array([_zoneHalfLength, _zoneHalfWidth]) - _tokenRadius).all(axis = 3))
+        isInAnyZone = isInZone.any(axis = 2)
+        zoneTeams = isInZone.argmax(axis = 2)
+        zoneScores = numpy.where(isGold, numpy.where(self._tokenGoldTeams == zoneTeams, 7, -2), 5)
+
+        #Tokens touched by the robots of exactly one team score for that team.
+        arenas, robots, tokens = numpy.indices((self.arenaCount, self.teamCount, len(self.tokenTypes))).reshape(3, -1)
+        penetrationsX, penetrationsY = self._getTokenPenetrations(arenas, robots, tokens)[:2]
+        isTouching = ((penetrationsX > -_contactDistance) & (penetrationsY > -_contactDistance)).reshape(self.arenaCount, self.teamCount, -1)
+        #There is one robot per team, so the robot index is the team.
+        touchingTeamCounts = isTouching.sum(axis = 1)
+        touchingTeams = isTouching.argmax(axis = 1)
+        touchScores = numpy.where(isGold, numpy.where(self._tokenGoldTeams == touchingTeams, 3, -1), 1)
+
+        #Each token scores whichever is worth the most points either way, preferring being touched if they are worth the same, like Token.getScore.
+        touchPoints = numpy.where(touchingTeamCounts == 1, touchScores, 0)
+        zonePoints = numpy.where(isInAnyZone, zoneScores, 0)
+        isScoredByZone = numpy.abs(zonePoints) > numpy.abs(touchPoints)
+        points = numpy.where(isScoredByZone, zonePoints, touchPoints)
+        teams = numpy.where(isScoredByZone, zoneTeams, touchingTeams)
+        scores = numpy.zeros((self.arenaCount, self.teamCount), dtype = int)
+        numpy.add.at(scores, (numpy.broadcast_to(arenaIndexes, teams.shape), teams), points)
+        #A point for each robot that has left its zone.
+        scores += self.hasLeftZone
+        return scores
+
+class BodyAdapter:
+    """Connects one of a KinematicArena's arenas to the pymunk bodies of the current arena (SimBase.robots and SimBase.tokens), so that everything written
+    for the pymunk simulation can run on the kinematic simulation instead: SimVision.see() and the display read the bodies through SimBase.stateTable,
+    and the robot services set the motor powers of the robot bodies.
+
+    The pymunk space is never stepped. Instead, step() is called in place of SimBase.stepSimulation(): it gives the kinematic arena the robot bodies' motor powers,
+    steps it, and copies the robots' and tokens' new poses back onto the bodies. The score tracker's collision handlers are never called either,
+    so the adapter has the same getScores() as SimScoring.ScoreTracker, and can be put in SimBase.scoreTracker for ArenaService.getScores() to report."""
+
+    def __init__(self, kinematicArena, arenaIndex = 0):
+        """Takes a kinematic arena created from the same configs as the current arena, and the index of the arena to connect to the bodies.
+        The robot bodies must already have been created, and their motor noise is copied to the kinematic arena."""
+        if kinematicArena.teamCount != SimBase.teamCount or len(kinematicArena.tokenTypes) != len(SimBase.tokens):
+            raise RuntimeError("Attempted to connect a kinematic arena to an arena created from different configs.")
+        self.kinematicArena = kinematicArena
+        self.arenaIndex = arenaIndex
+        for robot in SimBase.robots:
+            kinematicArena.leftMaxPowers[arenaIndex, robot.teamNumber] = robot._leftMaxPower
+            kinematicArena.rightMaxPowers[arenaIndex, robot.teamNumber] = robot._rightMaxPower
+        self._updateBodies()
+
+    def _updateBodies(self):
+        """Copies the pose and velocity of every robot and token in the kinematic arena onto its body, and marks the state table as out of date.
+        The kinematic tokens have no velocity of their own, so they are given the velocity they were pushed at, for the state table to tell if they are moving."""
+        arena = self.kinematicArena
+        for robot in SimBase.robots:
+            robotIndex = (self.arenaIndex, robot.teamNumber)
+            robot.position = tuple(arena.robotPositions[robotIndex].tolist())
+            robot.angle = float(arena.robotAngles[robotIndex])
+            robot.velocity = tuple(arena.robotVelocities[robotIndex].tolist())
+            robot.angular_velocity = float(arena.robotAngularVelocities[robotIndex])
+            robot.hasLeftZone = bool(arena.hasLeftZone[robotIndex])
+        for token, position in zip(SimBase.tokens, arena.tokenPositions[self.arenaIndex].tolist()):
+            token.velocity = ((position[0] - token.position[0]) / arena.stepSize, (position[1] - token.position[1]) / arena.stepSize)
+            token.position = tuple(position)
+        SimBase.stateTable.markStale()
+
+    def step(self):
+        """Advances the simulation by one step, like SimBase.stepSimulation(), using the kinematic arena.
+        Every arena in the kinematic arena is stepped, but only the connected one has its robots' motor powers set from the bodies."""
+        arena = self.kinematicArena
+        for robot in SimBase.robots:
+            arena.leftPowers[self.arenaIndex, robot.teamNumber] = robot.leftPower
+            arena.rightPowers[self.arenaIndex, robot.teamNumber] = robot.rightPower
+        arena.step()
+        SimBase.theTime += arena.stepSize
+        self._updateBodies()
+        SimBase.metrics.steps += 1
+
+    def update(self):
+        """Does nothing, as the kinematic arena's scores are always up to date. This is here so the adapter can stand in for the score tracker."""
+        pass
+
+    def getScores(self):
+        """Returns the current score of each team in the connected arena, as a list like SimScoring.ScoreTracker.getScores()."""
+        return self.kinematicArena.getScores()[self.arenaIndex].tolist()
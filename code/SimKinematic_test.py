@@ -0,0 +1,125 @@
+import unittest
+import json
+
+import SimTestCase
+import SimBase
+import SimKinematic
+import SimVision
+
+class KinematicArenaTest(SimTestCase.SimTestCase):
+
+    def setUp(self):
+        """Creates an empty pymunk arena (without sleeping) and a kinematic arena, with a robot per team and the same motor noise."""
+        super().setUp()
+        with open("Arena Config.json") as ArenaConfig:
+            arenaConfig = json.loads(ArenaConfig.read())[0]
+        arenaConfig["Sleep Time Threshold"] = 0
+        self.createArena(arenaConfig, {})
+        self.kinematicArena = SimKinematic.KinematicArena(2, arenaConfig, {})
+        for teamNumber in range(4):
+            robot = SimBase.Robot(teamNumber)
+            robot._leftMaxPower = float(self.kinematicArena.leftMaxPowers[0, teamNumber])
+            robot._rightMaxPower = float(self.kinematicArena.rightMaxPowers[0, teamNumber])
+
+    def testTokensInsideTriangularArena(self):
+        """Tests that tokens are moved inside the walls of a three sided arena to the same places as in the pymunk arena."""
+        with open("Arena Config.json") as ArenaConfig:
+            arenaConfig = json.loads(ArenaConfig.read())[0]
+        arenaConfig["Teams"] = 3
+        tokenConfig = {"Ore" : [[4.0, 0.0], [2.9, 2.9], [-5.0, 1.0], [9.0, 0.0]]}
+        self.createArena(arenaConfig, tokenConfig)
+        kinematicArena = SimKinematic.KinematicArena(1, arenaConfig, tokenConfig)
+        self.assertEqual(len(kinematicArena.tokenPositions[0]), len(SimBase.tokens))
+        for token, position in zip(SimBase.tokens, kinematicArena.tokenPositions[0]):
+            self.assertAlmostEqual(position[0], token.position[0])
+            self.assertAlmostEqual(position[1], token.position[1])
+
+    def testStartingLayout(self):
+        """Tests that the robots start in the same places as in the pymunk arena."""
+        for robot in SimBase.robots:
+            self.assertAlmostEqual(self.kinematicArena.robotPositions[0, robot.teamNumber, 0], robot.position[0])
+            self.assertAlmostEqual(self.kinematicArena.robotPositions[0, robot.teamNumber, 1], robot.position[1])
+            self.assertAlmostEqual(self.kinematicArena.robotAngles[0, robot.teamNumber], robot.angle)
+
+    def testFreeMotionMatchesPymunk(self):
+        """Tests that a robot driving without touching anything follows the same path as in the pymunk arena."""
+        robot = SimBase.robots[0]
+        robot.leftPower = 80
+        robot.rightPower = 30
+        self.kinematicArena.setMotorPowers([[80, 0, 0, 0]], [[30, 0, 0, 0]])
+        for step in range(64 * 2):
+            SimBase.stepSimulation()
+            self.kinematicArena.step()
+        self.assertAlmostEqual(self.kinematicArena.robotPositions[0, 0, 0], robot.position[0], places = 9)
+        self.assertAlmostEqual(self.kinematicArena.robotPositions[0, 0, 1], robot.position[1], places = 9)
+        self.assertAlmostEqual(self.kinematicArena.robotAngles[0, 0], robot.angle, places = 9)
+
+    def testLeavingZoneAndReset(self):
+        """Tests that a robot driving out of its zone scores a point, and that resetting one arena leaves the other alone."""
+        self.kinematicArena.setMotorPowers(100, 100)
+        for step in range(64 * 3):
+            self.kinematicArena.step()
+        self.assertEqual(self.kinematicArena.getScores().tolist(), [[1, 1, 1, 1], [1, 1, 1, 1]])
+        self.kinematicArena.reset([1])
+        self.assertEqual(self.kinematicArena.getScores().tolist(), [[1, 1, 1, 1], [0, 0, 0, 0]])
+        self.assertEqual(self.kinematicArena.times.tolist(), [3, 0])
+
+    def testPartlyLeavingZone(self):
+        """Tests that a robot is flagged as having left its zone as soon as part of it is outside of it, like the pymunk arena."""
+        #Zone 0 covers x from -3.5 to -2.5, and the robot is 0.4m long, facing along the x axis.
+        self.kinematicArena.robotPositions[0, 0] = (-2.6, 0)
+        self.kinematicArena.step()
+        self.assertEqual(self.kinematicArena.hasLeftZone.tolist(), [[True, False, False, False], [False, False, False, False]])
+
+    def testStartingOutsideZone(self):
+        """Tests that a robot that isn't on its zone isn't flagged as having left it until it drives onto it, like the pymunk arena."""
+        self.kinematicArena.robotPositions[:, 0] = (-1.5, 0)
+        self.kinematicArena.step()
+        self.assertFalse(self.kinematicArena.hasLeftZone.any())
+        #Zone 0 covers x from -3.5 to -2.5, so the front of the robot is on it.
+        self.kinematicArena.robotPositions[0, 0] = (-2.4, 0)
+        self.kinematicArena.step()
+        self.assertEqual(self.kinematicArena.hasLeftZone.tolist(), [[True, False, False, False], [False, False, False, False]])
+
+    def testTouchingOwnGoldInAnotherZone(self):
+        """Tests that a team touching its own gold scores for it, rather than the zone of another team that the gold is in, like the pymunk arena."""
+        with open("Arena Config.json") as ArenaConfig:
+            arenaConfig = json.loads(ArenaConfig.read())[0]
+        #Zone 1 covers x from -1 to 1 and y from 2.5 to 3.5.
+        kinematicArena = SimKinematic.KinematicArena(1, arenaConfig, {"Team 0 Gold": [[0.0, 2.8]]})
+        kinematicArena.robotPositions[0, 1] = (0, -1.8)
+        #The robot is 0.4m long, facing along the x axis, so its front edge overlaps the token.
+        kinematicArena.robotPositions[0, 0] = (0.24, 2.8)
+        kinematicArena.robotAngles[0, 0] = 0
+        kinematicArena._updateRobotDirections()
+        self.assertEqual(kinematicArena.getScores().tolist(), [[3, 0, 0, 0]])
+
+    def testBodyAdapter(self):
+        """Tests that the adapter drives the robot bodies and tokens from the kinematic arena, so that see() and the arena's scores follow it."""
+        with open("Arena Config.json") as ArenaConfig:
+            arenaConfig = json.loads(ArenaConfig.read())[0]
+        tokenConfig = {"Ore" : [[-2.45, 0.0]]}
+        arena = self.createArena(arenaConfig, tokenConfig)
+        kinematicArena = SimKinematic.KinematicArena(2, arenaConfig, tokenConfig)
+        robots = [SimBase.Robot(teamNumber) for teamNumber in range(4)]
+        adapter = SimKinematic.BodyAdapter(kinematicArena, 1)
+        SimBase.scoreTracker = adapter
+        self.assertEqual(kinematicArena.leftMaxPowers[1, 2], robots[2]._leftMaxPower)
+        #Robot 0 drives straight at the token in front of it, and pushes it along.
+        robots[0].leftPower = 50
+        robots[0].rightPower = 50
+        for step in range(64):
+            adapter.step()
+        self.assertEqual(SimBase.theTime, 1)
+        self.assertEqual(kinematicArena.robotPositions[0, 0].tolist(), [-2.75, 0])
+        self.assertEqual(list(robots[0].position), kinematicArena.robotPositions[1, 0].tolist())
+        self.assertEqual(robots[0].angle, kinematicArena.robotAngles[1, 0])
+        self.assertEqual(list(SimBase.tokens[0].position), kinematicArena.tokenPositions[1, 0].tolist())
+        self.assertGreater(SimBase.tokens[0].position[0], -2.45)
+        self.assertTrue(SimBase.stateTable.getIsMoving(SimBase.tokens[0]))
+        self.assertEqual(arena.getScores(), kinematicArena.getScores()[1].tolist())
+        self.assertEqual(arena.getScores()[0], 2)
+        #The token is pushed along underneath the camera, out of its view, and the wall opposite (segments 12 to 17) is in view.
+        markerIds = [marker["Id"] for marker in SimVision.see(robots[0], (1280, 720), False)["List of Markers"]]
+        self.assertNotIn(SimBase.tokens[0].id, markerIds)
+        self.assertTrue(set(markerIds) & set(range(12, 18)))
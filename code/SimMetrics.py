@@ -0,0 +1,170 @@
+import bisect
+import json
+import threading
+import time
+
+#The upper bounds (in seconds) of the buckets of the latency histograms. Latencies longer than the last bound go in an extra, final bucket.
+latencyBuckets = [0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10]
+
+class _MethodMetrics:
+    """The counters for one method of one service."""
+
+    def __init__(self):
+        self.calls = 0
+        self.totalLatency = 0
+        self.maxLatency = 0
+        self.latencyCounts = [0] * (len(latencyBuckets) + 1)
+        self.bytesIn = 0
+        self.bytesOut = 0
+
+    def getDictionary(self):
+        """Returns the counters as a dictionary that can be sent over xmlrpc or written as json."""
+        return {
+            "Calls" : self.calls,
+            "Total Latency" : self.totalLatency,
+            "Mean Latency" : self.totalLatency / self.calls if self.calls > 0 else 0,
+            "Max Latency" : self.maxLatency,
+            "Latency Histogram" : list(self.latencyCounts),
+            "Bytes In" : self.bytesIn,
+            "Bytes Out" : self.bytesOut
+        }
+
+class _ServiceMetrics:
+    """The counters for one service (the arena, or a robot), and the time its thread spent handing control to and from the main thread."""
+
+    def __init__(self):
+        self.methods = {}
+        #The number of times and wall-clock time the service's thread waited in block() for the main thread to release it.
+        self.blocks = 0
+        self.blockedTime = 0
+        #The number of times and wall-clock time the service's thread ran for, from the main thread releasing it until it handed control back.
+        #The simulated time is stopped until every thread released with it has handed control back, so this is the wall-clock time the robot program cost the simulation.
+        self.unblocks = 0
+        self.unblockedTime = 0
+        #The number of times and wall-clock time the program calling the service spent thinking between getting the response to one call and making the next,
+        #while the simulation was waiting for it, the longest it thought for at once, and the simulated time it was charged for thinking.
+        self.thinks = 0
+        self.thinkTime = 0
+        self.maxThinkTime = 0
+        self.chargedTime = 0
+
+    def getDictionary(self):
+        """Returns the counters as a dictionary that can be sent over xmlrpc or written as json."""
+        return {
+            "Methods" : {methodName : methodMetrics.getDictionary() for methodName, methodMetrics in self.methods.items()},
+            "Blocks" : self.blocks,
+            "Blocked Time" : self.blockedTime,
+            "Unblocks" : self.unblocks,
+            "Unblocked Time" : self.unblockedTime,
+            "Thinks" : self.thinks,
+            "Think Time" : self.thinkTime,
+            "Max Think Time" : self.maxThinkTime,
+            "Charged Time" : self.chargedTime
+        }
+
+class MetricsRecorder:
+    """Counts the calls made to each service's xmlrpc methods, how long they took and how many bytes they sent and received,
+    the time spent handing control between the main thread and the service threads, the time the programs calling each service spent thinking
+    between calls, and the number of physics steps run.
+
+    Only one thread runs the simulation at a time, but the services' servers can be called during startup while the robot threads are running,
+    so the counters are protected by a lock."""
+
+    def __init__(self):
+        """Creates an empty set of counters. The steps per second are measured from when the recorder is created, until start() is first called."""
+        self._lock = threading.Lock()
+        self._services = {}
+        self.steps = 0
+        self.skippedSteps = 0
+        #The wall-clock and simulated time of the matches that have been stopped, and the wall-clock time the running match started (or None if none is running).
+        self._wallTime = 0
+        self._simulatedTime = 0
+        self._startWallTime = time.perf_counter()
+        self._hasStarted = False
+
+    def start(self):
+        """Starts the wall clock the steps per second are measured against, as each match's main loop starts.
+        The first time, the step counts are reset, so that only the steps of the matches are counted."""
+        with self._lock:
+            if not self._hasStarted:
+                self._hasStarted = True
+                self.steps = 0
+                self.skippedSteps = 0
+                self._wallTime = 0
+            self._startWallTime = time.perf_counter()
+
+    def stop(self, simulatedTime = 0):
+        """Stops the wall clock the steps per second are measured against, and adds the simulated time the match ran for. This is called when each match's
+        main loop ends, so the time the Controller spends showing the scores and resetting the arena between matches doesn't count."""
+        with self._lock:
+            if self._startWallTime != None:
+                self._wallTime += time.perf_counter() - self._startWallTime
+                self._simulatedTime += simulatedTime
+                self._startWallTime = None
+
+    def _getService(self, serviceName):
+        """Returns the counters for a service, creating them if this is the first time it has been seen. The lock must be held."""
+        if serviceName not in self._services:
+            self._services[serviceName] = _ServiceMetrics()
+        return self._services[serviceName]
+
+    def recordCall(self, serviceName, methodName, latency, bytesIn, bytesOut):
+        """Records a call to a method of a service, which took latency seconds of wall-clock time to respond to."""
+        with self._lock:
+            methods = self._getService(serviceName).methods
+            if methodName not in methods:
+                methods[methodName] = _MethodMetrics()
+            methodMetrics = methods[methodName]
+            methodMetrics.calls += 1
+            methodMetrics.totalLatency += latency
+            methodMetrics.maxLatency = max(methodMetrics.maxLatency, latency)
+            methodMetrics.latencyCounts[bisect.bisect_left(latencyBuckets, latency)] += 1
+            methodMetrics.bytesIn += bytesIn
+            methodMetrics.bytesOut += bytesOut
+
+    def recordBlock(self, serviceName, waitTime):
+        """Records that a service's thread waited waitTime seconds for the main thread to release it."""
+        with self._lock:
+            service = self._getService(serviceName)
+            service.blocks += 1
+            service.blockedTime += waitTime
+
+    def recordUnblock(self, serviceName, waitTime):
+        """Records that a service's thread ran for waitTime seconds from being released by the main thread until handing control back."""
+        with self._lock:
+            service = self._getService(serviceName)
+            service.unblocks += 1
+            service.unblockedTime += waitTime
+
+    def recordThink(self, serviceName, thinkTime, chargedTime = 0):
+        """Records that the program calling a service thought for thinkTime seconds between two calls, and was charged chargedTime simulated seconds for it."""
+        with self._lock:
+            service = self._getService(serviceName)
+            service.thinks += 1
+            service.thinkTime += thinkTime
+            service.maxThinkTime = max(service.maxThinkTime, thinkTime)
+            service.chargedTime += chargedTime
+
+    def getMetrics(self, simulatedTime = 0):
+        """Returns all the counters as a dictionary that can be sent over xmlrpc or written as json.
+        The times include every match so far, and simulatedTime is the simulated time of the match that is running, if there is one."""
+        with self._lock:
+            wallTime = self._wallTime
+            totalSimulatedTime = self._simulatedTime
+            if self._startWallTime != None:
+                wallTime += time.perf_counter() - self._startWallTime
+                totalSimulatedTime += simulatedTime
+            return {
+                "Wall Time" : wallTime,
+                "Simulated Time" : totalSimulatedTime,
+                "Steps" : self.steps,
+                "Skipped Steps" : self.skippedSteps,
+                "Steps Per Second" : self.steps / wallTime if wallTime > 0 else 0,
+                "Latency Buckets" : list(latencyBuckets),
+                "Services" : {serviceName : service.getDictionary() for serviceName, service in self._services.items()}
+            }
+
+    def writeMetrics(self, filename, simulatedTime = 0):
+        """Writes all the counters to a json file."""
+        with open(filename, "w") as metricsFile:
+            json.dump(self.getMetrics(simulatedTime), metricsFile, indent = 4)
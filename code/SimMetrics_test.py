@@ -0,0 +1,163 @@
+import unittest
+import threading
+import time
+import xmlrpc.client
+
+import SimTestCase
+import SimBase
+import SimMetrics
+import SimRobot
+
+class MetricsRecorderTest(unittest.TestCase):
+
+    def setUp(self):
+        """Gives the servers a new metrics recorder, saving the one they had."""
+        self.savedMetrics = SimBase.metrics
+        SimBase.metrics = SimMetrics.MetricsRecorder()
+
+    def tearDown(self):
+        SimBase.metrics = self.savedMetrics
+
+    def testRecordCall(self):
+        """Tests that calls are counted in the right latency buckets, and their sizes are added up."""
+        recorder = SimMetrics.MetricsRecorder()
+        recorder.recordCall("Robot 0", "see", 0.15, 100, 2000)
+        recorder.recordCall("Robot 0", "see", 0.05, 100, 1000)
+        recorder.recordCall("Robot 0", "see", 60, 100, 1000)
+        seeMetrics = recorder.getMetrics()["Services"]["Robot 0"]["Methods"]["see"]
+        self.assertEqual(seeMetrics["Calls"], 3)
+        self.assertEqual(seeMetrics["Bytes In"], 300)
+        self.assertEqual(seeMetrics["Bytes Out"], 4000)
+        self.assertEqual(seeMetrics["Max Latency"], 60)
+        expectedHistogram = [0] * (len(SimMetrics.latencyBuckets) + 1)
+        #A latency equal to a bound goes in that bound's bucket, and one longer than the last bound goes in the final bucket.
+        expectedHistogram[SimMetrics.latencyBuckets.index(0.05)] = 1
+        expectedHistogram[SimMetrics.latencyBuckets.index(0.2)] = 1
+        expectedHistogram[-1] = 1
+        self.assertEqual(seeMetrics["Latency Histogram"], expectedHistogram)
+
+    def testSeveralMatches(self):
+        """Tests that the steps and times of several matches are added up, without the time in between them."""
+        recorder = SimMetrics.MetricsRecorder()
+        recorder.steps = 5
+        for match in range(2):
+            recorder.start()
+            recorder.steps += 64
+            time.sleep(0.05)
+            #The simulated time of the running match is included, until it is stopped.
+            self.assertEqual(recorder.getMetrics(1)["Simulated Time"], 2 * match + 1)
+            recorder.stop(2)
+            time.sleep(0.5)
+        metrics = recorder.getMetrics(2)
+        self.assertEqual(metrics["Steps"], 128)
+        self.assertEqual(metrics["Simulated Time"], 4)
+        self.assertGreaterEqual(metrics["Wall Time"], 0.1)
+        self.assertLess(metrics["Wall Time"], 0.5)
+        self.assertEqual(metrics["Steps Per Second"], 128 / metrics["Wall Time"])
+
+    def testMeteredServer(self):
+        """Tests that calls to a metered xmlrpc server are recorded against its service, including calls that raise an error."""
+        server = SimBase.MeteredXMLRPCServer("Test", ('localhost', 0))
+        server.register_function(lambda text: text * 2, "double")
+        serverThread = threading.Thread(target = server.serve_forever, daemon = True)
+        serverThread.start()
+        try:
+            proxy = xmlrpc.client.ServerProxy("http://{}:{}".format(*server.server_address))
+            self.assertEqual(proxy.double("ab"), "abab")
+            with self.assertRaises(xmlrpc.client.Fault):
+                proxy.missing()
+        finally:
+            server.shutdown()
+            server.server_close()
+        methods = SimBase.metrics.getMetrics()["Services"]["Test"]["Methods"]
+        self.assertEqual(methods["double"]["Calls"], 1)
+        self.assertGreater(methods["double"]["Bytes In"], 0)
+        self.assertGreater(methods["double"]["Bytes Out"], 0)
+        self.assertEqual(methods["missing"]["Calls"], 1)
+
+    def testThinkTime(self):
+        """Tests that the time between a response and the next call is recorded as thinking only while the server's thread is released."""
+        class ServerThread(SimBase.RpcThread):
+            def run(self):
+                self.server.serve_forever()
+
+        serverThread = ServerThread()
+        serverThread.serviceName = "Test"
+        serverThread.server = SimBase.MeteredXMLRPCServer("Test", ('localhost', 0))
+        serverThread.server.register_function(lambda text: text * 2, "double")
+        serverThread.start()
+        try:
+            proxy = xmlrpc.client.ServerProxy("http://{}:{}".format(*serverThread.server.server_address))
+            proxy.double("a")
+            time.sleep(0.05)
+            proxy.double("a")
+            serverThread.releaseTime = time.perf_counter()
+            proxy.double("a")
+            time.sleep(0.05)
+            proxy.double("a")
+        finally:
+            serverThread.server.shutdown()
+            serverThread.server.server_close()
+        service = SimBase.metrics.getMetrics()["Services"]["Test"]
+        self.assertEqual(service["Thinks"], 1)
+        self.assertGreaterEqual(service["Think Time"], 0.05)
+        self.assertEqual(service["Charged Time"], 0)
+        self.assertEqual(serverThread.thinkTime, service["Think Time"])
+
+class ThinkTimePolicyTest(SimTestCase.SimTestCase):
+
+    def setUp(self):
+        """Creates an arena and a robot thread (without starting it), with calls between them timed by hand."""
+        super().setUp()
+        self.savedMetrics = SimBase.metrics
+        SimBase.metrics = SimMetrics.MetricsRecorder()
+        self.savedPolicy = (SimBase.thinkTimePolicy, SimBase.thinkTimeScale, SimBase.thinkTimeBudget)
+        self.createArena()
+        self.robotThread = SimRobot.RobotThread(1)
+        self.robotThread.releaseTime = 0
+
+    def tearDown(self):
+        SimBase.thinkTimePolicy, SimBase.thinkTimeScale, SimBase.thinkTimeBudget = self.savedPolicy
+        SimBase.metrics = self.savedMetrics
+        self.robotThread.server.server_close()
+        super().tearDown()
+
+    def _think(self, responseTime, callTime):
+        """Responds to a call at responseTime, and starts the next call at callTime, returning the simulated time the thinking in between was charged."""
+        chargedTime = self.robotThread.chargedTime
+        self.robotThread.endCall(responseTime)
+        self.robotThread.startCall(callTime)
+        return self.robotThread.chargedTime - chargedTime
+
+    def testCharge(self):
+        """Tests that the charge policy delays the robot's next wake up by the time it thought for, times the scale."""
+        SimBase.thinkTimePolicy = "charge"
+        SimBase.thinkTimeScale = 2
+        self.assertAlmostEqual(self._think(10, 10.25), 0.5)
+        self.assertAlmostEqual(self._think(10.5, 10.6), 0.2)
+        self.assertAlmostEqual(self.robotThread.wakeUpTime, 0.7)
+        service = SimBase.metrics.getMetrics()["Services"]["Robot 1"]
+        self.assertAlmostEqual(service["Think Time"], 0.35)
+        self.assertAlmostEqual(service["Charged Time"], 0.7)
+        self.assertEqual(self.robotThread.pendingOutput, [])
+
+    def testThrottle(self):
+        """Tests that the throttle policy only delays a robot once it has thought for more than its budget for the simulated time it has used
+        (plus a second's grace), just enough to bring it back within its budget, and tells the robot's program once."""
+        SimBase.thinkTimePolicy = "throttle"
+        SimBase.thinkTimeBudget = 0.1
+        #0.05 seconds of thinking is within the second's grace.
+        self.assertEqual(self._think(0, 0.05), 0)
+        self.assertEqual(self.robotThread.wakeUpTime, 0)
+        #0.2 seconds of thinking needs 2 simulated seconds, 1 more than the grace.
+        self.assertAlmostEqual(self._think(0.05, 0.2), 1)
+        self.assertAlmostEqual(self.robotThread.wakeUpTime, 1)
+        self.assertTrue(self.robotThread.isOverBudget)
+        self.assertAlmostEqual(self._think(0.2, 0.25), 0.5)
+        self.assertAlmostEqual(self.robotThread.wakeUpTime, 1.5)
+        #Once the robot has slept for long enough, it has enough budget to think again without being slowed down.
+        self.robotThread.wakeUpTime += 2
+        self.assertEqual(self._think(0.25, 0.35), 0)
+        self.assertAlmostEqual(self.robotThread.wakeUpTime, 3.5)
+        self.assertEqual(len(self.robotThread.pendingOutput), 1)
+        self.assertIn("more than its budget of 0.1", self.robotThread.pendingOutput[0])
@@ -0,0 +1,171 @@
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+"""Profiles the memory allocated by the simulator, and the time spent collecting garbage, attributed to the part of the simulator responsible.
+
+Allocations are traced with tracemalloc, and each one is attributed to the subsystem of the most recent frame of its traceback that belongs to one
+(so a Vector3 created by SimVision.see() counts towards vision, even though it is allocated in vector3.py). Garbage collections are timed with gc
+callbacks, and attributed in the same way to the code that was running when the collection started - the code whose allocations triggered it.
+Short-lived objects rarely show up in a snapshot, but they are what triggers most collections, so the collection counts show where the churn is."""
+
+#The subsystems allocations and collections are attributed to, in the order they are reported.
+subsystems = ["vision", "display", "physics", "scoring", "rpc", "other"]
+#The subsystem of each of the simulator's modules, and of the libraries each subsystem uses (by the name of the package or module's file).
+_subsystemOfModule = {
+    "SimVision" : "vision",
+    "vector3" : "vision",
+    "SimDisplay" : "display",
+    "SimCapture" : "display",
+    "pygame" : "display",
+    "SimBase" : "physics",
+    "SimState" : "physics",
+    "SimKinematic" : "physics",
+    "pymunk" : "physics",
+    "SimScoring" : "scoring",
+    "SimArena" : "rpc",
+    "SimRobot" : "rpc",
+    "SimMetrics" : "rpc",
+    "xmlrpc" : "rpc",
+    "socketserver" : "rpc",
+    "http" : "rpc"
+}
+
+class _SubsystemStatistics:
+    """The garbage collections attributed to one subsystem."""
+
+    def __init__(self):
+        self.collections = [0, 0, 0]
+        self.collectionTime = 0
+        self.objectsCollected = 0
+
+class AllocationProfiler:
+    """Traces allocations and times garbage collections between start() and stop(), and reports them by subsystem."""
+
+    def __init__(self, frameCount = 25):
+        """Creates the profiler. Each allocation's traceback is kept to frameCount frames, which must be deep enough to reach the simulator's code
+        from inside the libraries it calls."""
+        self.frameCount = frameCount
+        self._subsystemOfFile = {}
+        self._statistics = {subsystem : _SubsystemStatistics() for subsystem in subsystems}
+        self._collectionStartTime = None
+        self._collectionSubsystem = None
+        self._startSnapshot = None
+        self._endSnapshot = None
+        self._peakMemory = 0
+        self._isRunning = False
+
+    def _getSubsystemOfFile(self, filename):
+        """Returns the subsystem a source file belongs to, or None if it doesn't belong to one."""
+        if filename not in self._subsystemOfFile:
+            subsystem = None
+            for part in reversed(os.path.normpath(filename).split(os.sep)):
+                moduleName = os.path.splitext(part)[0]
+                if moduleName in _subsystemOfModule:
+                    subsystem = _subsystemOfModule[moduleName]
+                    break
+            self._subsystemOfFile[filename] = subsystem
+        return self._subsystemOfFile[filename]
+
+    def _getSubsystemOfTraceback(self, traceback):
+        """Returns the subsystem of the most recent frame of an allocation's traceback that belongs to one."""
+        for frame in reversed(traceback):
+            subsystem = self._getSubsystemOfFile(frame.filename)
+            if subsystem != None:
+                return subsystem
+        return "other"
+
+    def _getSubsystemOfStack(self):
+        """Returns the subsystem of the most recent frame of the current thread's stack that belongs to one."""
+        frame = sys._getframe(2)
+        while frame != None:
+            subsystem = self._getSubsystemOfFile(frame.f_code.co_filename)
+            if subsystem != None:
+                return subsystem
+            frame = frame.f_back
+        return "other"
+
+    def _gcCallback(self, phase, info):
+        """Called by the garbage collector before and after each collection, to time it and attribute it to a subsystem."""
+        if phase == "start":
+            self._collectionSubsystem = self._getSubsystemOfStack()
+            self._collectionStartTime = time.perf_counter()
+        elif self._collectionStartTime != None:
+            statistics = self._statistics[self._collectionSubsystem]
+            statistics.collections[info["generation"]] += 1
+            statistics.collectionTime += time.perf_counter() - self._collectionStartTime
+            statistics.objectsCollected += info["collected"]
+            self._collectionStartTime = None
+
+    def start(self):
+        """Starts tracing allocations and timing garbage collections, and takes a snapshot of the memory already allocated."""
+        if self._isRunning:
+            raise RuntimeError("Attempted to start the allocation profiler when it was already running.")
+        tracemalloc.start(self.frameCount)
+        self._startSnapshot = tracemalloc.take_snapshot()
+        gc.callbacks.append(self._gcCallback)
+        self._isRunning = True
+
+    def stop(self):
+        """Takes a final snapshot, and stops tracing allocations and timing garbage collections."""
+        if not self._isRunning:
+            raise RuntimeError("Attempted to stop the allocation profiler when it wasn't running.")
+        gc.callbacks.remove(self._gcCallback)
+        self._endSnapshot = tracemalloc.take_snapshot()
+        self._peakMemory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self._isRunning = False
+
+    def getSubsystemStatistics(self):
+        """Returns a dictionary of the statistics of each subsystem: the memory still allocated at the end (and how much it grew since the start),
+        the number of blocks allocated, and the number, time and objects freed of the garbage collections it triggered."""
+        if self._endSnapshot == None:
+            raise RuntimeError("Attempted to get the allocation profile before the profiler had been stopped.")
+        result = {}
+        for subsystem in subsystems:
+            statistics = self._statistics[subsystem]
+            result[subsystem] = {
+                "Size" : 0,
+                "Size Difference" : 0,
+                "Blocks" : 0,
+                "Collections" : list(statistics.collections),
+                "Collection Time" : statistics.collectionTime,
+                "Objects Collected" : statistics.objectsCollected
+            }
+        for difference in self._endSnapshot.compare_to(self._startSnapshot, "traceback"):
+            subsystemResult = result[self._getSubsystemOfTraceback(difference.traceback)]
+            subsystemResult["Size"] += difference.size
+            subsystemResult["Size Difference"] += difference.size_diff
+            subsystemResult["Blocks"] += difference.count
+        return result
+
+    def getReport(self, topCount = 10):
+        """Returns a text report of the statistics of each subsystem, and the topCount lines of code with the most memory still allocated."""
+        subsystemStatistics = self.getSubsystemStatistics()
+        lines = ["Allocation profile", "Peak traced memory: {:.1f} KiB".format(self._peakMemory / 1024), ""]
+        lines.append("{:<10}{:>14}{:>14}{:>10}{:>24}{:>16}{:>12}".format("Subsystem", "Size (KiB)", "Growth (KiB)", "Blocks",
+                                                                       "Collections (gen 0/1/2)", "GC time (ms)", "Collected"))
+        for subsystem in subsystems:
+            statistics = subsystemStatistics[subsystem]
+            lines.append("{:<10}{:>14.1f}{:>14.1f}{:>10}{:>24}{:>16.2f}{:>12}".format(subsystem, statistics["Size"] / 1024, statistics["Size Difference"] / 1024,
+                                                                                   statistics["Blocks"], "/".join(str(count) for count in statistics["Collections"]),
+                                                                                   statistics["Collection Time"] * 1000, statistics["Objects Collected"]))
+        lines.append("")
+        #The lines are grouped by the subsystem of the whole traceback as well, so a line in a library is listed once for each subsystem that uses it.
+        sizeOfLine = {}
+        for difference in self._endSnapshot.compare_to(self._startSnapshot, "traceback"):
+            frame = difference.traceback[-1]
+            key = (frame.filename, frame.lineno, self._getSubsystemOfTraceback(difference.traceback))
+            size, blocks = sizeOfLine.get(key, (0, 0))
+            sizeOfLine[key] = (size + difference.size_diff, blocks + difference.count_diff)
+        lines.append("Top {} lines by memory allocated since the start:".format(topCount))
+        for (filename, lineNumber, subsystem), (size, blocks) in sorted(sizeOfLine.items(), key = lambda item: -item[1][0])[:topCount]:
+            lines.append("{:>10.1f} KiB {:>8} blocks  {}:{} ({})".format(size / 1024, blocks, filename, lineNumber, subsystem))
+        return "\n".join(lines) + "\n"
+
+    def writeReport(self, filename, topCount = 10):
+        """Writes the text report to a file."""
+        with open(filename, "w") as reportFile:
+            reportFile.write(self.getReport(topCount))
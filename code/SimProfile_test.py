@@ -0,0 +1,35 @@
+import unittest
+import gc
+
+import SimProfile
+from vector3 import *
+
+class AllocationProfilerTest(unittest.TestCase):
+
+    def testAttribution(self):
+        """Tests that vectors made by vector3 (adding two vectors) are attributed to vision, and that garbage collections are counted and timed."""
+        profiler = SimProfile.AllocationProfiler()
+        profiler.start()
+        try:
+            unitVector = Vector3(0, 0, 1)
+            vectors = [unitVector + unitVector for number in range(1000)]
+            gc.collect()
+        finally:
+            profiler.stop()
+        statistics = profiler.getSubsystemStatistics()
+        self.assertGreaterEqual(statistics["vision"]["Blocks"], len(vectors))
+        self.assertGreater(statistics["vision"]["Size Difference"], 0)
+        #The collection was started by this file, which isn't part of any subsystem.
+        self.assertEqual(statistics["other"]["Collections"][2], 1)
+        self.assertGreater(statistics["other"]["Collection Time"], 0)
+        self.assertIn("vector3.py", profiler.getReport(5))
+
+    def testStartTwice(self):
+        """Tests that starting the profiler while it is already running raises an error."""
+        profiler = SimProfile.AllocationProfiler()
+        profiler.start()
+        try:
+            with self.assertRaises(RuntimeError):
+                profiler.start()
+        finally:
+            profiler.stop()
@@ -4,6 +4,7 @@ import xmlrpc.server
 
 import SimBase
 import SimVision
+import SimTrace
 
 class RobotService:
     """Handles the creation of a robot and provides an interface to the simulated robot for the RobotClient.
@@ -56,23 +57,24 @@ class RobotService:
         if not SimBase.isSimulationRunning():
             raise RuntimeError("Attempted to call a robot function when simulation had already ended.")
         
-        SimBase.pendingOutput.append("Robot " + str(self.robotBody.teamNumber) + " at " + str(SimBase.theTime) + " printed: " + message)
+        #The message is kept by the robot's thread until every robot released in the same step has blocked again, so the messages stay in order.
+        threading.current_thread().pendingOutput.append("Robot " + str(self.robotBody.teamNumber) + " at " + str(SimBase.theTime) + " printed: " + message)
 
         return True
     
     def sleep(self, time):
         """Waits until the simulated time has increased by the specified delay, unless the simulation has already ended.
         Returns False if the simulation is no longer running, True otherwise."""
-        SimBase.trace("Entering RobotService.sleep()")
+        SimTrace.begin("robot", "RobotService.sleep()")
         if not SimBase.isSimulationRunning():
-            SimBase.trace("Exiting RobotService.sleep()")
+            SimTrace.end("robot", "RobotService.sleep()")
             raise RuntimeError("Attempted to call a robot function when simulation had already ended.")
 
         robotThread = threading.current_thread()
         robotThread.wakeUpTime += time
         robotThread.block()
 
-        SimBase.trace("Exiting RobotService.sleep()")
+        SimTrace.end("robot", "RobotService.sleep()")
         return SimBase.isSimulationRunning()
 
     def see(self, res):
@@ -82,7 +84,7 @@ class RobotService:
         if not SimBase.isSimulationRunning():
             raise RuntimeError("Attempted to call a robot function when simulation had already ended.")
 
-        ids = SimVision.see(self.robotBody, res, self.robotBody.isMoving)
+        ids = SimVision.see(self.robotBody, res, SimBase.stateTable.getIsMoving(self.robotBody))
 
         robotThread = threading.current_thread()
         robotThread.wakeUpTime += res[0]*0.001
@@ -93,11 +95,12 @@ class RobotService:
     def waitForStart(self):
         """Sets a flag to indicate the robot is ready to start, and blocks itself until the competition begins."""
         robotThread = threading.current_thread()
-        robotThread.isReadyToStart = True
+        #The gate must be closed before the thread is marked as ready, otherwise the main thread could release it before it starts waiting.
         robotThread.gate.clear()
-        SimBase.trace("Robot waiting for start.")
+        robotThread.markReadyToStart()
+        SimTrace.trace("startup", "Robot waiting for start.")
         robotThread.gate.wait()
-        SimBase.trace("Robot now starting.")
+        SimTrace.trace("startup", "Robot now starting.")
         return True
 
 class RobotThread(SimBase.RpcThread):
@@ -107,8 +110,36 @@ class RobotThread(SimBase.RpcThread):
         """Creates the xmlrpc server and connects it to the RobotService.
         Unlike ArenaThread, the server is created during __init__ instead of run(). This allows getURL to be called before the server is started."""
         super().__init__()
-        self.server = xmlrpc.server.SimpleXMLRPCServer( ('localhost', 0), logRequests=False )
-        self.server.register_instance( RobotService(teamNumber) )
+        self.teamNumber = teamNumber
+        self.serviceName = "Robot " + str(teamNumber)
+        #The connection is kept open between calls, so that the AsyncRobotClient can send several calls at once.
+        self.server = SimBase.MeteredXMLRPCServer(self.serviceName, ('localhost', 0), isPersistent = True)
+        self._service = RobotService(teamNumber)
+        self.server.register_instance(self._service)
+        #If the program has thought for longer than its budget this match, and has been told so.
+        self.isOverBudget = False
+
+    def createRobotBody(self):
+        """Gives the robot service a new robot body in its starting position, when the thread is reused for another match."""
+        self._service.robotBody = SimBase.Robot(self.teamNumber)
+
+    def chargeThinkTime(self, thinkTime):
+        """Charges the robot program for thinking for thinkTime wall-clock seconds, as set by SimBase.thinkTimePolicy, and returns the simulated time it was charged.
+        The charge is added to the time the robot next wakes up, so it takes effect when it next sleeps or looks."""
+        if SimBase.thinkTimePolicy == "charge":
+            chargedTime = thinkTime * SimBase.thinkTimeScale
+        elif SimBase.thinkTimePolicy == "throttle":
+            #A program keeping to its budget has thought for at most the budget times the simulated time, so it can't wake up before this.
+            #It starts with a simulated second's worth of budget, so that the time it takes to start up doesn't count against it.
+            chargedTime = max(0, self.thinkTime / SimBase.thinkTimeBudget - 1 - self.wakeUpTime)
+            if chargedTime > 0 and not self.isOverBudget:
+                self.isOverBudget = True
+                self.pendingOutput.append("Robot " + str(self.teamNumber) + " at " + str(SimBase.theTime) + " has thought for more than its budget of "
+                                          + str(SimBase.thinkTimeBudget) + " wall-clock seconds per simulated second, so it is being slowed down.")
+        else:
+            chargedTime = 0
+        self.wakeUpTime += chargedTime
+        return chargedTime
 
     def getUrl(self):
         """Returns the URL of the server."""
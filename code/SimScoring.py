@@ -0,0 +1,164 @@
+import SimBase
+
+class ScoreTracker:
+    """Keeps a table of the score of every token, and the total for each team, up to date as the simulation runs.
+
+    Instead of checking every token against every robot and zone whenever the scores are needed, the tracker is told about changes
+    by collision handlers: which robots are touching each token, and which zone sensors each token overlaps. Only tokens whose contacts
+    have changed, or that overlap a zone (and so may have moved fully into or out of it), have their scores recalculated by update()."""
+
+    def __init__(self, space, teamCount = 4):
+        """Creates the (empty) score table for the given number of teams, and binds the collision handlers for robots touching tokens and tokens overlapping zones."""
+        #The total score of all the tokens for each team. This does not include the bonus for robots leaving their zones.
+        self.tokenScores = [0] * teamCount
+        #The tuple of (points, team) each token is currently scoring, indexed by the token.
+        self._scoreOfToken = {}
+        #The set of teams whose robots are touching each token, indexed by the token.
+        self._touchingTeams = {}
+        #The set of zones whose sensors each token overlaps, indexed by the token.
+        self._overlappingZones = {}
+        #Tokens whose contacts have changed since the last update.
+        self._changedTokens = set()
+        #Tokens overlapping a zone that were asleep at the last update.
+        self._sleepingTokens = set()
+
+        robotTokenHandler = space.add_collision_handler(1, 2)
+        robotTokenHandler.begin = self._robotTokenCollisionBegin
+        robotTokenHandler.separate = self._robotTokenCollisionEnd
+        zoneTokenHandler = space.add_collision_handler(3, 2)
+        zoneTokenHandler.begin = self._zoneTokenCollisionBegin
+        zoneTokenHandler.separate = self._zoneTokenCollisionEnd
+        robotZoneHandler = space.add_collision_handler(1, 3)
+        robotZoneHandler.pre_solve = self._robotZoneCollision
+        robotZoneHandler.separate = self._robotZoneCollisionEnd
+
+    def _robotTokenCollisionBegin(self, arbiter, space, data):
+        """A function that gets bound to the CollisionHandler, which adds the robot's team to the set touching the token."""
+        #The shapes are always given in the same order as the collision types of the handler.
+        robotShape, tokenShape = arbiter.shapes
+        self._touchingTeams.setdefault(tokenShape.body, set()).add(robotShape.body.teamNumber)
+        self._changedTokens.add(tokenShape.body)
+        return True
+        #This tells the collision handler to handle the physics of the collision normally.
+
+    def _robotTokenCollisionEnd(self, arbiter, space, data):
+        """A function that gets bound to the CollisionHandler, which removes the robot's team from the set touching the token."""
+        robotShape, tokenShape = arbiter.shapes
+        self._touchingTeams[tokenShape.body].discard(robotShape.body.teamNumber)
+        self._changedTokens.add(tokenShape.body)
+
+    def _zoneTokenCollisionBegin(self, arbiter, space, data):
+        """A function that gets bound to the CollisionHandler, which records that the token overlaps the zone's sensor."""
+        zoneShape, tokenShape = arbiter.shapes
+        self._overlappingZones.setdefault(tokenShape.body, set()).add(zoneShape.body)
+        self._changedTokens.add(tokenShape.body)
+        return True
+
+    def _zoneTokenCollisionEnd(self, arbiter, space, data):
+        """A function that gets bound to the CollisionHandler, which records that the token no longer overlaps the zone's sensor."""
+        zoneShape, tokenShape = arbiter.shapes
+        #pymunk also reports a separation when a sleeping token inside a sensor wakes up (and then a new collision on the next step),
+        #so the token is only removed if it really has moved off the zone.
+        if not zoneShape.cache_bb().intersects(tokenShape.cache_bb()):
+            self._overlappingZones[tokenShape.body].discard(zoneShape.body)
+        self._changedTokens.add(tokenShape.body)
+
+    def _robotZoneCollision(self, arbiter, space, data):
+        """A function that gets bound to the CollisionHandler, which is called on every step that a robot overlaps a zone (while the robot is awake).
+        This replaces checking every robot against its zone on every step, as a robot can only leave its zone while it overlaps it."""
+        self._checkIfLeftZone(arbiter)
+        return True
+
+    def _robotZoneCollisionEnd(self, arbiter, space, data):
+        """A function that gets bound to the CollisionHandler, which checks a robot that has stopped overlapping a zone, in case it got all the way out in one step."""
+        self._checkIfLeftZone(arbiter)
+
+    def _checkIfLeftZone(self, arbiter):
+        """Flags the robot as having left its zone as soon as it is no longer entirely inside it, the same as the robots used to check for themselves."""
+        robotShape, zoneShape = arbiter.shapes
+        robot = robotShape.body
+        if robot.hasLeftZone or zoneShape.body.teamNumber != robot.teamNumber:
+            return
+        if not zoneShape.cache_bb().contains(robotShape.cache_bb()):
+            robot.hasLeftZone = True
+
+    def _getContainingZone(self, token):
+        """Returns the zone the token is fully contained within (as opposed to just touching), or None if it isn't in one.
+        Only the zones the token is known to overlap need to be checked."""
+        for zone in self._overlappingZones.get(token, ()):
+            for zoneShape in zone.shapes:
+                zoneBB = zoneShape.cache_bb()
+                for tokenShape in token.shapes:
+                    if zoneBB.contains(tokenShape.cache_bb()):
+                        return zone
+        return None
+
+    def _calculateTokenScore(self, token):
+        """Returns a tuple containing the number of points the token is worth, and the team that those points are being scored for.
+        If the token is not scoring for anyone, it scores 0 points for team 0.
+
+        As per the rules, tokens score for one team only, and for the highest (absolute) score they are valid for. If two robots are
+        touching a token, neither team can score points for "controlling" it."""
+        #List of tuples of the score value, and the team that it would be awarded to.
+        potentialScores = []
+        touchingTeams = self._touchingTeams.get(token, ())
+        if len(touchingTeams) == 1:
+            for team in touchingTeams:
+                if token.type == "Ore":
+                    potentialScores.append( (1, team) )
+                elif token.type == "Team " + str(team) + " Gold":
+                    potentialScores.append( (3, team) )
+                else:
+                    #Must be a different team's gold.
+                    potentialScores.append( (-1, team) )
+
+        zone = self._getContainingZone(token)
+        if zone != None:
+            if token.type == "Ore":
+                potentialScores.append( (5, zone.teamNumber) )
+            elif token.type == "Team " + str(zone.teamNumber) + " Gold":
+                potentialScores.append( (7, zone.teamNumber) )
+            else:
+                #Must be a different team's gold.
+                potentialScores.append( (-2, zone.teamNumber) )
+
+        #A team touching its own gold (3 points) outscores another team's zone it is in (-2 points), so the zone's score doesn't always win.
+        highestScore = (0, 0)
+        for potentialScore in potentialScores:
+            if abs(potentialScore[0]) > abs(highestScore[0]):
+                highestScore = potentialScore
+
+        return highestScore
+
+    def update(self):
+        """Recalculates the score of every token whose contacts have changed, or which overlaps a zone and is awake, and updates the team totals.
+        This should be called after every step of the space."""
+        tokensToUpdate = self._changedTokens
+        self._changedTokens = set()
+        sleepingTokens = set()
+        for token, zones in self._overlappingZones.items():
+            if zones:
+                if token.is_sleeping:
+                    sleepingTokens.add(token)
+                    #A token that was already asleep at the last update cannot have moved into or out of the zone.
+                    #One that has just fallen asleep may have moved during the step it fell asleep in.
+                    if token in self._sleepingTokens:
+                        continue
+                tokensToUpdate.add(token)
+        self._sleepingTokens = sleepingTokens
+
+        for token in tokensToUpdate:
+            newScore = self._calculateTokenScore(token)
+            oldScore = self._scoreOfToken.get(token, (0, 0))
+            if newScore != oldScore:
+                self.tokenScores[oldScore[1]] -= oldScore[0]
+                self.tokenScores[newScore[1]] += newScore[0]
+                self._scoreOfToken[token] = newScore
+
+    def getScores(self):
+        """Returns the current score of each team: the scores of the tokens, plus a point for the team of each robot that has left its zone."""
+        scores = list(self.tokenScores)
+        for robot in SimBase.robots:
+            if robot.hasLeftZone:
+                scores[robot.teamNumber] += 1
+        return scores
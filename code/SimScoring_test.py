@@ -0,0 +1,108 @@
+import unittest
+import random
+import pymunk
+
+import SimTestCase
+import SimBase
+
+def _getScoresByCheckingEveryToken():
+    """Calculates the scores the way the ArenaService used to, by asking every token for its score, to compare against the score tracker."""
+    robotCollisions = []
+    for robot in SimBase.robots:
+        touchingTokenIds = []
+        for robotShape in robot.shapes:
+            for shapeInfo in SimBase.space.shape_query(robotShape):
+                if isinstance(shapeInfo.shape.body, SimBase.Token):
+                    touchingTokenIds.append(shapeInfo.shape.body.id)
+        robotCollisions.append(touchingTokenIds)
+
+    scores = [0] * len(SimBase.zones)
+    for token in SimBase.tokens:
+        score, team = token.getScore(robotCollisions)
+        scores[team] += score
+    for robot in SimBase.robots:
+        if robot.hasLeftZone:
+            scores[robot.teamNumber] += 1
+    return scores
+
+class ScoreTrackerTest(SimTestCase.SimTestCase):
+
+    def setUp(self):
+        """Creates a new arena with four robots."""
+        super().setUp()
+        self.arena = self.createArena()
+        for teamNumber in range(4):
+            SimBase.Robot(teamNumber)
+
+    def testEmptyArenaScoresNothing(self):
+        """Tests that nobody scores before anything has moved."""
+        SimBase.space.step(1/64)
+        SimBase.scoreTracker.update()
+        self.assertEqual(self.arena.getScores(), [0, 0, 0, 0])
+
+    def testTokensInZones(self):
+        """Tests that tokens fully inside a zone score for that zone, and tokens only partly inside do not."""
+        ore, teamZeroGold, teamOneGold = SimBase.tokens[0], None, None
+        for token in SimBase.tokens:
+            if token.type == "Team 0 Gold":
+                teamZeroGold = token
+            elif token.type == "Team 1 Gold":
+                teamOneGold = token
+        #Zone 0 covers x from -3.5 to -2.5 and y from -1 to 1.
+        ore.position = (-2.8, -0.5)
+        teamZeroGold.position = (-2.8, 0.5)
+        teamOneGold.position = (-2.8, 0)
+        for step in range(2):
+            SimBase.space.step(1/64)
+            SimBase.scoreTracker.update()
+        self.assertEqual(self.arena.getScores(), [5 + 7 - 2, 0, 0, 0])
+
+        #Straddling the edge of the zone, so it is only touching it.
+        ore.position = (-2.5, -0.5)
+        SimBase.space.step(1/64)
+        SimBase.scoreTracker.update()
+        self.assertEqual(self.arena.getScores(), [7 - 2, 0, 0, 0])
+        self.assertEqual(self.arena.getScores(), _getScoresByCheckingEveryToken())
+
+    def testTouchingOwnGoldInAnotherZone(self):
+        """Tests that a team touching its own gold scores for it, rather than the zone of another team that the gold is in,
+        as touching it is worth more points than the zone takes away."""
+        teamZeroGold = [token for token in SimBase.tokens if token.type == "Team 0 Gold"][0]
+        #Zone 1 covers x from -1 to 1 and y from 2.5 to 3.5, and robot 1 starts in it.
+        SimBase.robots[1].position = (0, -1.8)
+        teamZeroGold.position = (0, 2.8)
+        #The robot is 0.4m long, facing along the x axis, so its front edge overlaps the token.
+        SimBase.robots[0].position = (0.24, 2.8)
+        SimBase.space.step(1/64)
+        SimBase.scoreTracker.update()
+        self.assertEqual(SimBase.scoreTracker._calculateTokenScore(teamZeroGold), (3, 0))
+        self.assertEqual(self.arena.getScores(), _getScoresByCheckingEveryToken())
+
+    def testMatchesCheckingEveryToken(self):
+        """Tests that the score tracker gives the same scores as checking every token, after every step of a match
+        where the robots drive around randomly, pushing tokens into and out of zones."""
+        randomGenerator = random.Random(2019)
+        #Scatter the tokens near the zones so that plenty of them get pushed in and out.
+        for token in SimBase.tokens:
+            zone = randomGenerator.choice(SimBase.zones)
+            token.position = zone.position + pymunk.Vec2d(randomGenerator.uniform(0.3, 1.2), randomGenerator.uniform(-1.2, 1.2)).rotated(zone.angle)
+
+        for step in range(64 * 30):
+            if step % 32 == 0:
+                for robot in SimBase.robots:
+                    robot.leftPower = randomGenerator.uniform(-100, 100)
+                    robot.rightPower = randomGenerator.uniform(-100, 100)
+            SimBase.stepSimulation()
+            self.assertEqual(self.arena.getScores(), _getScoresByCheckingEveryToken(), "Scores differ at step " + str(step))
+
+    def testRobotLeavingZone(self):
+        """Tests that a robot is flagged as having left its zone as soon as part of it is outside of it, and that it keeps the point if it returns."""
+        robot = SimBase.robots[0]
+        #Zone 0 covers x from -3.5 to -2.5, and the robot is 0.4m long, facing along the x axis.
+        for x, hasLeftZone in [(-2.75, False), (-2.7, False), (-2.6, True), (-2.75, True)]:
+            robot.position = (x, 0)
+            robot.velocity = (0, 0)
+            SimBase.space.step(1/64)
+            SimBase.scoreTracker.update()
+            self.assertEqual(robot.hasLeftZone, hasLeftZone)
+        self.assertEqual(self.arena.getScores(), [1, 0, 0, 0])
@@ -0,0 +1,143 @@
+import math
+import threading
+
+import numpy
+
+import SimBase
+
+class BodyStateTable:
+    """A table of the state of every body in the arena, stored as NumPy arrays with one row per body (a "struct of arrays").
+
+    The vision, display and robot services all read the position, angle and motion of bodies, and the world positions of their vertexes,
+    many times between steps. Rather than each of them asking pymunk for these one attribute at a time (creating a new Vec2d each time),
+    the table reads every body once after a step, and transforms all the vertexes in one go.
+    The table is only filled when it is first read after a step, so steps where nothing needs the state (most of them) cost nothing extra."""
+
+    def __init__(self):
+        """Creates an empty table. The rows are laid out when the table is first read."""
+        #The bodies in the order of the rows of the table, and the row of each body.
+        self.bodies = []
+        self._rowOfBody = {}
+        #The rows of the vertexes of each shape in the vertexes array, and the row of the body each vertex belongs to.
+        self._vertexSliceOfShape = {}
+        self._bodyRowOfVertex = numpy.zeros(0, dtype = int)
+        #The position of each vertex relative to its body, which never changes.
+        self._localVertexes = numpy.zeros((0, 2))
+
+        self.positions = numpy.zeros((0, 2))
+        self.angles = numpy.zeros(0)
+        self.velocities = numpy.zeros((0, 2))
+        self.angularVelocities = numpy.zeros(0)
+        self.isMoving = numpy.zeros(0, dtype = bool)
+        self.vertexes = numpy.zeros((0, 2))
+        self._cosAngles = numpy.zeros(0)
+        self._sinAngles = numpy.zeros(0)
+        self._isStale = True
+        #Several robot threads can read the table at once, so only one of them refreshes it.
+        self._refreshLock = threading.Lock()
+
+    def markStale(self):
+        """Marks the table as out of date. This is called after every step of the space."""
+        self._isStale = True
+
+    def _layOut(self):
+        """Allocates a row to every body in the space (and to each of their vertexes), in the order they were added to the space.
+        This is done again whenever bodies are added."""
+        self.bodies = SimBase.space.bodies
+        self._rowOfBody = {}
+        self._vertexSliceOfShape = {}
+        bodyRowOfVertex = []
+        localVertexes = []
+        for row, body in enumerate(self.bodies):
+            self._rowOfBody[body] = row
+            for shape in body.shapes:
+                shapeVertexes = [tuple(vertex) for vertex in shape.get_vertices()]
+                self._vertexSliceOfShape[shape] = slice(len(localVertexes), len(localVertexes) + len(shapeVertexes))
+                localVertexes.extend(shapeVertexes)
+                bodyRowOfVertex.extend([row] * len(shapeVertexes))
+        self._bodyRowOfVertex = numpy.array(bodyRowOfVertex, dtype = int)
+        self._localVertexes = numpy.array(localVertexes, dtype = float).reshape(-1, 2)
+
+        bodyCount = len(self.bodies)
+        self.positions = numpy.zeros((bodyCount, 2))
+        self.angles = numpy.zeros(bodyCount)
+        self.velocities = numpy.zeros((bodyCount, 2))
+        self.angularVelocities = numpy.zeros(bodyCount)
+        self.isMoving = numpy.zeros(bodyCount, dtype = bool)
+        self._cosAngles = numpy.zeros(bodyCount)
+        self._sinAngles = numpy.zeros(bodyCount)
+
+    def refresh(self):
+        """Fills the table with the current state of every body, in one pass through the bodies."""
+        if len(self.bodies) != len(SimBase.space.bodies):
+            self._layOut()
+        positions = []
+        angles = []
+        velocities = []
+        angularVelocities = []
+        isSleeping = []
+        for body in self.bodies:
+            positions.append(tuple(body.position))
+            angles.append(body.angle)
+            velocities.append(tuple(body.velocity))
+            angularVelocities.append(body.angular_velocity)
+            isSleeping.append(body.body_type == body.DYNAMIC and body.is_sleeping)
+        self.positions[:] = positions
+        self.angles[:] = angles
+        self.velocities[:] = velocities
+        self.angularVelocities[:] = angularVelocities
+        #math.cos and math.sin are used (rather than numpy's), so the vertexes are exactly the same as those pymunk's Vec2d.rotated() gives.
+        self._cosAngles[:] = [math.cos(angle) for angle in angles]
+        self._sinAngles[:] = [math.sin(angle) for angle in angles]
+
+        #This is the same test as the isMoving property of robots and tokens. Walls and zones have no velocity, so are never moving.
+        speedsSquared = self.velocities[:, 0] * self.velocities[:, 0] + self.velocities[:, 1] * self.velocities[:, 1]
+        self.isMoving = ~numpy.array(isSleeping, dtype = bool) & ((speedsSquared > 0.02**2) | (self.angularVelocities > 0.05))
+
+        cosAngles = self._cosAngles[self._bodyRowOfVertex]
+        sinAngles = self._sinAngles[self._bodyRowOfVertex]
+        localX = self._localVertexes[:, 0]
+        localY = self._localVertexes[:, 1]
+        bodyPositions = self.positions[self._bodyRowOfVertex]
+        self.vertexes = numpy.empty_like(self._localVertexes)
+        self.vertexes[:, 0] = localX * cosAngles - localY * sinAngles + bodyPositions[:, 0]
+        self.vertexes[:, 1] = localX * sinAngles + localY * cosAngles + bodyPositions[:, 1]
+        self._isStale = False
+
+    def _ensureCurrent(self, body = None):
+        """Refreshes the table if there has been a step since it was last filled, or if the body hasn't been given a row yet."""
+        if self._isStale or (body != None and body not in self._rowOfBody):
+            with self._refreshLock:
+                if self._isStale or (body != None and body not in self._rowOfBody):
+                    self.refresh()
+
+    def getRow(self, body):
+        """Returns the row of the table containing the body's state."""
+        self._ensureCurrent(body)
+        return self._rowOfBody[body]
+
+    def getPosition(self, body):
+        """Returns the position of the body as a tuple."""
+        row = self.getRow(body)
+        return (float(self.positions[row, 0]), float(self.positions[row, 1]))
+
+    def getAngle(self, body):
+        """Returns the angle of the body."""
+        #The row is found first, as finding it can refresh the table and replace the arrays.
+        row = self.getRow(body)
+        return float(self.angles[row])
+
+    def getIsMoving(self, body):
+        """Returns if the body is moving (too fast for its markers to be seen without motion blur)."""
+        row = self.getRow(body)
+        return bool(self.isMoving[row])
+
+    def getVertexes(self, shape):
+        """Returns the world positions of the vertexes of a shape, as an array with a row for each vertex."""
+        self._ensureCurrent(shape.body)
+        return self.vertexes[self._vertexSliceOfShape[shape]]
+
+    def getCurrentBodies(self):
+        """Returns a list of tuples of each body and if it is moving, for looping over every body."""
+        self._ensureCurrent()
+        return list(zip(self.bodies, self.isMoving.tolist()))
@@ -0,0 +1,46 @@
+import unittest
+import random
+
+import SimTestCase
+import SimBase
+
+class BodyStateTableTest(SimTestCase.SimTestCase):
+
+    def setUp(self):
+        """Creates a new arena with four robots, and drives them around for a few seconds so that the bodies are in different positions."""
+        super().setUp()
+        self.createArena()
+        for teamNumber in range(4):
+            SimBase.Robot(teamNumber)
+        randomGenerator = random.Random(2019)
+        for robot in SimBase.robots:
+            robot.leftPower = randomGenerator.uniform(-100, 100)
+            robot.rightPower = randomGenerator.uniform(-100, 100)
+        for step in range(64 * 3):
+            SimBase.stepSimulation()
+
+    def testMatchesBodies(self):
+        """Tests that the state in the table is exactly the same as reading each body from pymunk."""
+        for body in SimBase.space.bodies:
+            self.assertEqual(SimBase.stateTable.getPosition(body), tuple(body.position))
+            self.assertEqual(SimBase.stateTable.getAngle(body), body.angle)
+            if isinstance(body, (SimBase.Robot, SimBase.Token)):
+                self.assertEqual(SimBase.stateTable.getIsMoving(body), body.isMoving)
+            for shape in body.shapes:
+                expectedVertexes = []
+                for vertex in shape.get_vertices():
+                    expectedVertexes.append(tuple(vertex.rotated(body.angle) + body.position))
+                self.assertEqual([tuple(vertex) for vertex in SimBase.stateTable.getVertexes(shape).tolist()], expectedVertexes)
+
+    def testRefreshedAfterStep(self):
+        """Tests that the table is refilled after the next step, and when new bodies are added."""
+        robot = SimBase.robots[0]
+        positionBefore = SimBase.stateTable.getPosition(robot)
+        robot.leftPower = 100
+        robot.rightPower = 100
+        SimBase.stepSimulation()
+        self.assertNotEqual(SimBase.stateTable.getPosition(robot), positionBefore)
+        self.assertEqual(SimBase.stateTable.getPosition(robot), tuple(robot.position))
+
+        token = SimBase.Token(1000, "Ore", 0, 0)
+        self.assertEqual(SimBase.stateTable.getPosition(token), (0, 0))
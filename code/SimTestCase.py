@@ -0,0 +1,35 @@
+import os
+import unittest
+
+#The arena reads its config files from the working directory, which is the directory the tests are in.
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import SimBase
+import SimArena
+
+"""A base class for the tests that create arenas, which keeps them from changing the simulator's globals for the tests that run after them."""
+
+#The SimBase globals that creating an arena, or running a match in it, changes.
+_arenaGlobalNames = ["space", "scoreTracker", "stateTable", "theTime", "stepSize", "substeps", "teamCount", "wallDistance", "endTime", "randomSeed",
+                     "pendingOutput", "wallSegments", "tokens", "robots", "zones"]
+
+class SimTestCase(unittest.TestCase):
+    """A test case that saves the arena's globals in SimBase before each test, and puts them back afterwards."""
+
+    def setUp(self):
+        """Saves the arena's globals. Subclasses that override this must call it first."""
+        self._savedGlobals = {name : getattr(SimBase, name) for name in _arenaGlobalNames}
+
+    def tearDown(self):
+        """Puts back the arena's globals. Subclasses that override this must call it."""
+        for name, value in self._savedGlobals.items():
+            setattr(SimBase, name, value)
+
+    def createArena(self, arenaConfig = None, tokenConfig = None):
+        """Clears the bodies of any earlier arena, and returns a new ArenaService created from the given config dictionaries, or the config files if none are given."""
+        SimBase.theTime = 0
+        SimBase.wallSegments = []
+        SimBase.tokens = []
+        SimBase.robots = []
+        SimBase.zones = []
+        return SimArena.ArenaService(arenaConfig, tokenConfig)
@@ -0,0 +1,153 @@
+import atexit
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+"""Records what the simulator's threads are doing, for debugging and for seeing where the time goes.
+
+Each message has a category (such as "handoff" for the main thread and the service threads passing control between each other) and a level.
+Messages above the configured level, or outside the configured categories, are dropped before anything is built from them - callers pass
+the parts of a message as arguments rather than building the string themselves, so a disabled message costs a single comparison.
+Recorded messages go into a ring buffer holding the most recent events, and are written to the output stream in bulk rather than one at a time.
+The events in the ring buffer can be exported as Chrome trace event json, which chrome://tracing and Perfetto show on a timeline with a row per thread."""
+
+#The levels of messages. Tracing is off by default, INFO is for the main steps of starting and ending a run, and DEBUG for every handoff between threads.
+OFF, INFO, DEBUG = 0, 1, 2
+levelNames = {"off" : OFF, "info" : INFO, "debug" : DEBUG}
+
+#The highest level of message that is recorded, and the set of categories recorded (or None for every category).
+_level = OFF
+_categories = None
+#The ring buffer of the most recent events, the lines waiting to be written to the output stream, and the number of lines to wait for before writing them.
+_events = collections.deque(maxlen = 65536)
+_pendingEvents = []
+_flushSize = 256
+_stream = sys.stderr
+#The name printed at the start of each line when there is no simulated time to print, and the function that returns the simulated time.
+_processName = ""
+_getSimulatedTime = None
+_startTime = time.perf_counter_ns()
+#The lock held while adding to or taking the lines waiting to be written, and the lock held while writing them, so that they are written in order.
+_pendingLock = threading.Lock()
+_flushLock = threading.Lock()
+
+def configure(level = INFO, categories = None, bufferSize = 65536, stream = sys.stderr, flushSize = 256, processName = ""):
+    """Sets which messages are recorded, the number of events kept in the ring buffer, and where (and how often) they are written.
+    The level can be given as a name ("off", "info" or "debug"), and categories as a list of names or a comma separated string. A stream of None only records events."""
+    global _level, _categories, _events, _stream, _flushSize, _processName
+    if isinstance(level, str):
+        if level not in levelNames:
+            raise RuntimeError("Invalid trace level " + level + ".")
+        level = levelNames[level]
+    if isinstance(categories, str):
+        categories = categories.split(",")
+    _level = level
+    _categories = None if categories == None else frozenset(category.strip() for category in categories)
+    _events = collections.deque(_events, maxlen = bufferSize)
+    _stream = stream
+    _flushSize = flushSize
+    _processName = processName
+
+def setTimeSource(getSimulatedTime):
+    """Sets the function called to get the simulated time each event happened at."""
+    global _getSimulatedTime
+    _getSimulatedTime = getSimulatedTime
+
+def isEnabled(category, level = INFO):
+    """Returns if messages of the category and level are being recorded. This can be used to skip work only needed to build a message."""
+    return level <= _level and (_categories == None or category in _categories)
+
+def _record(phase, category, message, args):
+    """Adds an event to the ring buffer and the lines waiting to be written, and writes them if enough are waiting."""
+    thread = threading.current_thread()
+    simulatedTime = _getSimulatedTime() if _getSimulatedTime != None else None
+    event = (phase, time.perf_counter_ns(), thread.ident, thread.name, simulatedTime, category, message, args)
+    _events.append(event)
+    if _stream != None:
+        with _pendingLock:
+            _pendingEvents.append(event)
+            isFlushDue = len(_pendingEvents) >= _flushSize
+        if isFlushDue:
+            flush()
+
+def trace(category, message, *args, level = INFO):
+    """Records a message, which is message % args if any args are given."""
+    if level > _level or (_categories != None and category not in _categories):
+        return
+    _record("i", category, message, args)
+
+def begin(category, name, *args, level = DEBUG):
+    """Records the start of something taking time on this thread (such as waiting for another thread), called name % args if any args are given.
+    On the timeline this is shown as a bar lasting until the matching end()."""
+    if level > _level or (_categories != None and category not in _categories):
+        return
+    _record("B", category, name, args)
+
+def end(category, name, *args, level = DEBUG):
+    """Records the end of the most recent begin() on this thread. The category, name and level should be the same as the begin()."""
+    if level > _level or (_categories != None and category not in _categories):
+        return
+    _record("E", category, name, args)
+
+def _getText(event):
+    """Returns the text of an event's message, as printed in the output stream."""
+    phase, timestamp, threadId, threadName, simulatedTime, category, message, args = event
+    if args:
+        message = message % args
+    if phase == "B":
+        message = "Entering " + message
+    elif phase == "E":
+        message = "Exiting " + message
+    return message
+
+def flush():
+    """Writes all the lines waiting to be written to the output stream in one go."""
+    global _pendingEvents
+    with _flushLock:
+        with _pendingLock:
+            events = _pendingEvents
+            _pendingEvents = []
+        if not events or _stream == None:
+            return
+        lines = []
+        for event in events:
+            phase, timestamp, threadId, threadName, simulatedTime, category, message, args = event
+            if simulatedTime != None:
+                lines.append("In " + threadName + " at " + str(simulatedTime) + ": " + _getText(event) + "\n")
+            else:
+                lines.append("In " + _processName + ": " + _getText(event) + "\n")
+        _stream.write("".join(lines))
+        _stream.flush()
+
+def exportChromeTrace(filename):
+    """Writes the events in the ring buffer to a json file in the Chrome trace event format, with a named row for each thread.
+    Timestamps are in microseconds since the module was loaded, and each event's simulated time is included in its arguments."""
+    processId = os.getpid()
+    traceEvents = [{"name" : "process_name", "ph" : "M", "pid" : processId, "tid" : 0, "args" : {"name" : _processName}}]
+    threadNames = {}
+    for event in list(_events):
+        phase, timestamp, threadId, threadName, simulatedTime, category, message, args = event
+        threadNames[threadId] = threadName
+        traceEvent = {
+            "name" : _getText(event) if phase == "i" else (message % args if args else message),
+            "cat" : category,
+            "ph" : phase,
+            "ts" : (timestamp - _startTime) / 1000,
+            "pid" : processId,
+            "tid" : threadId
+        }
+        if phase == "i":
+            traceEvent["s"] = "t"
+        if simulatedTime != None:
+            traceEvent["args"] = {"Simulated Time" : simulatedTime}
+        traceEvents.append(traceEvent)
+    for threadId, threadName in threadNames.items():
+        traceEvents.append({"name" : "thread_name", "ph" : "M", "pid" : processId, "tid" : threadId, "args" : {"name" : threadName}})
+    with open(filename, "w") as traceFile:
+        json.dump({"traceEvents" : traceEvents, "displayTimeUnit" : "ms"}, traceFile)
+
+#Anything still waiting to be written is written when the program exits.
+atexit.register(flush)
@@ -0,0 +1,82 @@
+import unittest
+import io
+import json
+import os
+import tempfile
+import threading
+
+import SimTrace
+
+class _CountingArgument:
+    """An argument that counts how many times it has been turned into a string."""
+
+    def __init__(self):
+        self.formatCount = 0
+
+    def __str__(self):
+        self.formatCount += 1
+        return "argument"
+
+class TraceTest(unittest.TestCase):
+
+    def setUp(self):
+        """Removes the simulated time from the messages, as the simulator sets it when SimBase is imported by the other tests."""
+        self._getSimulatedTime = SimTrace._getSimulatedTime
+        SimTrace.setTimeSource(None)
+
+    def tearDown(self):
+        """Turns tracing off again, so the other tests aren't traced."""
+        SimTrace.configure(SimTrace.OFF, stream = None)
+        SimTrace.setTimeSource(self._getSimulatedTime)
+
+    def testDisabledMessagesAreNotBuilt(self):
+        """Tests that messages above the level, or outside the categories, are neither formatted nor written."""
+        stream = io.StringIO()
+        SimTrace.configure("info", ["startup"], bufferSize = 16, stream = stream, processName = "Test")
+        argument = _CountingArgument()
+        SimTrace.trace("startup", "Debug message %s", argument, level = SimTrace.DEBUG)
+        SimTrace.trace("handoff", "Other category %s", argument)
+        SimTrace.begin("startup", "Span %s", argument)
+        SimTrace.flush()
+        self.assertEqual(argument.formatCount, 0)
+        self.assertEqual(stream.getvalue(), "")
+
+        SimTrace.trace("startup", "Info message %s", argument)
+        self.assertEqual(stream.getvalue(), "")
+        SimTrace.flush()
+        self.assertEqual(argument.formatCount, 1)
+        self.assertEqual(stream.getvalue(), "In Test: Info message argument\n")
+
+    def testChromeTraceExport(self):
+        """Tests that the ring buffer keeps the most recent events, and that they are exported with a named row for the thread."""
+        SimTrace.configure("debug", bufferSize = 3, stream = None)
+        SimTrace.trace("startup", "Dropped from the ring buffer")
+        SimTrace.begin("handoff", "RpcThread.unblock(%s)", "[1]-Thread")
+        SimTrace.trace("robot", "Robot now starting.")
+        SimTrace.end("handoff", "RpcThread.unblock(%s)", "[1]-Thread")
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "trace.json")
+            SimTrace.exportChromeTrace(filename)
+            with open(filename) as traceFile:
+                traceEvents = json.load(traceFile)["traceEvents"]
+        events = [event for event in traceEvents if event["ph"] != "M"]
+        self.assertEqual([(event["ph"], event["name"]) for event in events],
+                         [("B", "RpcThread.unblock([1]-Thread)"), ("i", "Robot now starting."), ("E", "RpcThread.unblock([1]-Thread)")])
+        self.assertLessEqual(events[0]["ts"], events[2]["ts"])
+        threadNames = [event["args"]["name"] for event in traceEvents if event["name"] == "thread_name"]
+        self.assertEqual(threadNames, ["MainThread"])
+
+    def testConcurrentMessagesAreAllWritten(self):
+        """Tests that no messages are lost when several threads record messages while the lines waiting to be written are being written."""
+        stream = io.StringIO()
+        SimTrace.configure("info", bufferSize = 16, stream = stream, flushSize = 3, processName = "Test")
+        def recordMessages():
+            for messageNumber in range(2000):
+                SimTrace.trace("robot", "Message %d", messageNumber)
+        threads = [threading.Thread(target = recordMessages) for threadNumber in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        SimTrace.flush()
+        self.assertEqual(stream.getvalue().count("\n"), 4 * 2000)
@@ -1,8 +1,8 @@
 import math
-import random
 
 from vector3 import *
 import SimBase
+import SimAtlas
 
 def _getVisibleCuboidFaces(body, cameraPosition, height):
     """Takes a body, the position of the camera, and the height of the body, and returns a list of all faces of the cuboid that are visible to the camera.
@@ -15,8 +15,8 @@ def _getVisibleCuboidFaces(body, cameraPosition, height):
     for shape in body.shapes:
         groundVertexes = []
         raisedVertexes = []
-        for groundVertex in shape.get_vertices():
-            x,y = groundVertex.rotated(body.angle) + body.position
+        #The world positions of the vertexes are read from the state table, which transforms every body's vertexes once per step.
+        for x, y in SimBase.stateTable.getVertexes(shape).tolist():
             groundVertexes.append( Vector3(x, y, 0) )
             raisedVertexes.append( Vector3(x, y, height) )
         
@@ -38,19 +38,60 @@ def _getVisibleCuboidFaces(body, cameraPosition, height):
 
     return planes
 
+def _getObstructionHeight(obstructingBody):
+    """Takes a body that could potentially obstruct the camera (a robot or token), and returns its height."""
+    if isinstance(obstructingBody, SimBase.Robot):
+        return obstructingBody.height
+    #Must be a token.
+    return 0.11
+
 def _getObstructingPlanesFromBody(obstructingBody, cameraPosition):
     """Takes a body that could potentially obstruct the camera (a robot or token), and the position of the camera.
     Returns the three planes that are visible to the camera (and could obstruct it's vision)."""
-    obstructionHeight = None
-    if isinstance(obstructingBody, SimBase.Robot):
-        obstructionHeight = obstructingBody.height
-    else:
-        #Must be a token.
-        obstructionHeight = 0.11
-    
-    planes = _getVisibleCuboidFaces(obstructingBody, cameraPosition, obstructionHeight)
+    planes = _getVisibleCuboidFaces(obstructingBody, cameraPosition, _getObstructionHeight(obstructingBody))
     return planes
 
+class _Obstruction:
+    """A body that could potentially obstruct the camera, with a circle around its footprint for quickly ruling it out.
+    Its planes are only worked out if a line of sight passes close enough to it to need them."""
+
+    def __init__(self, body, cameraPosition):
+        self.body = body
+        self.height = _getObstructionHeight(body)
+        self._cameraPosition = cameraPosition
+        self._planes = None
+        vertexes = [vertex for shape in body.shapes for vertex in SimBase.stateTable.getVertexes(shape).tolist()]
+        self.centreX = sum(vertex[0] for vertex in vertexes) / len(vertexes)
+        self.centreY = sum(vertex[1] for vertex in vertexes) / len(vertexes)
+        #The radius is rounded up a little, so that rounding errors in the planes' tests can't put a point they obstruct outside it.
+        self.radius = max(math.hypot(vertex[0] - self.centreX, vertex[1] - self.centreY) for vertex in vertexes) + 1e-6
+
+    def couldObstructPoint(self, point):
+        """Returns False if the line between the point and the camera can't pass through the body, because it passes above it
+        or doesn't come within the circle around its footprint. Returns True if it might."""
+        cameraPosition = self._cameraPosition
+        if min(point.z, cameraPosition.z) > self.height + 1e-6:
+            return False
+        #The distance from the centre of the body to the nearest point on the line, looking down from above.
+        directionX = point.x - cameraPosition.x
+        directionY = point.y - cameraPosition.y
+        offsetX = self.centreX - cameraPosition.x
+        offsetY = self.centreY - cameraPosition.y
+        lengthSquared = directionX * directionX + directionY * directionY
+        fraction = 0
+        if lengthSquared > 0:
+            fraction = min(1, max(0, (offsetX * directionX + offsetY * directionY) / lengthSquared))
+        return math.hypot(offsetX - fraction * directionX, offsetY - fraction * directionY) <= self.radius
+
+    def isObstructingPoint(self, point):
+        """Returns True if any of the body's planes obstructs the line between the point and the camera."""
+        if self._planes == None:
+            self._planes = _getObstructingPlanesFromBody(self.body, self._cameraPosition)
+        for plane in self._planes:
+            if plane.isObstructingPoint(point, self._cameraPosition):
+                return True
+        return False
+
 def _isMarkerResolvable(markerCornerSet, cameraPosition, FoV, resolution, pixelThreshold):
     """Takes a set of four corner positions, the position of the camera, the FoV of the camera, the resolution of the image,
     and the smallest number of pixels that the marker can encompass in the image while still being visible.
@@ -75,9 +116,10 @@ def _getMarkerCornersFromWallSegment(body):
     """Takes a wall segment, and calcuates a list of points in 3D space where the corners of the marker would lie.
     This is then returned inside another list, for compatibility with tokens (which have multiple markers)."""
     corners = []
-    markerCentre = Vector3(body.position[0], body.position[1], 0.175)
+    x, y = SimBase.stateTable.getPosition(body)
+    markerCentre = Vector3(x, y, 0.175)
     #Vector from the centre of the marker to the side.
-    markerRadius = Vector3(0, 0.125, 0).rotateAroundZ(body.angle)
+    markerRadius = Vector3(0, 0.125, 0).rotateAroundZ(SimBase.stateTable.getAngle(body))
     corners.append( markerCentre - markerRadius - Vector3(0, 0, 0.125) )
     corners.append( markerCentre + markerRadius - Vector3(0, 0, 0.125) )
     corners.append( markerCentre + markerRadius + Vector3(0, 0, 0.125) )
@@ -112,12 +154,18 @@ def _constructMarkerInfoDictionary(markerCornerSet, body):
     size = 0
     if isinstance(body, SimBase.Token):
         size = 0.1
+        bodyType = body.type
+        offset = body.offset
     else:
         size = 0.25
+        bodyType = "Arena"
+        offset = body.id
     return {
         "Corners" : corners,
         "Id" : body.id,
-        "Size" : size
+        "Size" : size,
+        "Type" : bodyType,
+        "Offset" : offset
     }
 
                     
@@ -126,47 +174,67 @@ def see(robot, resolution, isImageBlurred):
     Returns a dictionary containing all the information needed by the RobotClient to construct a list of all visible Marker objects.
     Constructing the Marker objects is done by the RobotClient because it is not possible to send arbitary object structures using xmlrpc."""
     MarkersList = []
-    cameraNormal = Vector3( math.cos(robot.angle), math.sin(robot.angle), 0 )
-    cameraPosition = Vector3( robot.position[0], robot.position[1], robot.cameraHeight ) + ( cameraNormal * ( robot.length / 2) )
+    robotAngle = SimBase.stateTable.getAngle(robot)
+    robotX, robotY = SimBase.stateTable.getPosition(robot)
+    cameraNormal = Vector3( math.cos(robotAngle), math.sin(robotAngle), 0 )
+    cameraPosition = Vector3( robotX, robotY, robot.cameraHeight ) + ( cameraNormal * ( robot.length / 2) )
     #Only return any markers if the image is not blurred (or the robot is ignoring blur).
     if robot.isIgnoringMotionBlur or (not isImageBlurred):
-        random.seed()
-        #potentialObstructioningPlanes is a list of planes that could potentially get in the way
-        potentialObstructingPlanes = []
+        #The visibility atlas (if there is one for this camera) gives the only wall markers that could pass the field of view and resolvability tests from here.
+        atlas = SimAtlas.getAtlas(robot, resolution)
+        wallCandidates = atlas.getCandidates(robotX, robotY, robotAngle) if atlas != None else None
+        #obstructions is a list of the bodies that could potentially get in the way, and obstructionOfBody looks them up by body.
+        obstructions = []
         #tokens is a list of tokens, walls is a list of walls
         markedBodies = []
-        for body in SimBase.space.bodies:
+        for body, isMoving in SimBase.stateTable.getCurrentBodies():
             if isinstance(body, SimBase.Robot):
                 if body != robot:
-                    potentialObstructingPlanes.extend(_getObstructingPlanesFromBody(body, cameraPosition))
+                    obstructions.append(_Obstruction(body, cameraPosition))
             elif isinstance(body, SimBase.Token):
-                potentialObstructingPlanes.extend(_getObstructingPlanesFromBody(body, cameraPosition))
-                if robot.isIgnoringMotionBlur or (not body.isMoving):
+                obstructions.append(_Obstruction(body, cameraPosition))
+                if robot.isIgnoringMotionBlur or (not isMoving):
                     markedBodies.append(body)
             elif isinstance(body, SimBase.WallSegment):
                 markedBodies.append(body)
+        obstructionOfBody = {obstruction.body : obstruction for obstruction in obstructions}
+        #The body that hid each marker corner the last time the robot looked, by the id of the marker's body, the marker and the corner.
+        #Between frames the same body usually still hides the corner, so it is tested first, and the other bodies are only tested if it doesn't.
+        lastObstructionOfCorner = robot.obstructionOfCorner
+        robot.obstructionOfCorner = {}
         for body in markedBodies:
             if isinstance(body, SimBase.Token):
                 markerCornerSets = _getMarkerCornersFromToken(body, cameraPosition)
+            elif wallCandidates != None and body.id not in wallCandidates:
+                #The noise is still drawn for the skipped marker, so the other markers get the same noise as they would without the atlas.
+                robot.randomGenerator.randint( -robot.markerPixelsNoise // 2, robot.markerPixelsNoise // 2 )
+                continue
             else:
                 markerCornerSets = _getMarkerCornersFromWallSegment(body)
-            for markerCornerSet in markerCornerSets:
+            for markerNumber, markerCornerSet in enumerate(markerCornerSets):
                 #If the marker is too slanted or too far away for there to be enough pixels to resolve it, skip this marker.
-                markerPixelMinimumAdjusted = robot.markerPixelsMinimum + random.randint( -robot.markerPixelsNoise // 2, robot.markerPixelsNoise // 2 )
+                markerPixelMinimumAdjusted = robot.markerPixelsMinimum + robot.randomGenerator.randint( -robot.markerPixelsNoise // 2, robot.markerPixelsNoise // 2 )
                 if not _isMarkerResolvable(markerCornerSet, cameraPosition, robot.fieldOfView, resolution, markerPixelMinimumAdjusted):
                     continue
                 isVisible = False
-                for markerCorner in markerCornerSet:
+                for cornerNumber, markerCorner in enumerate(markerCornerSet):
                     if cameraNormal.angleBetween(markerCorner - cameraPosition) > robot.fieldOfView:
                         break
-                    for potentialObstructingPlane in potentialObstructingPlanes:
-                        if potentialObstructingPlane.isObstructingPoint(markerCorner, cameraPosition):
+                    #A corner is hidden if any body obstructs it, so whichever body is found to obstruct it, the result is the same as testing every body.
+                    cornerKey = (body.id, markerNumber, cornerNumber)
+                    lastObstruction = obstructionOfBody.get(lastObstructionOfCorner.get(cornerKey))
+                    if lastObstruction != None and lastObstruction.isObstructingPoint(markerCorner):
+                        robot.obstructionOfCorner[cornerKey] = lastObstruction.body
+                        continue
+                    for obstruction in obstructions:
+                        if obstruction is not lastObstruction and obstruction.couldObstructPoint(markerCorner) and obstruction.isObstructingPoint(markerCorner):
+                            robot.obstructionOfCorner[cornerKey] = obstruction.body
                             break
                     else:
                         isVisible = True
                 if isVisible:
-                    #Set the time the body was last seen by the looking robot's id, and constructs a dictionary of information about the vector.
-                    body.lastSeenList[robot.teamNumber] = SimBase.theTime
+                    #Record that the looking robot's team has seen the body, and construct a dictionary of information about the marker.
+                    SimBase.recordSighting(body, robot.teamNumber)
                     MarkersList.append(_constructMarkerInfoDictionary(markerCornerSet, body))
             
     #Construct the dictionary needed to build the list of Marker objects on the RobotClient.
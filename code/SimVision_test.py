@@ -0,0 +1,47 @@
+import unittest
+import random
+
+import SimTestCase
+import SimBase
+import SimVision
+from vector3 import *
+
+class OcclusionCacheTest(SimTestCase.SimTestCase):
+
+    def setUp(self):
+        """Creates an arena with a robot per team, driving and turning at different speeds."""
+        super().setUp()
+        self.createArena()
+        self.robots = [SimBase.Robot(teamNumber) for teamNumber in range(4)]
+        for robot, (leftPower, rightPower) in zip(self.robots, [(60, 20), (30, -30), (80, 75), (-40, 40)]):
+            robot.leftPower = leftPower
+            robot.rightPower = rightPower
+
+    def testSameAsWithoutCache(self):
+        """Tests that the markers seen using the bodies that hid each corner last time are the same as those seen without them."""
+        for frame in range(40):
+            for robot in self.robots:
+                randomState = robot.randomGenerator.getstate()
+                lastObstructionOfCorner = robot.obstructionOfCorner
+                robot.obstructionOfCorner = {}
+                uncachedResult = SimVision.see(robot, (1296, 736), False)
+                robot.randomGenerator.setstate(randomState)
+                robot.obstructionOfCorner = lastObstructionOfCorner
+                self.assertEqual(SimVision.see(robot, (1296, 736), False), uncachedResult)
+            for step in range(4):
+                SimBase.stepSimulation()
+
+    def testBoundsAreConservative(self):
+        """Tests that a body is never ruled out of obstructing a point that one of its planes obstructs."""
+        randomGenerator = random.Random(1)
+        obstructingCount = 0
+        for body in SimBase.tokens + self.robots:
+            cameraPosition = Vector3(randomGenerator.uniform(-3, 3), randomGenerator.uniform(-3, 3), randomGenerator.uniform(0, 0.4))
+            obstruction = SimVision._Obstruction(body, cameraPosition)
+            for pointNumber in range(200):
+                point = Vector3(randomGenerator.uniform(-3, 3), randomGenerator.uniform(-3, 3), randomGenerator.uniform(0, 0.4))
+                if obstruction.isObstructingPoint(point):
+                    obstructingCount += 1
+                    self.assertTrue(obstruction.couldObstructPoint(point))
+        #Enough of the lines pass through a body for the test to mean something.
+        self.assertGreater(obstructingCount, 20)
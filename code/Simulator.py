@@ -1,3 +1,5 @@
+import argparse
+import json
 import threading
 import time
 import random
@@ -5,46 +7,162 @@ import random
 #my modules
 import SimBase
 import SimArena
+import SimAtlas
 import SimDisplay
+import SimCapture
+import SimProfile
+import SimTrace
     
 if __name__ == "__main__":
     """Main program."""
-    SimBase.trace("Simulator starting.")
+    parser = argparse.ArgumentParser("Simulator")
+    parser.add_argument("--speed", type=float, default=1, help="How many times faster than real time to run the simulation, or 0 to run it as fast as possible.")
+    parser.add_argument("--fps", type=float, default=64, help="The number of frames per second to draw the display at, independently of the physics step rate.")
+    parser.add_argument("--steps-per-frame", type=int, default=0, help="If set, draw the display every this many physics steps instead of at a fixed frame rate.")
+    parser.add_argument("--capture", help="Record the display to this directory, drawing it offscreen instead of in a window.")
+    parser.add_argument("--capture-format", choices=["png", "raw"], default="png", help="Record a numbered PNG image per frame, or a single raw video file.")
+    parser.add_argument("--capture-queue", type=int, default=64, help="The number of frames that can be waiting to be written.")
+    parser.add_argument("--capture-policy", choices=["drop", "block"], default="drop", help="Whether to drop frames or wait for the writer when the queue is full.")
+    parser.add_argument("--seed", type=int, help="Seed the random noise in the robots' motors and cameras, so that matches can be repeated exactly.")
+    parser.add_argument("--arena-config", help="Configure the arena from this file instead of Arena Config.json.")
+    parser.add_argument("--token-config", help="Place the tokens from this file instead of Token Position Config.json.")
+    parser.add_argument("--visibility-atlas", help="Look up the wall markers each robot could see in the visibility atlases in this directory (built by BuildVisibilityAtlas.py).")
+    parser.add_argument("--metrics", help="Write the metrics of the run (the calls to each service, their latencies, and the steps per second) to this json file when it ends.")
+    parser.add_argument("--profile-allocations", help="Trace the memory allocated and the garbage collections during the match, and write a report of them by subsystem to this file.")
+    parser.add_argument("--profile-top", type=int, default=20, help="The number of lines of code with the most memory allocated to list in the allocation report.")
+    parser.add_argument("--serial-handoff", action="store_true", help="Release the robot threads due in a step one at a time, waiting for each to block again, instead of all at once.")
+    parser.add_argument("--think-time-policy", choices=["measure", "charge", "throttle"], default="measure", help="What to do about the wall-clock time each robot program spends thinking between its calls: only measure it, charge it as simulated time, or slow down programs that think for longer than the budget.")
+    parser.add_argument("--think-time-scale", type=float, default=1, help="The number of simulated seconds charged for each wall-clock second a robot program thinks for, with --think-time-policy charge.")
+    parser.add_argument("--think-time-budget", type=float, default=0.1, help="The wall-clock seconds each robot program may think for per simulated second, with --think-time-policy throttle.")
+    parser.add_argument("--no-fast-forward", action="store_true", help="Step the physics even while every robot is waiting and nothing in the arena is moving.")
+    parser.add_argument("--trace-level", choices=["off", "info", "debug"], help="Print trace messages up to this level to Standard Error: info for starting and ending the run, debug for every handoff between threads. Defaults to debug with --trace-file, off otherwise.")
+    parser.add_argument("--trace-categories", help="Only trace these comma separated categories (startup, handoff, arena, robot, shutdown).")
+    parser.add_argument("--trace-file", help="Write the most recent trace events to this file as Chrome trace event json (for chrome://tracing or Perfetto) when the run ends.")
+    parser.add_argument("--trace-buffer", type=int, default=65536, help="The number of trace events kept for the trace file.")
+    arguments = parser.parse_args()
+    if arguments.fps <= 0:
+        parser.error("The display's frame rate must be more than 0.")
+    if arguments.think_time_scale < 0 or arguments.think_time_budget <= 0:
+        parser.error("The think time scale can't be negative, and the think time budget must be more than 0.")
+
+    traceLevel = arguments.trace_level
+    if traceLevel == None:
+        traceLevel = "debug" if arguments.trace_file else "off"
+    SimTrace.configure(traceLevel, arguments.trace_categories, arguments.trace_buffer, processName = "Simulator")
+    SimTrace.trace("startup", "Simulator starting.")
+    SimBase.randomSeed = arguments.seed
+    SimAtlas.atlasDirectory = arguments.visibility_atlas
+    SimBase.thinkTimePolicy = arguments.think_time_policy
+    SimBase.thinkTimeScale = arguments.think_time_scale
+    SimBase.thinkTimeBudget = arguments.think_time_budget
     #Create threads for all participants.
     SimBase.mainGate.clear()
-    SimBase.trace("Creating ArenaThread.")
-    SimBase.rpcThreads.append( SimArena.ArenaThread() )
-    SimBase.trace("Starting ArenaThread.")
+    SimTrace.trace("startup", "Creating ArenaThread.")
+    arenaConfig = None
+    if arguments.arena_config:
+        with open(arguments.arena_config) as ArenaConfig:
+            arenaConfig = json.loads(ArenaConfig.read())[0]
+    tokenConfig = None
+    if arguments.token_config:
+        with open(arguments.token_config) as TokenConfig:
+            tokenConfig = json.loads(TokenConfig.read())
+    SimBase.rpcThreads.append( SimArena.ArenaThread(arenaConfig, tokenConfig) )
+    SimTrace.trace("startup", "Starting ArenaThread.")
     SimBase.rpcThreads[0].start()
     #The robot rpcThreads are created by the ArenaThread. When it finishes, it'll unblock the mainGate.
-    SimBase.trace("Simulator is waiting for clients to be ready to begin.")
+    SimTrace.trace("startup", "Simulator is waiting for clients to be ready to begin.")
     SimBase.mainGate.wait()
-    SimBase.trace("All clients are ready to begin, entering main loop.")
+    SimTrace.trace("startup", "All clients are ready to begin, entering main loop.")
 
     #Create the display, and enter the main loop.
-    display = SimDisplay.Display()
-    while SimBase.isSimulationRunning():
-        for thread in SimBase.rpcThreads:
-            if SimBase.theTime >= thread.wakeUpTime:
-                thread.unblock()
-
-        for robot in SimBase.robots:
-            #Apply the motor forces for this step and check if the robot has left its zone.
-            robot.applyMotorForce()
-            if not robot.hasLeftZone:
-                robot.checkIfLeftZone()
-
-        SimBase.theTime += 1/64
-        SimBase.space.step(1/64)
-
-        display.updateDisplay()
-        display.processInputs()
-
-    #Exit main loop.
-    #Unblock the ArenaThread to allow it to run post-simulation functions (namely calculating the score).
-    SimBase.trace("Yielding control to [0]-Thread")
-    SimBase.rpcThreads[0].unblock()
-    #Once the main thread is unblocked, the Simulator and all the robot threads can shutdown.
-    for thread in SimBase.rpcThreads:
+    frameWriter = None
+    if arguments.capture:
+        frameWriter = SimCapture.FrameWriter(arguments.capture, arguments.capture_format, arguments.capture_queue, arguments.capture_policy)
+        frameWriter.start()
+    display = SimDisplay.Display(frameWriter)
+    #The display is drawn on its own schedule, so the physics can run faster than real time without drawing every step.
+    #Inputs are still polled at 64Hz of wall-clock time, so the window stays responsive however rarely it is drawn.
+    frameInterval = 1 / arguments.fps
+    inputInterval = 1 / 64
+    allocationProfiler = None
+    if arguments.profile_allocations:
+        allocationProfiler = SimProfile.AllocationProfiler()
+        allocationProfiler.start()
+    isFastForwardAllowed = not arguments.no_fast_forward and arguments.steps_per_frame == 0
+    #Each pass of this loop plays one match. The Controller can reset the arena for another match once one has ended.
+    while True:
+        SimBase.metrics.start()
+        startWallTime = time.perf_counter()
+        startSimulatedTime = SimBase.theTime
+        frameScheduler = SimDisplay.FrameScheduler(display, frameInterval, arguments.steps_per_frame)
+        nextInputTime = startWallTime + inputInterval
+        stepCount = 0
+        while SimBase.isSimulationRunning():
+            #The ArenaThread collects the output, so it runs first. Then every robot thread that is due is released together,
+            #and the step waits for the slowest of them to block again.
+            if SimBase.theTime >= SimBase.rpcThreads[0].wakeUpTime:
+                SimBase.rpcThreads[0].unblock()
+            dueThreads = [thread for thread in SimBase.rpcThreads[1:] if SimBase.theTime >= thread.wakeUpTime]
+            if arguments.serial_handoff:
+                for thread in dueThreads:
+                    thread.unblock()
+            else:
+                SimBase.releaseThreads(dueThreads)
+
+            #When nothing can move until the next robot program wakes up, the time skips straight there instead of stepping physics that won't change.
+            #While running in real time it only skips as far as the next time the inputs are polled, so the window stays responsive.
+            #Frames drawn every few steps need every step, so nothing is skipped then.
+            if isFastForwardAllowed and SimBase.isWorldAtRest():
+                untilTime = min(thread.wakeUpTime for thread in SimBase.rpcThreads)
+                if arguments.speed > 0:
+                    untilTime = min(untilTime, startSimulatedTime + (nextInputTime - startWallTime) * arguments.speed)
+                stepCount += SimBase.fastForward(untilTime)
+            else:
+                #Apply the motor forces and step the physics. Whether the robots have left their zones is tracked by a collision handler.
+                SimBase.stepSimulation()
+                stepCount += 1
+
+            if arguments.speed > 0:
+                #Wait for the wall clock to catch up with the simulated time.
+                delay = startWallTime + (SimBase.theTime - startSimulatedTime) / arguments.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            frameScheduler.update(stepCount)
+            currentWallTime = time.perf_counter()
+            if currentWallTime >= nextInputTime:
+                display.processInputs()
+                nextInputTime = currentWallTime + inputInterval
+
+        #Exit main loop.
+        SimBase.metrics.stop(SimBase.theTime)
+        #Release the robot threads, so any calls their programs are waiting on return (and any further calls fail) now the match is over.
+        for thread in SimBase.rpcThreads[1:]:
+            thread.gate.set()
+        #Unblock the ArenaThread to allow it to run post-simulation functions (namely calculating the score).
+        SimTrace.trace("shutdown", "Yielding control to [0]-Thread")
+        SimBase.rpcThreads[0].unblock()
+        #If the Controller reset the arena, the ArenaThread blocks again once the next match's robots are ready to start. Otherwise it has terminated.
+        if not SimBase.isSimulationRunning():
+            break
+        SimTrace.trace("startup", "All clients are ready to begin the next match, entering main loop.")
+
+    if allocationProfiler != None:
+        allocationProfiler.stop()
+        SimTrace.trace("shutdown", "Writing the allocation report to %s.", arguments.profile_allocations)
+        allocationProfiler.writeReport(arguments.profile_allocations, arguments.profile_top)
+    if frameWriter != None:
+        SimTrace.trace("shutdown", "Writing the remaining captured frames.")
+        frameWriter.close()
+        SimTrace.trace("shutdown", "Captured %d frames, dropped %d.", frameWriter.framesWritten, frameWriter.framesDropped)
+    #Once the main thread is unblocked, the Simulator and all the robot threads (including any left over from earlier matches) can shutdown.
+    for thread in SimBase.rpcThreads + SimBase.idleRpcThreads:
         thread.shutdownAndWaitToExit()
-    SimBase.trace("Simulator process ends")
\ No newline at end of file
+    if arguments.metrics:
+        SimTrace.trace("shutdown", "Writing the metrics to %s.", arguments.metrics)
+        SimBase.metrics.writeMetrics(arguments.metrics)
+    if arguments.trace_file:
+        SimTrace.trace("shutdown", "Writing the trace to %s.", arguments.trace_file)
+        SimTrace.exportChromeTrace(arguments.trace_file)
+    SimTrace.trace("shutdown", "Simulator process ends")
+    SimTrace.flush()
\ No newline at end of file
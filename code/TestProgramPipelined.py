@@ -0,0 +1,28 @@
+import asyncio
+
+import AsyncRobotClient
+import RobotClient
+
+async def main():
+    robot = await AsyncRobotClient.connect()
+    robot.print("Pipelined robot started!")
+    #The next image is always being taken while the robot works out what to do with the last one.
+    nextMarkers = robot.see()
+    while True:
+        markers = await nextMarkers
+        nextMarkers = robot.see()
+        tokens = [marker for marker in markers if marker.info.marker_type == RobotClient.MARKER_TOKEN]
+        if tokens:
+            nearest = min(tokens, key = lambda marker: marker.dist)
+            robot.print("Heading for token " + str(nearest.info.code) + " at " + str(nearest.rot_y))
+            turn = max(-20, min(20, nearest.rot_y))
+            robot.motors[1] = 50 + turn
+            robot.motors[2] = 50 - turn
+        else:
+            robot.motors[1] = 30
+            robot.motors[2] = -30
+
+try:
+    asyncio.run(main())
+except (ConnectionError, RobotClient.xmlrpc.client.Fault):
+    print("PipelinedRobot has finished.")
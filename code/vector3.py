@@ -151,8 +151,9 @@ class Plane:
                     ( self.cartesianD - self.cartesianA*cameraPosition.x - self.cartesianB*cameraPosition.y - self.cartesianC*cameraPosition.z )
                     / ( self.cartesianA * direction.x + self.cartesianB * direction.y + self.cartesianC * direction.z)
                     )
-            #if plane of obstruction is between point and camera
-            if lamda > 0 and lamda < 1:
+            #if plane of obstruction is between point and camera. A point on the plane itself (such as the corner of a marker on it) isn't obstructed by it,
+            #so lamda has to be short of 1 by more than the rounding error.
+            if lamda > 0 and lamda < 1 - 1e-9:
                 intersectionPoint = cameraPosition + (direction * lamda) - self._pointJ
                 mu = intersectionPoint.dot(self._vectorU) / (self._vectorU.magnitude ** 2)
                 if mu > 0 and mu < 1: